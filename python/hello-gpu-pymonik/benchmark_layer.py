@@ -0,0 +1,240 @@
+import argparse
+import time
+import timeit
+from typing import Callable, Dict, List, Tuple
+
+import cloudpickle
+import jax
+import numpy as np
+from pymonik import Pymonik, task
+
+import gpu_cpu
+from gpu_cpu import batched_layer, unrolled_layer, vmap_layer
+
+# The functions of gpu_cpu are sent by value, the workers only have pymonik installed
+cloudpickle.register_pickle_by_value(gpu_cpu)
+
+# Compiled by the task, as jitted functions cannot be lowered once unpickled
+IMPLEMENTATIONS: Dict[str, Callable] = {
+    "unrolled": unrolled_layer,
+    "vmap": vmap_layer,
+    "matrix": batched_layer,
+}
+
+# JAX version installed on the workers of each partition
+ENVIRONMENTS = {
+    "gpumonik": {"pip": ["jax[cuda12]"]},
+    "pymonik": {"pip": ["jax"]},
+}
+
+
+def layer_size(value: str) -> Tuple[int, int]:
+    """
+    Parses a layer size
+    Args:
+        value: Numbers of inputs and outputs of the layer, as INPUTSxOUTPUTS
+
+    Returns:
+        Numbers of inputs and outputs
+    """
+    try:
+        inputs, outputs = (int(size) for size in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected INPUTSxOUTPUTS, got '{value}'")
+    return inputs, outputs
+
+
+def parse_arguments():
+    """
+    Parse command line arguments
+    Returns:
+    Parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the implementations of the dense layer",
+        epilog="This benchmark runs the implementations of the layer of gpu_cpu.py for each batch and layer size, and reports their compile time apart from their steady-state time\n Example : \n python benchmark_layer.py --partitions gpumonik pymonik --batch-sizes 1 10 100 1000",
+    )
+    parser.add_argument(
+        "--endpoint",
+        help="Endpoint of the control plane, read from AKCONFIG by default",
+        type=str,
+    )
+    parser.add_argument(
+        "--partitions",
+        help="Partitions running the benchmark, one task each",
+        nargs="+",
+        default=["pymonik"],
+    )
+    parser.add_argument(
+        "--local",
+        help="Run the benchmark in this process, as a stand-in for a CPU partition",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        help="Numbers of input vectors",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100, 1000],
+    )
+    parser.add_argument(
+        "--layer-sizes",
+        help="Numbers of inputs and outputs of the layer, as INPUTSxOUTPUTS",
+        type=layer_size,
+        nargs="+",
+        default=[(250, 40), (1024, 1024)],
+    )
+    parser.add_argument(
+        "--implementations",
+        help="Implementations to compare",
+        choices=list(IMPLEMENTATIONS),
+        nargs="+",
+        default=list(IMPLEMENTATIONS),
+    )
+    parser.add_argument(
+        "--max-unrolled-batch",
+        help="Largest batch of the unrolled implementation, whose compile time grows with the batch",
+        type=int,
+        default=100,
+    )
+    parser.add_argument(
+        "--repeat",
+        help="Number of timed runs, the best one is kept",
+        type=int,
+        default=5,
+    )
+    parser.add_argument("--seed", help="Random seed", type=int, default=47)
+    return parser.parse_args()
+
+
+def best_time(function: Callable[[], object], repeat: int) -> float:
+    """
+    Times a function
+    Args:
+        function: Function without argument to time
+        repeat: Number of timed runs
+
+    Returns:
+        Best time per call in seconds
+    """
+    number = max(1, timeit.Timer(function).autorange()[0])
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+@task
+def benchmark_layers(
+    batch_sizes: List[int],
+    layer_sizes: List[Tuple[int, int]],
+    implementations: List[str],
+    max_unrolled_batch: int,
+    repeat: int,
+    seed: int,
+) -> Dict[str, object]:
+    """
+    Times the implementations of the layer on the device of the worker
+    Args:
+        batch_sizes: Numbers of input vectors
+        layer_sizes: Numbers of inputs and outputs of the layer
+        implementations: Names of the implementations to time
+        max_unrolled_batch: Largest batch of the unrolled implementation
+        repeat: Number of timed runs
+        seed: Random seed
+
+    Returns:
+        The devices of the worker, and one row per batch size, layer size and
+        implementation with the compile time, the size of the compiled program and the
+        steady-state time of a call
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for inputs, outputs in layer_sizes:
+        weights = jax.device_put(rng.normal(size=(inputs, outputs)).astype(np.float32))
+        bias = jax.device_put(rng.normal(size=(outputs,)).astype(np.float32))
+        for batch in batch_sizes:
+            x = jax.device_put(rng.normal(size=(batch, inputs)).astype(np.float32))
+            reference = None
+            reference_name = None
+            for name in implementations:
+                if name == "unrolled" and batch > max_unrolled_batch:
+                    continue
+                # Compiled from scratch, as on the first call in a new worker
+                jax.clear_caches()
+                start = time.perf_counter()
+                lowered = jax.jit(IMPLEMENTATIONS[name]).lower(x, weights, bias)
+                compiled = lowered.compile()
+                compile_time = time.perf_counter() - start
+                output = np.asarray(jax.block_until_ready(compiled(x, weights, bias)))
+                if reference is None:
+                    reference, reference_name = output, name
+                elif not np.allclose(output, reference, atol=1e-4):
+                    # Matrix-vector and matrix-matrix products sum in different orders
+                    raise RuntimeError(f"{name} differs from {reference_name}")
+                seconds = best_time(
+                    lambda: jax.block_until_ready(compiled(x, weights, bias)), repeat
+                )
+                rows.append(
+                    {
+                        "inputs": inputs,
+                        "outputs": outputs,
+                        "batch": batch,
+                        "implementation": name,
+                        "compile_s": compile_time,
+                        "program_lines": len(lowered.as_text().splitlines()),
+                        "steady_s": seconds,
+                    }
+                )
+    return {"devices": str(jax.devices()), "rows": rows}
+
+
+def print_rows(rows: List[Dict[str, object]]) -> None:
+    """
+    Prints the rows of a benchmark run
+    Args:
+        rows: Rows returned by benchmark_layers
+    """
+    print(
+        f"{'layer':>10} {'batch':>6} {'impl':>9} {'compile ms':>11} {'lines':>7} "
+        f"{'steady ms':>10} {'vectors/s':>11} {'speedup':>8}"
+    )
+    reference = {}
+    for row in rows:
+        key = (row["inputs"], row["outputs"], row["batch"])
+        # Relative to the first implementation timed for the same sizes
+        reference.setdefault(key, row["steady_s"])
+        size = f"{row['inputs']}x{row['outputs']}"
+        print(
+            f"{size:>10} {row['batch']:>6} {row['implementation']:>9} "
+            f"{row['compile_s'] * 1e3:>11.1f} {row['program_lines']:>7} "
+            f"{row['steady_s'] * 1e3:>10.3f} {row['batch'] / row['steady_s']:>11.0f} "
+            f"{reference[key] / row['steady_s']:>8.2f}"
+        )
+
+
+def main():
+    args = parse_arguments()
+    arguments = (
+        args.batch_sizes,
+        args.layer_sizes,
+        args.implementations,
+        args.max_unrolled_batch,
+        args.repeat,
+        args.seed,
+    )
+    if args.local:
+        result = benchmark_layers.func(*arguments)
+        print(f"Local stand-in: {result['devices']}")
+        print_rows(result["rows"])
+        return
+    for partition in args.partitions:
+        with Pymonik(
+            endpoint=args.endpoint,
+            partition=partition,
+            environment=ENVIRONMENTS.get(partition, {"pip": ["jax"]}),
+        ):
+            result = benchmark_layers.invoke(*arguments).wait().get()
+        print(f"Partition {partition}: {result['devices']}")
+        print_rows(result["rows"])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 from pymonik import Pymonik, Task, task
 import jax
-import timeit
 import numpy as np
 
 # Just to differenciate the GPU session and the CPU session.
@@ -8,15 +7,35 @@ import numpy as np
 def ref_devices():
     return str(jax.devices())
 
-# Here we apply a simple activation function to a basic layer.
-@jax.jit
-def layer(x, weights, bias):
+# Here we apply a simple activation function to a basic layer, for one input vector.
+def neuron_layer(x, weights, bias):
+    return jax.nn.sigmoid(x @ weights + bias)
+
+# The whole batch at once: the same product applied to a (batch, inputs) matrix gives
+# a single (batch, inputs) @ (inputs, outputs) product, so the compiled program and the
+# number of kernels launched do not grow with the batch.
+def batched_layer(x, weights, bias):
+    return neuron_layer(x, weights, bias)
+
+# The same, written for one input vector and batched by JAX over the rows of x.
+def vmap_layer(x, weights, bias):
+    return jax.vmap(neuron_layer, in_axes=(0, None, None))(x, weights, bias)
+
+# The first version of the layer, kept for the benchmark: the loop is unrolled when the
+# function is traced, so its compile time and its number of kernels grow with the batch,
+# and it returns a list of vectors.
+def unrolled_layer(x, weights, bias):
     output = []
     for i in range(x.shape[0]):
-        output.append(jax.nn.sigmoid(x[i] @ weights + bias))
+        output.append(neuron_layer(x[i], weights, bias))
     return (output)
 
-# We take the jit-ed function to create a AK task.
+# The layer of the tasks, compiled by the worker once per shape of its inputs: the plain
+# function is sent, as jitted functions cannot be lowered once unpickled.
+def layer(x, weights, bias):
+    return jax.jit(batched_layer)(x, weights, bias)
+
+# We take the layer function to create a AK task.
 sigmo_task = Task(layer)
 
 if __name__ == "__main__":
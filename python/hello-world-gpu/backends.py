@@ -0,0 +1,255 @@
+import abc
+import os
+import time
+from typing import Any, Dict, Optional
+
+import numba
+import numpy as np
+from numba import cuda
+
+from buffers import BufferLease
+from kernels import KERNELS
+from profiling import TaskProfile
+
+# Number of values per chunk in the streamed mode, when not given by the payload
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+class ComputeBackend(abc.ABC):
+    """
+    Implementation of the vector addition on a kind of hardware.
+
+    Attributes:
+        name: Name of the backend, as given in COMPUTE_BACKEND.
+    """
+
+    name = ""
+
+    def warm_up(self) -> Dict[str, float]:
+        """
+        Compiles the kernels of the backend, before the first task.
+
+        Returns:
+            Dict[str, float]: The warm-up time in seconds of each kernel.
+        """
+        return {}
+
+    @abc.abstractmethod
+    def vector_add(
+        self,
+        lease: BufferLease,
+        a_host: np.ndarray,
+        b_host: np.ndarray,
+        task_info: Dict[str, Any],
+        profile: TaskProfile,
+    ) -> np.ndarray:
+        """
+        Sums two float32 vectors.
+
+        Args:
+            lease: The lease giving the buffers of the task.
+            a_host: First vector.
+            b_host: Second vector.
+            task_info: The payload of the task, with the launch parameters.
+            profile: The profile of the task, timing its stages.
+
+        Returns:
+            np.ndarray: The sum, which may be a buffer of the lease, valid until it exits.
+        """
+
+
+class CudaBackend(ComputeBackend):
+    name = "cuda"
+
+    def warm_up(self) -> Dict[str, float]:
+        return KERNELS.warm_up()
+
+    def vector_add(
+        self,
+        lease: BufferLease,
+        a_host: np.ndarray,
+        b_host: np.ndarray,
+        task_info: Dict[str, Any],
+        profile: TaskProfile,
+    ) -> np.ndarray:
+        N = len(a_host)
+        if N == 0:
+            # A kernel cannot be launched on an empty grid
+            return np.empty(0, dtype=np.float32)
+        # Define number of threads and blocks
+        threads_per_block = task_info.get("threads_per_block", 1024)
+        stream_count = task_info.get("streams", 0)
+        if stream_count > 0:
+            # Transfers and kernels of the chunks overlap, timed as a single phase
+            with profile.stage("pipeline", stream=0):
+                return self.add_streamed(
+                    lease,
+                    a_host,
+                    b_host,
+                    threads_per_block,
+                    task_info.get("chunk_size", DEFAULT_CHUNK_SIZE),
+                    stream_count,
+                )
+        blocks_per_grid = task_info.get(
+            "blocks_per_grid", (N + (threads_per_block - 1)) // threads_per_block
+        )
+
+        # Transfer data to the device (GPU)
+        with profile.stage("host_to_device", stream=0):
+            a_device = lease.to_device(a_host)
+            b_device = lease.to_device(b_host)
+            c_device = lease.device_array(N, np.float32)
+
+        # CUDA kernel, compiled once per process
+        vector_add = KERNELS["vector_add"]
+
+        with profile.stage("compute", stream=0):
+            # Launch kernel
+            vector_add[blocks_per_grid, threads_per_block](a_device, b_device, c_device)
+            cuda.synchronize()  # Wait for the kernel to finish
+
+        # Copy the result back to the host (CPU), in a pooled page-locked buffer
+        with profile.stage("device_to_host", stream=0):
+            return lease.copy_to_host(c_device)
+
+    @staticmethod
+    def add_streamed(
+        lease: BufferLease,
+        a_host: np.ndarray,
+        b_host: np.ndarray,
+        threads_per_block: int,
+        chunk_size: int,
+        stream_count: int,
+    ) -> np.ndarray:
+        """
+        Sums two vectors by chunks, pipelined on several CUDA streams.
+
+        The copies to the device, the kernel and the copy back to the host of a chunk
+        are queued on one stream, and the chunks are distributed round-robin on the
+        streams, so that the transfers of a chunk overlap the computation of the others.
+        The device buffers of a stream are reused by its successive chunks.
+
+        Args:
+            lease: The lease giving the buffers of the task.
+            a_host: First vector.
+            b_host: Second vector.
+            threads_per_block: Number of threads per block of the kernel.
+            chunk_size: Number of values per chunk.
+            stream_count: Number of CUDA streams.
+
+        Returns:
+            np.ndarray: The sum, in a page-locked buffer of the lease.
+        """
+        N = len(a_host)
+        chunk_size = min(chunk_size, N)
+        stream_count = min(stream_count, (N + chunk_size - 1) // chunk_size)
+        threads_per_block = min(threads_per_block, chunk_size)
+
+        # Asynchronous copies need page-locked host memory
+        a_pinned = lease.pinned(a_host)
+        b_pinned = lease.pinned(b_host)
+        c_pinned = lease.pinned_array(N, np.float32)
+
+        streams = [cuda.stream() for _ in range(stream_count)]
+        device_buffers = [
+            tuple(lease.device_array(chunk_size, np.float32) for _ in range(3))
+            for _ in range(stream_count)
+        ]
+        vector_add = KERNELS["vector_add"]
+        for chunk, start in enumerate(range(0, N, chunk_size)):
+            end = min(start + chunk_size, N)
+            stream = streams[chunk % stream_count]
+            a_device, b_device, c_device = (
+                buffer[: end - start] for buffer in device_buffers[chunk % stream_count]
+            )
+            a_device.copy_to_device(a_pinned[start:end], stream=stream)
+            b_device.copy_to_device(b_pinned[start:end], stream=stream)
+            blocks_per_grid = (end - start + threads_per_block - 1) // threads_per_block
+            vector_add[blocks_per_grid, threads_per_block, stream](
+                a_device, b_device, c_device
+            )
+            c_device.copy_to_host(c_pinned[start:end], stream=stream)
+        for stream in streams:
+            stream.synchronize()
+        return c_pinned
+
+
+@numba.njit(parallel=True, cache=True)
+def _vector_add_parallel(a, b, c):
+    for i in numba.prange(c.size):
+        c[i] = a[i] + b[i]
+
+
+class NumbaCpuBackend(ComputeBackend):
+    name = "numba-cpu"
+
+    def warm_up(self) -> Dict[str, float]:
+        start = time.perf_counter()
+        # Read-only inputs, as the arrays viewing the data dependencies
+        values = np.zeros(1, dtype=np.float32)
+        values.setflags(write=False)
+        _vector_add_parallel(values, values, np.empty_like(values))
+        return {"vector_add_parallel": time.perf_counter() - start}
+
+    def vector_add(
+        self,
+        lease: BufferLease,
+        a_host: np.ndarray,
+        b_host: np.ndarray,
+        task_info: Dict[str, Any],
+        profile: TaskProfile,
+    ) -> np.ndarray:
+        # Runs on the NUMBA_NUM_THREADS threads, all the cores by default
+        with profile.stage("compute"):
+            c_host = np.empty_like(a_host)
+            _vector_add_parallel(a_host, b_host, c_host)
+            return c_host
+
+
+class NumpyBackend(ComputeBackend):
+    name = "numpy"
+
+    def vector_add(
+        self,
+        lease: BufferLease,
+        a_host: np.ndarray,
+        b_host: np.ndarray,
+        task_info: Dict[str, Any],
+        profile: TaskProfile,
+    ) -> np.ndarray:
+        with profile.stage("compute"):
+            return np.add(a_host, b_host)
+
+
+BACKENDS = {
+    backend.name: backend for backend in (CudaBackend, NumbaCpuBackend, NumpyBackend)
+}
+
+
+def select_backend(name: Optional[str] = None) -> ComputeBackend:
+    """
+    Creates the backend given by name, or by the environment, or detected.
+
+    Environment Variables:
+        COMPUTE_BACKEND (str): 'cuda', 'numba-cpu', 'numpy', or 'auto' (the default)
+            to use CUDA when a GPU is available and Numba on the CPU otherwise.
+
+    Args:
+        name: Name of the backend, overriding the environment.
+
+    Returns:
+        ComputeBackend: The backend.
+    """
+    name = name or os.getenv("COMPUTE_BACKEND", "auto")
+    if name == "auto":
+        name = CudaBackend.name if cuda.is_available() else NumbaCpuBackend.name
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown compute backend '{name}', expected 'auto' or one of "
+            + ", ".join(f"'{backend}'" for backend in BACKENDS)
+        )
+    if name == CudaBackend.name and not cuda.is_available():
+        raise RuntimeError(
+            "CUDA is not available. Please check your GPU and driver installation."
+        )
+    return BACKENDS[name]()
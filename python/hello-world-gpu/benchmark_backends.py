@@ -0,0 +1,102 @@
+import argparse
+import timeit
+
+import numpy as np
+from numba import cuda
+
+from backends import BACKENDS, CudaBackend, select_backend
+from buffers import BufferPool
+from metrics import DisabledMetrics
+from profiling import TaskProfile
+
+
+def parse_arguments():
+    """
+    Parse command line arguments
+    Returns:
+    Parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the compute backends of the worker",
+        epilog="This benchmark times the vector addition of each backend, including the transfers of the CUDA backend\n Example : \n python benchmark_backends.py --sizes 1000 1000000 --backends numpy numba-cpu",
+    )
+    parser.add_argument(
+        "--sizes",
+        help="Sizes of the vectors",
+        type=int,
+        nargs="+",
+        default=[1_000, 100_000, 1_000_000, 10_000_000, 100_000_000],
+    )
+    parser.add_argument(
+        "--backends",
+        help="Backends to compare, CUDA is skipped when no GPU is available",
+        choices=list(BACKENDS),
+        nargs="+",
+        default=list(BACKENDS),
+    )
+    parser.add_argument(
+        "--repeat",
+        help="Number of timed runs, the best one is kept",
+        type=int,
+        default=5,
+    )
+    return parser.parse_args()
+
+
+def best_time(function, repeat: int) -> float:
+    """
+    Times a function
+    Args:
+        function: Function without argument to time
+        repeat: Number of timed runs
+
+    Returns:
+        Best time per call in seconds
+    """
+    number = max(1, timeit.Timer(function).autorange()[0])
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def main():
+    args = parse_arguments()
+    names = [
+        name
+        for name in args.backends
+        if name != CudaBackend.name or cuda.is_available()
+    ]
+    backends = [select_backend(name) for name in names]
+    profile = TaskProfile(DisabledMetrics())
+    for backend in backends:
+        backend.warm_up()
+    buffers = BufferPool(max_idle_bytes=1 << 32)
+
+    print(f"{'size':>11} {'backend':>10} {'time (ms)':>10} {'GB/s':>8} {'speedup':>8}")
+    rng = np.random.default_rng(47)
+    for size in args.sizes:
+        # Read-only inputs, as the arrays viewing the data dependencies
+        a = rng.random(size, dtype=np.float32)
+        b = rng.random(size, dtype=np.float32)
+        a.setflags(write=False)
+        b.setflags(write=False)
+        expected = a + b
+        reference = None
+        for backend in backends:
+
+            def vector_add() -> None:
+                with buffers.lease() as lease:
+                    backend.vector_add(lease, a, b, {}, profile)
+
+            with buffers.lease() as lease:
+                assert np.array_equal(
+                    backend.vector_add(lease, a, b, {}, profile), expected
+                )
+            seconds = best_time(vector_add, args.repeat)
+            reference = reference or seconds
+            print(
+                f"{size:>11} {backend.name:>10} {seconds * 1e3:>10.3f} "
+                f"{3 * a.nbytes / seconds / 1e9:>8.2f} {reference / seconds:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+from numba import cuda
+from numba.cuda.cudadrv.driver import CudaAPIError
+
+# Smallest buffer, in number of values, so that small tasks share the same size class
+MIN_CAPACITY = 1024
+# Size classes between two powers of two are 2**SUBCLASS_BITS steps apart, so that a
+# buffer is less than 25% larger than the array it holds
+SUBCLASS_BITS = 2
+
+
+def size_class(size: int) -> int:
+    """
+    Gets the capacity of the buffers used for arrays of a given size.
+
+    Args:
+        size: Number of values of the array.
+
+    Returns:
+        int: The smallest size class greater or equal to size: MIN_CAPACITY, then four
+            classes between two successive powers of two.
+    """
+    if size <= MIN_CAPACITY:
+        return MIN_CAPACITY
+    step = 1 << ((size - 1).bit_length() - 1 - SUBCLASS_BITS)
+    return (size + step - 1) // step * step
+
+
+class BufferPool:
+    def __init__(self, max_idle_bytes: int, reserve_bytes: int = 0):
+        """
+        Initializes a BufferPool instance.
+
+        This class keeps the device buffers and the page-locked host buffers used by the
+        tasks of the worker, grouped by size class, so that they are reused by the next
+        tasks instead of being allocated again.
+
+        Args:
+            max_idle_bytes: Maximum number of bytes of each kind of buffers kept unused
+                in the pool, the least recently used buffers are freed beyond. A larger
+                buffer is kept alone, for the next task of its size.
+            reserve_bytes: Device memory left free for the other allocations of the
+                process, idle device buffers are freed when an allocation would use it.
+        """
+        self.max_idle_bytes = max_idle_bytes
+        self.reserve_bytes = reserve_bytes
+        # Unused buffers by (kind, dtype, capacity), in least recently used order
+        self._idle: "OrderedDict[Tuple[str, np.dtype, int], List]" = OrderedDict()
+        self._idle_bytes = {"device": 0, "pinned": 0}
+        self.allocations = 0
+        self.allocated_bytes = 0
+        self.reuses = 0
+        self.reused_bytes = 0
+        self.evictions = 0
+        # The local agent may run several tasks of the worker concurrently
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls) -> "BufferPool":
+        """
+        Creates a pool configured by the environment.
+
+        Environment Variables:
+            GPU_POOL_MAX_IDLE_BYTES (int): Maximum number of bytes of each kind of unused
+                buffers kept in the pool, 1 GiB by default.
+            GPU_POOL_RESERVE_BYTES (int): Device memory left free for the other
+                allocations, 256 MiB by default.
+
+        Returns:
+            BufferPool: The pool.
+        """
+        return cls(
+            max_idle_bytes=int(os.getenv("GPU_POOL_MAX_IDLE_BYTES", 1 << 30)),
+            reserve_bytes=int(os.getenv("GPU_POOL_RESERVE_BYTES", 256 << 20)),
+        )
+
+    def lease(self) -> "BufferLease":
+        """
+        Starts a lease, returning its buffers to the pool when it exits.
+
+        Returns:
+            BufferLease: Context manager giving the buffers of a task.
+        """
+        return BufferLease(self)
+
+    def acquire(self, kind: str, size: int, dtype: np.dtype):
+        """
+        Gets a buffer from the pool, or allocates it.
+
+        Args:
+            kind: 'device' for device memory, 'pinned' for page-locked host memory.
+            size: Number of values of the buffer.
+            dtype: Type of the values.
+
+        Returns:
+            The buffer, of capacity size_class(size), which may be larger than size.
+        """
+        with self._lock:
+            return self._acquire(kind, size, dtype)
+
+    def _acquire(self, kind: str, size: int, dtype: np.dtype):
+        dtype = np.dtype(dtype)
+        key = (kind, dtype, size_class(size))
+        nbytes = key[2] * dtype.itemsize
+        idle = self._idle.get(key)
+        if idle:
+            buffer = idle.pop()
+            if not idle:
+                del self._idle[key]
+            self._idle_bytes[kind] -= nbytes
+            self.reuses += 1
+            self.reused_bytes += nbytes
+            return buffer
+
+        if kind == "device":
+            buffer = self._allocate_device(key[2], dtype, nbytes)
+        else:
+            buffer = cuda.pinned_array(key[2], dtype=dtype)
+        self.allocations += 1
+        self.allocated_bytes += nbytes
+        return buffer
+
+    def release(self, kind: str, buffer) -> None:
+        """
+        Returns a buffer to the pool.
+
+        Args:
+            kind: Kind of the buffer, as given to acquire.
+            buffer: The buffer returned by acquire.
+        """
+        with self._lock:
+            key = (kind, buffer.dtype, buffer.size)
+            self._idle.setdefault(key, []).append(buffer)
+            self._idle.move_to_end(key)
+            self._idle_bytes[kind] += buffer.nbytes
+            # The buffer returned last stays, even beyond the limit, as it is the one
+            # the tasks of the largest sizes reuse
+            while (
+                self._idle_bytes[kind] > self.max_idle_bytes
+                and self._idle_bytes[kind] > buffer.nbytes
+            ):
+                self._evict(kind)
+
+    def _evict(self, kind: str) -> bool:
+        """
+        Frees the least recently used idle buffer of a kind, with the lock held.
+
+        Args:
+            kind: Kind of the buffer to free.
+
+        Returns:
+            bool: False if there was no idle buffer of this kind.
+        """
+        for key, idle in self._idle.items():
+            if key[0] == kind:
+                buffer = idle.pop()
+                if not idle:
+                    del self._idle[key]
+                self._idle_bytes[kind] -= buffer.nbytes
+                self.evictions += 1
+                return True
+        return False
+
+    def _allocate_device(self, capacity: int, dtype: np.dtype, nbytes: int):
+        context = cuda.current_context()
+        # Free idle buffers rather than using the memory left to the other allocations
+        while context.get_memory_info().free < nbytes + self.reserve_bytes:
+            if not self._evict("device"):
+                break
+            self._deallocate(context)
+        try:
+            return cuda.device_array(capacity, dtype=dtype)
+        except CudaAPIError:
+            # Out of memory: free every idle buffer and try again
+            while self._evict("device"):
+                pass
+            self._deallocate(context)
+            return cuda.device_array(capacity, dtype=dtype)
+
+    @staticmethod
+    def _deallocate(context) -> None:
+        # Numba defers the deallocations, run them now so that the memory is available
+        deallocations = getattr(context, "deallocations", None)
+        if deallocations is not None:
+            deallocations.clear()
+
+    def statistics(self) -> Dict[str, int]:
+        """
+        Gets the allocation statistics of the pool since its creation.
+
+        Returns:
+            Dict[str, int]: The statistics, by name.
+        """
+        return {
+            "allocations": self.allocations,
+            "allocated_bytes": self.allocated_bytes,
+            "reuses": self.reuses,
+            "reused_bytes": self.reused_bytes,
+            "evictions": self.evictions,
+            "idle_device_bytes": self._idle_bytes["device"],
+            "idle_pinned_bytes": self._idle_bytes["pinned"],
+        }
+
+
+class BufferLease:
+    def __init__(self, pool: BufferPool):
+        """
+        Initializes a BufferLease instance.
+
+        This class gives the buffers used by a task, as views of the size requested on
+        the buffers of the pool, and returns them to the pool when it exits.
+
+        Args:
+            pool: The pool of the buffers.
+        """
+        self.pool = pool
+        self._buffers: List[Tuple[str, object]] = []
+        self._start: Dict[str, int] = {}
+
+    def __enter__(self) -> "BufferLease":
+        self._start = self.pool.statistics()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        while self._buffers:
+            self.pool.release(*self._buffers.pop())
+
+    def _acquire(self, kind: str, size: int, dtype: np.dtype):
+        buffer = self.pool.acquire(kind, size, dtype)
+        self._buffers.append((kind, buffer))
+        return buffer[:size]
+
+    def device_array(self, size: int, dtype: np.dtype):
+        """
+        Gets a device array.
+
+        Args:
+            size: Number of values of the array.
+            dtype: Type of the values.
+
+        Returns:
+            The device array, with uninitialized values.
+        """
+        return self._acquire("device", size, dtype)
+
+    def pinned_array(self, size: int, dtype: np.dtype) -> np.ndarray:
+        """
+        Gets a page-locked host array.
+
+        Args:
+            size: Number of values of the array.
+            dtype: Type of the values.
+
+        Returns:
+            np.ndarray: The host array, with uninitialized values.
+        """
+        return self._acquire("pinned", size, dtype)
+
+    def pinned(self, host: np.ndarray) -> np.ndarray:
+        """
+        Gets the values of a host array in page-locked memory.
+
+        Args:
+            host: The one-dimensional array.
+
+        Returns:
+            np.ndarray: The array itself if it is in a page-locked buffer of the lease,
+                such as an input decoded into pinned_array, or else a copy of it in a
+                page-locked buffer.
+        """
+        for kind, buffer in self._buffers:
+            if kind == "pinned" and np.may_share_memory(host, buffer):
+                return host
+        staging = self.pinned_array(host.size, host.dtype)
+        staging[:] = host
+        return staging
+
+    def to_device(self, host: np.ndarray):
+        """
+        Copies a host array to a device array, staged through a page-locked buffer
+        unless it already is in one.
+
+        Args:
+            host: The one-dimensional array to copy.
+
+        Returns:
+            The device array.
+        """
+        device = self.device_array(host.size, host.dtype)
+        device.copy_to_device(self.pinned(host))
+        return device
+
+    def copy_to_host(self, device) -> np.ndarray:
+        """
+        Copies a device array to a page-locked host array.
+
+        The host array is returned to the pool with the lease, and must not be used
+        after it exits.
+
+        Args:
+            device: The one-dimensional device array to copy.
+
+        Returns:
+            np.ndarray: The host array.
+        """
+        host = self.pinned_array(device.size, device.dtype)
+        device.copy_to_host(host)
+        return host
+
+    def statistics(self) -> Dict[str, int]:
+        """
+        Gets the allocation statistics of the pool since the lease started.
+
+        Returns:
+            Dict[str, int]: The statistics, by name, and the idle bytes of the pool.
+        """
+        statistics = self.pool.statistics()
+        for name in (
+            "allocations",
+            "allocated_bytes",
+            "reuses",
+            "reused_bytes",
+            "evictions",
+        ):
+            statistics[name] -= self._start[name]
+        return statistics
@@ -0,0 +1,86 @@
+import os
+
+# Runs the CUDA backend on the Numba CUDA simulator unless told otherwise, set before
+# Numba is imported
+os.environ.setdefault("NUMBA_ENABLE_CUDASIM", "1")
+
+import argparse
+import sys
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from backends import BACKENDS, select_backend
+from buffers import BufferPool
+from metrics import DisabledMetrics
+from profiling import TaskProfile
+
+# Sizes of the vectors and payloads of the checked tasks
+CASES: List[Tuple[int, Dict[str, Any]]] = [
+    (0, {}),
+    (1, {}),
+    (1_000, {}),
+    (1_000, {"threads_per_block": 96}),
+    # Streamed mode, on chunk sizes which do not divide the size
+    (0, {"streams": 2, "chunk_size": 1_000}),
+    (10_007, {"streams": 3, "chunk_size": 1_000}),
+    # More streams than chunks
+    (2_500, {"streams": 8, "chunk_size": 1_000}),
+    # A single chunk, smaller than the chunk size
+    (100, {"streams": 2, "chunk_size": 1_000}),
+    (1_000, {"streams": 2, "chunk_size": 300, "threads_per_block": 128}),
+]
+
+
+def parse_arguments():
+    """
+    Parse command line arguments
+    Returns:
+    Parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Checks the compute backends of the worker against NumPy",
+        epilog="The CUDA backend runs on the Numba CUDA simulator, set NUMBA_ENABLE_CUDASIM=0 to check it on a GPU\n Example : \n python check_backends.py --backends cuda numpy",
+    )
+    parser.add_argument(
+        "--backends",
+        help="Backends to check",
+        choices=list(BACKENDS),
+        nargs="+",
+        default=list(BACKENDS),
+    )
+    parser.add_argument("--seed", help="Random seed", type=int, default=47)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    profile = TaskProfile(DisabledMetrics())
+    buffers = BufferPool(max_idle_bytes=1 << 28)
+    rng = np.random.default_rng(args.seed)
+    failures = 0
+    for name in args.backends:
+        backend = select_backend(name)
+        backend.warm_up()
+        for size, task_info in CASES:
+            # Read-only inputs, as the arrays viewing the data dependencies
+            a = rng.random(size, dtype=np.float32)
+            b = rng.random(size, dtype=np.float32)
+            a.setflags(write=False)
+            b.setflags(write=False)
+            try:
+                with buffers.lease() as lease:
+                    c = np.array(backend.vector_add(lease, a, b, task_info, profile))
+                ok = c.shape == a.shape and np.array_equal(c, a + b)
+                status = "ok" if ok else "wrong sum"
+            except Exception as e:
+                ok = False
+                status = f"{type(e).__name__}: {e}"
+            failures += not ok
+            print(f"{backend.name:>10} {size:>7} {str(task_info):<56} {status}")
+    print(f"{failures} failed" if failures else "All the backends match NumPy")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,25 @@
 import argparse
+import json
 import logging
+import math
+import os
+import time
 import grpc
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from typing import Dict, List, Optional, Tuple, Union
 from armonik.client import ArmoniKResults, ArmoniKSessions, ArmoniKTasks, ArmoniKEvents
 from armonik.common import TaskDefinition, TaskOptions
 import numpy as np
-from common import NameIdDict, NumpyArraySerializer
+from common import NameIdDict, NumpyArraySerializer, summarize_profiles
+from compression import CODECS
+from result_cache import (
+    DEFAULT_MAX_BYTES,
+    ResultCache,
+    image_sources,
+    source_version,
+)
+from upload_index import UploadIndex, content_digest
 
 # Configure logging
 logging.basicConfig(
@@ -13,8 +27,57 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Concurrent uploads and downloads of the shards
+TRANSFER_THREADS = 8
+# Dockerfile of the worker, whose Python files give its version when it is not set
+WORKER_DOCKERFILE = "dockerfile"
+
+
+def upload_input(
+    result_client: ArmoniKResults,
+    session_id: str,
+    index: UploadIndex,
+    name: str,
+    data: bytes,
+) -> str:
+    """
+    Uploads an input of the tasks, unless identical data was uploaded in the session.
+
+    Args:
+        result_client: The client of the results service.
+        session_id: The id of the session holding the input.
+        index: The index of the data uploaded in the session.
+        name: The name of the result created for the input.
+        data: The data of the input.
+
+    Returns:
+        str: The id of the result holding the data.
+    """
+
+    def create() -> str:
+        result_id = result_client.create_results_metadata(
+            result_names=[name], session_id=session_id
+        )[name].result_id
+        result_client.upload_result_data(
+            result_id=result_id, session_id=session_id, result_data=data
+        )
+        return result_id
+
+    return index.upload(content_digest([data]), len(data), create)
 
-def run(endpoint: str, partition: str, size: int, seed: int) -> None:
+
+def run(
+    endpoint: str,
+    partition: str,
+    size: int,
+    seed: int,
+    streams: int = 0,
+    chunk_size: int = 1 << 20,
+    profile: bool = False,
+    compression: Optional[str] = None,
+    cache: Optional[ResultCache] = None,
+    worker_version: Optional[str] = None,
+) -> None:
     """
     Connects to the ArmoniK control plane via a gRPC channel and performs a series of tasks.
 
@@ -23,10 +86,48 @@ def run(endpoint: str, partition: str, size: int, seed: int) -> None:
         partition: The name of the partition to which tasks are submitted.
         size: The size of the two vectors.
         seed: A seed value used for initializing random number generation.
+        streams: Number of CUDA streams of the streamed mode, 0 disables it.
+        chunk_size: Number of values per chunk in the streamed mode.
+        profile: Whether the task sends the time of its stages, printed as a table.
+        compression: Codec compressing the vectors, both ways, or None.
+        cache: Result cache in which the result is looked up before creating a session,
+            and stored after its download, or None.
+        worker_version: Version of the worker in the key of the result, a digest of
+            the worker files copied by the dockerfile by default.
 
     Example:
         run("172.24.55.197:5001", "default", 1000000, 47)
     """
+    # Arrays
+    # Set the seed for reproducibility
+    np.random.seed(seed)
+    a_host = np.random.rand(size).astype(np.float32)
+    b_host = np.random.rand(size).astype(np.float32)
+
+    cache_key = None
+    if cache is not None:
+        directory = os.path.dirname(os.path.abspath(__file__))
+        worker_version = worker_version or source_version(
+            os.path.join(directory, source)
+            for source in image_sources(os.path.join(directory, WORKER_DOCKERFILE))
+        )
+        # The sum only depends on the vectors, not on the way the task computes it
+        cache_key = ResultCache.key(
+            "hello-world-gpu",
+            worker_version,
+            content_digest([a_host.tobytes()]),
+            content_digest([b_host.tobytes()]),
+        )
+        serialized_result = cache.get(cache_key)
+        if serialized_result is not None:
+            final_result = NumpyArraySerializer.deserialize(serialized_result).array
+            logger.info(
+                "Result found in the cache",
+                extra={"context": {"data": final_result}},
+            )
+            logger.info(f"Result cache: {cache.summary()}")
+            return
+
     # Create gRPC channel to connect with ArmoniK control plane
     with grpc.insecure_channel(endpoint) as channel:
         # Create client for task submission
@@ -55,46 +156,55 @@ def run(endpoint: str, partition: str, size: int, seed: int) -> None:
         )
         logger.info("Create session", extra={"context": {"sessionId": session_id}})
         # Create the result metadata and keep the id for task submission
+        result_names = ["output", "payload"]
+        if profile:
+            # The profile of the task is sent as a second result
+            result_names.append("profile")
         results = result_client.create_results_metadata(
-            result_names=["array1", "array2", "output", "payload"],
+            result_names=result_names,
             session_id=session_id,
         )
 
         # Get the results ids
-        array1_id = results["array1"].result_id
-        array2_id = results["array2"].result_id
         output_id = results["output"].result_id
         payload_id = results["payload"].result_id
+        expected_output_ids = [output_id]
+        if profile:
+            profile_id = results["profile"].result_id
+            expected_output_ids.append(profile_id)
 
-        # Arrays
-        # Set the seed for reproducibility
-        np.random.seed(seed)
-        a_host = np.random.rand(size).astype(np.float32)
-        b_host = np.random.rand(size).astype(np.float32)
-
-        # Create the metadata (a result) and upload data at the same time
-        result_client.upload_result_data(
-            result_id=array1_id,
-            session_id=session_id,
-            result_data=NumpyArraySerializer(a_host).serialize(),
-        )
-        result_client.upload_result_data(
-            result_id=array2_id,
-            session_id=session_id,
-            result_data=NumpyArraySerializer(b_host).serialize(),
+        # Upload the arrays, identical arrays are uploaded once
+        index = UploadIndex()
+        array1_id, array2_id = (
+            upload_input(
+                result_client,
+                session_id,
+                index,
+                name,
+                NumpyArraySerializer(array).serialize(compression),
+            )
+            for name, array in (("array1", a_host), ("array2", b_host))
         )
-        logger.info("data uploaded")
+        logger.info(f"data uploaded: {index.summary()}")
+
+        task_info = {
+            "array1": array1_id,
+            "array2": array2_id,
+            "output": output_id,
+            "threads_per_block": 1024,
+            "blocks_per_grid": (size + (1024 - 1)) // 1024,
+        }
+        if streams > 0:
+            # Pipeline the transfers and the kernels of chunks on several streams
+            task_info.update(streams=streams, chunk_size=chunk_size)
+        if profile:
+            task_info["profile"] = 1
+        if compression is not None:
+            # The result is compressed as well
+            task_info["compression"] = compression
 
         # Creating a NameIdDict instance
-        name_id_mapping = NameIdDict(
-            {
-                "array1": array1_id,
-                "array2": array2_id,
-                "output": output_id,
-                "threads_per_block": 1024,
-                "blocks_per_grid": (size + (1024 - 1)) // 1024,
-            }
-        )
+        name_id_mapping = NameIdDict(task_info)
 
         # Serializing the instance
         serialized_name_id_mapping = name_id_mapping.serialize()
@@ -112,7 +222,7 @@ def run(endpoint: str, partition: str, size: int, seed: int) -> None:
             tasks=[
                 TaskDefinition(
                     data_dependencies=[array1_id, array2_id],
-                    expected_output_ids=[output_id],
+                    expected_output_ids=expected_output_ids,
                     payload_id=payload_id,
                 )
             ],
@@ -122,7 +232,7 @@ def run(endpoint: str, partition: str, size: int, seed: int) -> None:
         # Wait for task end and result availability
         try:
             events_client.wait_for_result_availability(
-                result_ids=[output_id], session_id=session_id
+                result_ids=expected_output_ids, session_id=session_id
             )
         except Exception as e:
             logger.error("An error occured", extra={"context": {"error": e}})
@@ -136,12 +246,214 @@ def run(endpoint: str, partition: str, size: int, seed: int) -> None:
                 "Result ready",
                 extra={"context": {"resultId": output_id, "data": final_result}},
             )
+            if cache is not None:
+                cache.put(cache_key, serialized_result)
+                logger.info(f"Result cache: {cache.summary()}")
+            if profile:
+                breakdown = json.loads(
+                    result_client.download_result_data(profile_id, session_id)
+                )
+                print(summarize_profiles([breakdown]))
         except Exception as e:
             logger.error("An error occured", extra={"context": {"error": e.details}})
 
     logger.info("End Connection!")
 
 
+def shard_bounds(size: int, partitions: int) -> List[Tuple[int, int]]:
+    """
+    Splits the vectors into partitions of sizes differing by at most one.
+
+    Args:
+        size: The size of the vectors.
+        partitions: The number of partitions.
+
+    Returns:
+        List[Tuple[int, int]]: The start and end of each partition.
+    """
+    bounds = [size * i // partitions for i in range(partitions + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def run_partitioned(
+    channel: grpc.Channel,
+    session_id: str,
+    a_host: np.ndarray,
+    b_host: np.ndarray,
+    partitions: int,
+    extra_info: Dict[str, Union[str, int]],
+    index: UploadIndex,
+) -> Tuple[np.ndarray, Dict[str, float], List[Dict]]:
+    """
+    Sums two vectors with one task per partition, and assembles the result.
+
+    Args:
+        channel: The gRPC channel to the ArmoniK control plane.
+        session_id: The id of the session to which tasks are submitted.
+        a_host: First vector.
+        b_host: Second vector.
+        partitions: The number of partitions, and of tasks.
+        extra_info: Additional entries of the payload of the tasks, with 'profile' set
+            for the tasks to send the time of their stages, and 'compression' to
+            compress the vectors, both ways.
+        index: The index of the data uploaded in the session, shards identical to
+            uploaded ones are not uploaded again.
+
+    Returns:
+        Tuple[np.ndarray, Dict[str, float], List[Dict]]: The sum, the time in seconds of
+            each step of the execution, and the profiles of the tasks if requested.
+    """
+    result_client = ArmoniKResults(channel)
+    task_client = ArmoniKTasks(channel)
+    events_client = ArmoniKEvents(channel)
+    bounds = shard_bounds(len(a_host), partitions)
+    compression = extra_info.get("compression")
+    timings = {}
+
+    start = time.perf_counter()
+    # The profile of each task is sent as a second result
+    outputs = ("output", "profile") if extra_info.get("profile") else ("output",)
+    names = [f"{name}_{i}" for i in range(partitions) for name in ("payload", *outputs)]
+    results = result_client.create_results_metadata(
+        result_names=names, session_id=session_id
+    )
+    ids = {name: result.result_id for name, result in results.items()}
+
+    def upload(shard: int) -> None:
+        begin, end = bounds[shard]
+        for name, array in (("array1", a_host), ("array2", b_host)):
+            ids[f"{name}_{shard}"] = upload_input(
+                result_client,
+                session_id,
+                index,
+                f"{name}_{shard}",
+                NumpyArraySerializer(array[begin:end]).serialize(compression),
+            )
+        task_info = {
+            "array1": ids[f"array1_{shard}"],
+            "array2": ids[f"array2_{shard}"],
+            "output": ids[f"output_{shard}"],
+            **extra_info,
+        }
+        result_client.upload_result_data(
+            result_id=ids[f"payload_{shard}"],
+            session_id=session_id,
+            result_data=NameIdDict(task_info).serialize(),
+        )
+
+    with ThreadPoolExecutor(min(TRANSFER_THREADS, partitions)) as executor:
+        list(executor.map(upload, range(partitions)))
+    timings["upload"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    task_client.submit_tasks(
+        session_id=session_id,
+        tasks=[
+            TaskDefinition(
+                data_dependencies=[ids[f"array1_{i}"], ids[f"array2_{i}"]],
+                expected_output_ids=[ids[f"{name}_{i}"] for name in outputs],
+                payload_id=ids[f"payload_{i}"],
+            )
+            for i in range(partitions)
+        ],
+    )
+    output_ids = [ids[f"output_{i}"] for i in range(partitions)]
+    events_client.wait_for_result_availability(
+        result_ids=[ids[f"{name}_{i}"] for i in range(partitions) for name in outputs],
+        session_id=session_id,
+    )
+    timings["compute"] = time.perf_counter() - start
+
+    # Each shard is copied once, from the downloaded bytes into its slice of the output
+    start = time.perf_counter()
+    output = np.empty(len(a_host), dtype=np.float32)
+
+    def download(shard: int) -> None:
+        begin, end = bounds[shard]
+        data = result_client.download_result_data(output_ids[shard], session_id)
+        output[begin:end] = NumpyArraySerializer.deserialize(data).array
+
+    with ThreadPoolExecutor(min(TRANSFER_THREADS, partitions)) as executor:
+        list(executor.map(download, range(partitions)))
+    timings["download"] = time.perf_counter() - start
+
+    profiles = [
+        json.loads(result_client.download_result_data(ids[f"profile_{i}"], session_id))
+        for i in range(partitions)
+        if "profile" in outputs
+    ]
+    return output, timings, profiles
+
+
+def run_scaling(
+    endpoint: str,
+    partition: str,
+    size: int,
+    seed: int,
+    partitions: List[int],
+    extra_info: Dict[str, Union[str, int]],
+) -> None:
+    """
+    Sums two vectors with each number of partitions, and reports the scaling.
+
+    Args:
+        endpoint: The endpoint for the connection to ArmoniK control plane.
+        partition: The name of the partition to which tasks are submitted.
+        size: The size of the two vectors.
+        seed: A seed value used for initializing random number generation.
+        partitions: The numbers of partitions to run, one after the other.
+        extra_info: Additional entries of the payload of the tasks.
+    """
+    np.random.seed(seed)
+    a_host = np.random.rand(size).astype(np.float32)
+    b_host = np.random.rand(size).astype(np.float32)
+    expected = a_host + b_host
+
+    with grpc.insecure_channel(endpoint) as channel:
+        task_options = TaskOptions(
+            max_duration=timedelta(hours=1),
+            max_retries=2,
+            priority=1,
+            partition_id=partition,
+        )
+        session_id = ArmoniKSessions(channel).create_session(
+            task_options, partition_ids=[partition]
+        )
+        logger.info("Create session", extra={"context": {"sessionId": session_id}})
+
+        rows = []
+        # Shards of the same bounds are uploaded once for the whole session
+        index = UploadIndex()
+        for count in partitions:
+            start = time.perf_counter()
+            output, timings, profiles = run_partitioned(
+                channel, session_id, a_host, b_host, count, extra_info, index
+            )
+            total = time.perf_counter() - start
+            if not np.array_equal(output, expected):
+                logger.error("Wrong result", extra={"context": {"partitions": count}})
+            rows.append((count, total, timings))
+            if profiles:
+                print(f"Profile of the {count} tasks")
+                print(summarize_profiles(profiles))
+            logger.info(
+                "Partitioned run done",
+                extra={"context": {"partitions": count, "time": total, **timings}},
+            )
+        logger.info(f"Uploads: {index.summary()}")
+
+    print(
+        f"{'P':>6} {'upload s':>9} {'compute s':>10} {'download s':>11} "
+        f"{'total s':>8} {'Mvalues/s':>10} {'speedup':>8}"
+    )
+    for count, total, timings in rows:
+        print(
+            f"{count:>6} {timings['upload']:>9.3f} {timings['compute']:>10.3f} "
+            f"{timings['download']:>11.3f} {total:>8.3f} {size / total / 1e6:>10.2f} "
+            f"{rows[0][1] / total:>8.2f}"
+        )
+
+
 def main() -> None:
     """
     Parses command-line arguments and runs the Hello World demo for ArmoniK.
@@ -179,8 +491,105 @@ def main() -> None:
         help="Seed for generating random vectors.",
     )
 
+    parser.add_argument(
+        "--streams",
+        type=int,
+        default=0,
+        help="Number of CUDA streams of the streamed mode, 0 disables it.",
+    )
+
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1 << 20,
+        help="Number of values per chunk in the streamed mode.",
+    )
+
+    parser.add_argument(
+        "--partitions",
+        type=int,
+        nargs="+",
+        help="Shard the vectors into this number of tasks. With several numbers, runs each of them and reports the scaling.",
+    )
+
+    parser.add_argument(
+        "--shard-size",
+        type=int,
+        help="Shard the vectors into tasks of at most this number of values, when --partitions is not given.",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile the tasks and print the time of their stages.",
+    )
+
+    parser.add_argument(
+        "--compression",
+        choices=["auto", *CODECS],
+        help="Compress the vectors and the result with this codec, or choose it from a sample of the data with auto.",
+    )
+
+    parser.add_argument(
+        "--cache",
+        type=str,
+        help="Directory of the result cache: the result of vectors already summed is read from it without creating a session. Ignored with --profile and when sharding.",
+    )
+
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_BYTES,
+        help="Maximum size in bytes of the results stored in the cache, the least recently used ones are removed.",
+    )
+
+    parser.add_argument(
+        "--worker-version",
+        type=str,
+        help="Version of the worker in the keys of the cache, by default a digest of the worker files copied by the dockerfile next to the client.",
+    )
+
     parsed_args = parser.parse_args()
-    run(parsed_args.endpoint, parsed_args.partition, parsed_args.size, parsed_args.seed)
+    partitions: Optional[List[int]] = parsed_args.partitions
+    if partitions is None and parsed_args.shard_size is not None:
+        partitions = [max(1, math.ceil(parsed_args.size / parsed_args.shard_size))]
+    if partitions is None:
+        cache = None
+        if parsed_args.cache is not None and not parsed_args.profile:
+            # A profiled run is meant to run the task
+            cache = ResultCache(parsed_args.cache, parsed_args.cache_size)
+        run(
+            parsed_args.endpoint,
+            parsed_args.partition,
+            parsed_args.size,
+            parsed_args.seed,
+            parsed_args.streams,
+            parsed_args.chunk_size,
+            parsed_args.profile,
+            parsed_args.compression,
+            cache,
+            parsed_args.worker_version,
+        )
+        return
+    if min(partitions) < 1 or max(partitions) > parsed_args.size:
+        parser.error("The number of partitions must be between 1 and the size")
+    extra_info = {"threads_per_block": 1024}
+    if parsed_args.streams > 0:
+        extra_info.update(
+            streams=parsed_args.streams, chunk_size=parsed_args.chunk_size
+        )
+    if parsed_args.profile:
+        extra_info["profile"] = 1
+    if parsed_args.compression is not None:
+        extra_info["compression"] = parsed_args.compression
+    run_scaling(
+        parsed_args.endpoint,
+        parsed_args.partition,
+        parsed_args.size,
+        parsed_args.seed,
+        partitions,
+        extra_info,
+    )
 
 
 if __name__ == "__main__":
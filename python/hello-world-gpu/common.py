@@ -1,10 +1,148 @@
-from typing import Dict
+from array import array
+from itertools import accumulate
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 import json
+import struct
+import sys
 import numpy as np
 
+from compression import (
+    compress,
+    decompress,
+    decompress_into,
+    decompressed_size,
+    is_frame,
+)
+from tensors import TensorBundle, is_tensor_bundle
+
+# Binary layout: a fixed header, the sizes then the UTF-8 data of the names and string
+# values, the integer values, then the sizes and the data of the bytes values
+# The magic byte is never the first byte of a JSON payload
+BINARY_MAGIC = b"\0"
+BINARY_VERSION = 2
+# Magic, version, numbers of string, integer and bytes values
+_HEADER = struct.Struct("<cBHHH")
+MAX_VALUES = 0xFFFF
+
+Value = Union[str, int, bytes]
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _read_array(typecode: str, data: memoryview, count: int) -> array:
+    values = array(typecode)
+    values.frombytes(data[: count * values.itemsize])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _read_text(payload: bytes, offset: int, count: int) -> Tuple[List[str], int]:
+    sizes = _read_array("I", memoryview(payload)[offset:], count)
+    offset += count * sizes.itemsize
+    bounds = list(accumulate(sizes, initial=0))
+    encoded = payload[offset : offset + bounds[-1]]
+    text = encoded.decode("utf-8")
+    # ASCII text has its characters at the offsets of their bytes
+    source = text if len(text) == len(encoded) else encoded
+    texts = [source[start:end] for start, end in zip(bounds, bounds[1:])]
+    if source is encoded:
+        texts = [data.decode("utf-8") for data in texts]
+    return texts, offset + bounds[-1]
+
+
+def encode_entries(entries: Iterable[Tuple[str, Value]]) -> bytes:
+    """
+    Encodes named values to the binary layout.
+
+    Entries are grouped by type so that decoding reads integers and bytes as arrays,
+    instead of parsing every entry. Names and string values are written with their size,
+    so they can hold any character.
+
+    Args:
+        entries: Names and values, the values are strings, integers or bytes.
+
+    Returns:
+        bytes: The encoded entries, header included.
+
+    Raises:
+        ValueError: If there are more than MAX_VALUES values of a type.
+    """
+    strings, integers, raw = [], [], []
+    for entry in entries:
+        value = entry[1]
+        if isinstance(value, str):
+            strings.append(entry)
+        elif isinstance(value, int):
+            integers.append(entry)
+        else:
+            raw.append(entry)
+    if max(len(strings), len(integers), len(raw)) > MAX_VALUES:
+        raise ValueError(f"At most {MAX_VALUES} values of each type can be encoded")
+    texts = [name for name, _ in strings + integers + raw] + [
+        value for _, value in strings
+    ]
+    text = "".join(texts).encode("utf-8")
+    if len(text) != sum(map(len, texts)):
+        # Non-ASCII texts, their sizes are those of their own encodings
+        texts = [string.encode("utf-8") for string in texts]
+    header = _HEADER.pack(
+        BINARY_MAGIC, BINARY_VERSION, len(strings), len(integers), len(raw)
+    )
+    return b"".join(
+        [
+            header,
+            _little_endian(array("I", map(len, texts))),
+            text,
+            _little_endian(array("q", [value for _, value in integers])),
+            _little_endian(array("I", [len(value) for _, value in raw])),
+            *[value for _, value in raw],
+        ]
+    )
+
+
+def decode_entries(
+    payload: bytes,
+) -> Tuple[Dict[str, Union[str, int]], Dict[str, bytes]]:
+    """
+    Decodes named values from the binary layout.
+
+    Args:
+        payload: The encoded entries, header included.
+
+    Returns:
+        Tuple[Dict[str, Union[str, int]], Dict[str, bytes]]: The string and integer values
+            by name, and the bytes values by name.
+
+    Raises:
+        ValueError: If the payload was encoded by an unsupported version.
+    """
+    _, version, string_count, integer_count, bytes_count = _HEADER.unpack_from(payload)
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported NameIdDict binary version {version}")
+    count = string_count + integer_count + bytes_count
+    texts, offset = _read_text(payload, _HEADER.size, count + string_count)
+    data = memoryview(payload)[offset:]
+    integers = _read_array("q", data, integer_count)
+    data = data[integer_count * integers.itemsize :]
+    lengths = _read_array("I", data, bytes_count)
+    offset = bytes_count * lengths.itemsize
+    raw = []
+    for length in lengths:
+        raw.append(bytes(data[offset : offset + length]))
+        offset += length
+    values = dict(
+        zip(texts[: string_count + integer_count], texts[count:] + integers.tolist())
+    )
+    return values, dict(zip(texts[string_count + integer_count : count], raw))
+
 
 class NameIdDict:
-    def __init__(self, data: Dict[str, str]):
+    def __init__(self, data: Dict[str, Union[str, int]]):
         """
         Initializes a NameIdDict instance.
 
@@ -12,28 +150,58 @@ class NameIdDict:
         and the values are their associated IDs.
 
         Args:
-            data: Dictionary with result names as keys and their associated IDs as values.
+            data: Dictionary with result names as keys and their associated IDs as values,
+                along with integer launch parameters such as threads_per_block.
         """
         self.data = data
 
-    def serialize(self) -> bytes:
+    def serialize(
+        self, codec: str = "binary", compression: Optional[str] = None
+    ) -> bytes:
         """
-        Serializes the dictionary to a JSON-encoded byte array.
+        Serializes the dictionary to a byte array.
 
-        This method converts the dictionary to a JSON string and then encodes it to bytes.
+        The binary codec writes, all little-endian:
+        - an 8 bytes header: BINARY_MAGIC, the version on 1 byte, and the numbers of
+          string, integer and bytes values on 2 bytes each;
+        - the texts: the names of the string values, then of the integer values, then of
+          the bytes values, then the string values (the ids) in the same order as their
+          names. Their UTF-8 sizes come first, 32 bits unsigned each, then their UTF-8
+          data, so the texts can hold any character;
+        - the integer values, 64 bits signed each;
+        - the sizes of the bytes values, 32 bits unsigned each, then their data.
+
+        The JSON codec converts the dictionary to a JSON string and then encodes it to
+        bytes.
+
+        Args:
+            codec: Either "binary" or "json".
+            compression: Codec compressing the payload into a frame, 'auto' to choose
+                it from the payload, or None to leave it uncompressed.
 
         Returns:
             bytes: The serialized dictionary as a byte array.
+
+        Raises:
+            ValueError: If the codec is unknown.
         """
-        return json.dumps(self.data).encode("utf-8")
+        if codec == "binary":
+            payload = encode_entries(self.data.items())
+        elif codec == "json":
+            payload = json.dumps(self.data).encode("utf-8")
+        else:
+            raise ValueError(f"Unknown codec '{codec}', expected 'binary' or 'json'")
+        return payload if compression is None else compress(payload, 1, compression)
 
     @classmethod
     def deserialize(cls, payload: bytes) -> "NameIdDict":
         """
         Deserializes bytes into a NameIdDict instance.
 
-        This method decodes the byte array to a JSON string and then loads it into a dictionary
-        to create a NameIdDict instance.
+        The codec is detected from the first bytes of the payload, after decompressing
+        it if it is a compressed frame: binary payloads start with BINARY_MAGIC, while
+        JSON payloads are decoded to a JSON string and then loaded into a dictionary to
+        create a NameIdDict instance.
 
         Args:
             payload (bytes): The serialized data as bytes.
@@ -41,6 +209,10 @@ class NameIdDict:
         Returns:
             NameIdDict: An instance of NameIdDict created from the serialized data.
         """
+        payload = bytes(decompress(payload))
+        if payload.startswith(BINARY_MAGIC):
+            values, raw = decode_entries(payload)
+            return cls({**values, **raw})
         return cls(json.loads(payload.decode("utf-8")))
 
 
@@ -49,38 +221,106 @@ class NumpyArraySerializer:
         """
         Initializes a NumpyArraySerializer instance.
 
-        This class serves as a container for a numpy array of type float32.
+        This class serves as a container for a numpy array, serialized as a tensor bundle
+        holding its type and shape.
 
         Args:
             array: numpy array to be serialized and deserialized.
         """
         self.array = array
 
-    def serialize(self) -> bytes:
+    def serialize(self, compression: Optional[str] = None) -> bytes:
         """
-        Serializes the numpy array to a JSON-encoded byte array.
+        Serializes the numpy array to a tensor bundle.
 
-        This method converts the numpy array to a list, encodes it as JSON,
-        and then encodes it to bytes.
+        The data of the array is copied once, into the result, unless it is compressed.
+        The bytes of the values are then shuffled by position before compression, as the
+        high bytes of neighbouring values are often equal.
+
+        Args:
+            compression: Codec compressing the bundle into a frame, 'auto' to choose it
+                from a sample of the array, or None to leave it uncompressed.
 
         Returns:
             bytes: The serialized numpy array as a byte array.
         """
-        return self.array.tobytes()
+        bundle = TensorBundle({"array": self.array}).serialize()
+        if compression is None:
+            return bundle
+        # The data of the tensors is aligned, so the values stay aligned on the shuffle
+        return compress(bundle, self.array.itemsize, compression)
 
     @classmethod
-    def deserialize(cls, payload: bytes) -> "NumpyArraySerializer":
+    def deserialize(
+        cls,
+        payload: bytes,
+        allocate: Optional[Callable[[int, np.dtype], np.ndarray]] = None,
+    ) -> "NumpyArraySerializer":
         """
         Deserializes bytes into a NumpyArraySerializer instance.
 
-        This method decodes the byte array to a JSON string,
-        loads it into a list, and converts it to a numpy array.
+        The array views the payload without copying it, or the decompressed payload if it
+        is a compressed frame. Payloads that are not tensor bundles are read as the raw
+        data of a one-dimensional float32 array, as written by the previous versions of
+        the sample.
 
         Args:
             payload (bytes): The serialized data as bytes.
+            allocate: Gives the buffer, of a number of values of a type, into which a
+                compressed frame is decompressed, such as a page-locked buffer to copy
+                the array to the device from. By default, a new bytes object.
 
         Returns:
             NumpyArraySerializer: An instance of NumpyArraySerializer created from the serialized data.
+
+        Raises:
+            ValueError: If the payload is a tensor bundle without any array.
         """
+        if allocate is not None and is_frame(payload):
+            buffer = allocate(decompressed_size(payload), np.uint8)
+            decompress_into(payload, buffer)
+            payload = buffer
+        else:
+            payload = decompress(payload)
+        if is_tensor_bundle(payload):
+            bundle = TensorBundle.deserialize(payload)
+            if not bundle.tensors:
+                raise ValueError("The tensor bundle holds no array")
+            return cls(next(iter(bundle.tensors.values())))
         array = np.frombuffer(payload, dtype=np.float32)
         return cls(array)
+
+
+def summarize_profiles(profiles: List[Dict[str, Dict[str, float]]]) -> str:
+    """
+    Formats the profiles of tasks as a table of their stages.
+
+    Args:
+        profiles: The breakdowns sent by the profiled tasks, by stage.
+
+    Returns:
+        str: One row per stage, in the order of the tasks, with the number of tasks
+            and the mean, median and maximum host times, and the mean device time.
+    """
+    stages: Dict[str, List[Dict[str, float]]] = {}
+    for profile in profiles:
+        for stage, times in profile.items():
+            stages.setdefault(stage, []).append(times)
+    # The total comes last
+    stages["total"] = stages.pop("total", [])
+
+    rows = [
+        f"{'stage':<18} {'tasks':>6} {'host mean':>10} {'host p50':>9} "
+        f"{'host max':>9} {'device mean':>12}"
+    ]
+    for stage, times in stages.items():
+        if not times:
+            continue
+        host = np.array([t["host_ms"] for t in times])
+        device = [t["device_ms"] for t in times if "device_ms" in t]
+        device_mean = f"{np.mean(device):>12.3f}" if device else f"{'-':>12}"
+        rows.append(
+            f"{stage:<18} {len(times):>6} {host.mean():>10.3f} {np.median(host):>9.3f} "
+            f"{host.max():>9.3f} {device_mean}"
+        )
+    return "\n".join(rows)
@@ -0,0 +1,86 @@
+import time
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+from numba import cuda
+
+
+class KernelRegistry:
+    def __init__(self):
+        """
+        Initializes a KernelRegistry instance.
+
+        This class holds the CUDA kernels of the worker. Each kernel is compiled once per
+        process, on its first use or when the registry is warmed up, and its compiled code
+        is cached on disk by Numba, in NUMBA_CACHE_DIR if set, so that a new process loads
+        it instead of compiling it again.
+        """
+        self._functions: Dict[str, Callable] = {}
+        self._warm_up_arguments: Dict[str, Callable[[], Tuple]] = {}
+        self._kernels: Dict[str, Callable] = {}
+
+    def register(
+        self, warm_up_arguments: Callable[[], Tuple]
+    ) -> Callable[[Callable], Callable]:
+        """
+        Registers a kernel under the name of its Python function.
+
+        Args:
+            warm_up_arguments: Creates arguments of the types used by the tasks, with which
+                the kernel is launched once when the registry is warmed up.
+
+        Returns:
+            Callable[[Callable], Callable]: Decorator registering the Python function of
+                the kernel and returning it unchanged.
+        """
+
+        def decorator(function: Callable) -> Callable:
+            self._functions[function.__name__] = function
+            self._warm_up_arguments[function.__name__] = warm_up_arguments
+            return function
+
+        return decorator
+
+    def __getitem__(self, name: str) -> Callable:
+        """
+        Gets a kernel, created on first use.
+
+        Args:
+            name: Name of the kernel.
+
+        Returns:
+            Callable: The CUDA kernel, to be launched with a grid configuration.
+        """
+        kernel = self._kernels.get(name)
+        if kernel is None:
+            kernel = self._kernels[name] = cuda.jit(cache=True)(self._functions[name])
+        return kernel
+
+    def warm_up(self) -> Dict[str, float]:
+        """
+        Compiles, or loads from the disk cache, every kernel by launching it once.
+
+        Returns:
+            Dict[str, float]: The warm-up time in seconds of each kernel.
+        """
+        durations = {}
+        for name, warm_up_arguments in self._warm_up_arguments.items():
+            start = time.perf_counter()
+            self[name][1, 1](*warm_up_arguments())
+            cuda.synchronize()
+            durations[name] = time.perf_counter() - start
+        return durations
+
+
+KERNELS = KernelRegistry()
+
+
+def _vector_add_arguments() -> Tuple:
+    return tuple(cuda.device_array(1, dtype=np.float32) for _ in range(3))
+
+
+@KERNELS.register(_vector_add_arguments)
+def vector_add(a, b, c):
+    idx = cuda.grid(1)
+    if idx < c.size:
+        c[idx] = a[idx] + b[idx]
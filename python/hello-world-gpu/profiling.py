@@ -0,0 +1,108 @@
+import os
+import time
+from typing import Dict, List, Tuple
+
+from numba import config, cuda
+
+from metrics import WorkerMetrics
+
+
+class _Stage:
+    __slots__ = ("profile", "stage", "stream", "start", "start_event")
+
+    def __init__(self, profile: "TaskProfile", stage: str, stream):
+        self.profile = profile
+        self.stage = stage
+        self.stream = stream
+        self.start_event = None
+
+    def __enter__(self) -> None:
+        if self.stream is not None:
+            self.start_event = cuda.event()
+            self.start_event.record(self.stream)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        seconds = time.perf_counter() - self.start
+        self.profile.metrics.observe(self.stage, seconds)
+        self.profile.host[self.stage] = self.profile.host.get(self.stage, 0.0) + seconds
+        if self.start_event is not None:
+            end_event = cuda.event()
+            end_event.record(self.stream)
+            self.profile.events.append((self.stage, self.start_event, end_event))
+
+
+class TaskProfile:
+    def __init__(self, metrics: WorkerMetrics, enabled: bool = False):
+        """
+        Initializes a TaskProfile instance.
+
+        This class times the stages of a task with the host clock, and the stages run on
+        the GPU with CUDA events as well, which measure the execution on the device
+        instead of the time taken to queue it. Each stage is also recorded as a phase of
+        the worker metrics.
+
+        Args:
+            metrics: The metrics of the worker.
+            enabled: Whether the task is profiled, then the stages run on the GPU record
+                CUDA events.
+        """
+        self.metrics = metrics
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.host: Dict[str, float] = {}
+        self.events: List[Tuple[str, object, object]] = []
+
+    def stage(self, stage: str, stream=None) -> _Stage:
+        """
+        Times the enclosed block as a stage of the task.
+
+        Args:
+            stage: Name of the stage.
+            stream: CUDA stream on which the work of the stage is queued, 0 for the
+                default stream, or None for a stage run on the host only.
+
+        Returns:
+            _Stage: The context manager timing the block.
+        """
+        # The simulator runs kernels synchronously and does not time events
+        if not self.enabled or config.ENABLE_CUDASIM:
+            stream = None
+        return _Stage(self, stage, stream)
+
+    def breakdown(self) -> Dict[str, Dict[str, float]]:
+        """
+        Gets the time of each stage, waiting for the CUDA events to complete.
+
+        Returns:
+            Dict[str, Dict[str, float]]: By stage, the host time in milliseconds, and
+                the device time in milliseconds for the stages run on the GPU. The
+                'total' stage is the host time since the profile was created.
+        """
+        breakdown = {
+            stage: {"host_ms": seconds * 1e3} for stage, seconds in self.host.items()
+        }
+        for stage, start_event, end_event in self.events:
+            end_event.synchronize()
+            times = breakdown[stage]
+            times["device_ms"] = times.get("device_ms", 0.0) + start_event.elapsed_time(
+                end_event
+            )
+        breakdown["total"] = {"host_ms": (time.perf_counter() - self.start) * 1e3}
+        return breakdown
+
+
+def profiling_enabled(task_info: Dict) -> bool:
+    """
+    Checks whether a task is profiled.
+
+    Environment Variables:
+        WORKER_PROFILE (str): '1' to profile every task.
+
+    Args:
+        task_info: The payload of the task, profiled if its 'profile' entry is set.
+
+    Returns:
+        bool: True if the task is profiled.
+    """
+    return os.getenv("WORKER_PROFILE", "0") == "1" or bool(task_info.get("profile", 0))
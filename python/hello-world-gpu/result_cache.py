@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, Iterable, List, Optional, Union
+
+# Size of the cache on the disk when not given
+DEFAULT_MAX_BYTES = 1 << 30
+_STATISTICS_FILE = "statistics.json"
+
+KeyPart = Union[str, bytes]
+
+
+def source_version(paths: Iterable[str]) -> str:
+    """
+    Computes a version of the worker from its source files, which changes when any of
+    them changes.
+
+    Args:
+        paths: The source files of the worker.
+
+    Returns:
+        str: The hexadecimal digest of the names and contents of the files.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sorted(paths):
+        digest.update(os.path.basename(path).encode() + b"\0")
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def image_sources(dockerfile: str) -> List[str]:
+    """
+    Lists the Python files copied into the worker image by its Dockerfile, so that a
+    module added to the image is part of the worker version.
+
+    Args:
+        dockerfile: The path of the Dockerfile of the worker.
+
+    Returns:
+        List[str]: The paths of the Python files, relative to the build context.
+    """
+    sources = []
+    with open(dockerfile, "r") as file:
+        for line in file:
+            words = line.split()
+            if not words or words[0].upper() != "COPY":
+                continue
+            # The last word is the destination, the flags start with --
+            sources.extend(
+                word
+                for word in words[1:-1]
+                if word.endswith(".py") and not word.startswith("--")
+            )
+    return sources
+
+
+class ResultCache:
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initializes a ResultCache instance.
+
+        This class stores the results downloaded by a client in a directory, so that a
+        job submitted again with the same inputs and options returns the stored result
+        without running any task. Each result is a file named by its key; reading a
+        result updates its modification time, and the least recently used results are
+        removed when the files exceed max_bytes. The numbers of hits and misses are kept
+        in the directory across runs.
+
+        Args:
+            directory: The directory of the cache, created if needed.
+            max_bytes: The maximum total size of the stored results.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(sample: str, worker_version: str, *parts: KeyPart) -> str:
+        """
+        Computes the key of a job.
+
+        Args:
+            sample: The name of the sample.
+            worker_version: The version of the worker computing the result.
+            parts: The inputs and options of the job, or their digests.
+
+        Returns:
+            str: The hexadecimal digest of the sample, the version and the parts.
+        """
+        digest = hashlib.blake2b(digest_size=32)
+        for part in (sample, worker_version, *parts):
+            data = part.encode("utf-8") if isinstance(part, str) else part
+            # Length-prefixed, so that parts cannot be shifted into each other
+            digest.update(len(data).to_bytes(8, "little") + data)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Gets a stored result, and marks it as recently used.
+
+        Args:
+            key: The key of the job.
+
+        Returns:
+            Optional[bytes]: The result, or None if it is not stored.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # Also when evicted by another client between the read and the update
+            self._record(hit=False)
+            return None
+        self._record(hit=True)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """
+        Stores a result, then evicts the least recently used results above the size
+        of the cache.
+
+        Args:
+            key: The key of the job.
+            data: The result.
+        """
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside then renamed, so that readers never see a partial result
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+        self._evict()
+
+    def _entries(self):
+        for subdirectory in os.scandir(self.directory):
+            if subdirectory.is_dir():
+                for entry in os.scandir(subdirectory.path):
+                    if not entry.name.startswith("tmp"):
+                        yield entry
+
+    def _evict(self) -> None:
+        entries = sorted(
+            ((entry.stat(), entry.path) for entry in self._entries()),
+            key=lambda item: item[0].st_mtime,
+        )
+        total = sum(stat.st_size for stat, _ in entries)
+        for stat, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= stat.st_size
+
+    def _statistics_path(self) -> str:
+        return os.path.join(self.directory, _STATISTICS_FILE)
+
+    def _read_statistics(self) -> Dict[str, int]:
+        try:
+            with open(self._statistics_path(), "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {"hits": 0, "misses": 0}
+
+    def _record(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        # Concurrent clients may lose an update, the counters are only indicative
+        statistics = self._read_statistics()
+        statistics["hits" if hit else "misses"] += 1
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(statistics, file)
+        os.replace(temporary, self._statistics_path())
+
+    def statistics(self) -> Dict[str, Union[int, float]]:
+        """
+        Gets the counters of the cache.
+
+        Returns:
+            Dict[str, Union[int, float]]: The hits and misses of this client, the hits,
+                misses and hit ratio of all the runs using the directory, and the number
+                and total size of the stored results.
+        """
+        statistics = self._read_statistics()
+        lookups = statistics["hits"] + statistics["misses"]
+        sizes = [entry.stat().st_size for entry in self._entries()]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": statistics["hits"],
+            "total_misses": statistics["misses"],
+            "hit_ratio": statistics["hits"] / lookups if lookups else 0.0,
+            "entries": len(sizes),
+            "bytes": sum(sizes),
+        }
+
+    def summary(self) -> str:
+        """
+        Formats the counters of the cache.
+
+        Returns:
+            str: A line with the hits and misses and the hit ratio.
+        """
+        statistics = self.statistics()
+        return (
+            f"{statistics['hits']} hits, {statistics['misses']} misses, hit ratio "
+            f"{statistics['hit_ratio']:.1%} over {statistics['total_hits']} hits and "
+            f"{statistics['total_misses']} misses, {statistics['entries']} results "
+            f"({statistics['bytes']} bytes) stored"
+        )
@@ -0,0 +1,120 @@
+import json
+from logging import Logger
+import numpy as np
+from numba import cuda
+from armonik.worker import TaskHandler, ClefLogger
+from armonik.common import Output
+from backends import DEFAULT_CHUNK_SIZE, CudaBackend, select_backend
+from buffers import BufferPool
+from common import NameIdDict, NumpyArraySerializer
+from metrics import WorkerMetrics
+from profiling import TaskProfile, profiling_enabled
+
+# Device and page-locked host buffers, reused across the tasks of the worker
+buffers = BufferPool.from_environment()
+
+# Implementation of the kernel, CUDA when a GPU is available unless set by COMPUTE_BACKEND
+backend = select_backend()
+
+
+def warm_up(logger: Logger) -> None:
+    """
+    Compiles the kernels of the backend, or loads them from the disk cache.
+
+    Args:
+        logger: The logger of the worker.
+    """
+    logger.info("Compute backend", extra={"context": {"Backend": backend.name}})
+    for name, duration in backend.warm_up().items():
+        logger.info(
+            "Kernel warmed up",
+            extra={"context": {"Kernel": name, "time": duration}},
+        )
+
+
+# Task processing
+def processor(task_handler: TaskHandler, metrics: WorkerMetrics) -> Output:
+    """
+    Processes a task by summing the two vectors on the compute backend and sending the result.
+
+    When the task is profiled, the time of each stage is logged and, if the task has a
+    second expected result, sent in it as JSON.
+
+    Args:
+        task_handler: The handler for the current task.
+        metrics: The metrics of the worker.
+
+    Returns:
+        Output: The result of the task processing.
+    """
+    profile = TaskProfile(metrics)
+    logger = ClefLogger.getLogger("ArmoniKWorker")
+    logger.info("Handling the Task")
+
+    if backend.name == CudaBackend.name:
+        # The CUDA simulator devices have no name
+        device_name = getattr(cuda.current_context().device, "name", "CUDA simulator")
+        logger.info(
+            "CUDA is available",
+            extra={"context": {"Device name": device_name}},
+        )
+    payload = task_handler.payload
+    metrics.add_bytes("payload", len(payload))
+
+    with profile.stage("payload_decode"):
+        task_info = NameIdDict.deserialize(payload).data
+    profile.enabled = profiling_enabled(task_info)
+
+    # The streamed mode is enabled by giving the number of streams
+    stream_count = task_info.get("streams", 0)
+    chunk_size = task_info.get("chunk_size", DEFAULT_CHUNK_SIZE)
+    if stream_count < 0:
+        return Output("The number of streams must not be negative")
+    if chunk_size < 1:
+        return Output("The chunk size must be at least 1")
+
+    # The buffers of the task are returned to the pool at the end of the block
+    with buffers.lease() as lease:
+        # Compressed inputs of the CUDA backend are decompressed into page-locked
+        # buffers, from which they are copied to the device without being staged
+        allocate = lease.pinned_array if backend.name == CudaBackend.name else None
+        with profile.stage("dependency_decode"):
+            encoded_array1 = task_handler.data_dependencies[task_info["array1"]]
+            encoded_array2 = task_handler.data_dependencies[task_info["array2"]]
+
+            # Initialize data on the host (CPU)
+            a_host = NumpyArraySerializer.deserialize(encoded_array1, allocate).array
+            b_host = NumpyArraySerializer.deserialize(encoded_array2, allocate).array
+        metrics.add_bytes("dependencies", len(encoded_array1) + len(encoded_array2))
+        if a_host.shape != b_host.shape or a_host.ndim != 1:
+            return Output("The inputs must be two vectors of the same size")
+        if a_host.dtype != np.float32 or b_host.dtype != np.float32:
+            return Output("The inputs must be float32 vectors")
+
+        c_host = backend.vector_add(lease, a_host, b_host, task_info, profile)
+
+        # Serialize before the host buffer is returned to the pool
+        with profile.stage("result_encode"):
+            result = NumpyArraySerializer(c_host).serialize(
+                task_info.get("compression")
+            )
+    if backend.name == CudaBackend.name:
+        logger.info("Buffer pool", extra={"context": lease.statistics()})
+
+    result_id = task_handler.expected_results[0]
+    metrics.add_bytes("results", len(result))
+    with profile.stage("send_results"):
+        task_handler.send_results({result_id: result})
+
+    if profile.enabled:
+        breakdown = profile.breakdown()
+        logger.info(
+            "Task profile",
+            extra={"context": {"Backend": backend.name, "stages": breakdown}},
+        )
+        if len(task_handler.expected_results) > 1:
+            task_handler.send_results(
+                {task_handler.expected_results[1]: json.dumps(breakdown).encode()}
+            )
+
+    return Output()
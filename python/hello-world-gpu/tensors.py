@@ -0,0 +1,209 @@
+import mmap
+import struct
+import zlib
+from typing import BinaryIO, Dict, Iterator, List, Mapping, Tuple, Union
+
+import numpy as np
+
+# Layout: a bundle header, a descriptor per tensor, then the data of each tensor at an
+# offset aligned to ALIGNMENT bytes from the start of the bundle
+TENSOR_MAGIC = b"ATNS"
+TENSOR_VERSION = 1
+ALIGNMENT = 64
+# Flags of the bundle header
+FLAG_CHECKSUM = 1
+# Magic, version, flags, number of tensors, size of the header and descriptors
+_BUNDLE_HEADER = struct.Struct("<4sBBHI")
+# Data type, number of dimensions, name length, offset and size of the data, CRC-32,
+# followed by the shape, the strides and the UTF-8 name
+_TENSOR_HEADER = struct.Struct("<8sBxHQQI")
+_DIMENSION = struct.Struct("<q")
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _contiguous(array: np.ndarray) -> np.ndarray:
+    # Contiguous arrays are written in their memory order, others are copied once
+    if array.flags.c_contiguous or array.flags.f_contiguous:
+        return array
+    return np.ascontiguousarray(array)
+
+
+class TensorBundle:
+    def __init__(self, tensors: Mapping[str, np.ndarray], checksum: bool = False):
+        """
+        Initializes a TensorBundle instance.
+
+        This class serves as a container for named numpy arrays of any numeric type and
+        shape, serialized with their type, shape and strides, and optionally a CRC-32 of
+        their data.
+
+        Args:
+            tensors: Arrays by name, in the order of the bundle.
+            checksum: Whether serialization stores the CRC-32 of the data of each array.
+        """
+        for name, tensor in tensors.items():
+            if tensor.dtype.hasobject:
+                raise ValueError(f"Tensor '{name}' holds Python objects")
+        self.tensors: Dict[str, np.ndarray] = dict(tensors)
+        self.checksum = checksum
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.tensors[name]
+
+    def _layout(self) -> Tuple[bytes, List[memoryview]]:
+        descriptors = []
+        for name, tensor in self.tensors.items():
+            tensor = _contiguous(tensor)
+            view = memoryview(tensor.ravel(order="K").view(np.uint8))
+            descriptors.append((name.encode(), tensor, tensor.strides, view))
+
+        size = _BUNDLE_HEADER.size + sum(
+            _TENSOR_HEADER.size + 2 * _DIMENSION.size * tensor.ndim + len(encoded_name)
+            for encoded_name, tensor, _, _ in descriptors
+        )
+        offset = _align(size)
+        header = [
+            _BUNDLE_HEADER.pack(
+                TENSOR_MAGIC,
+                TENSOR_VERSION,
+                FLAG_CHECKSUM if self.checksum else 0,
+                len(descriptors),
+                size,
+            )
+        ]
+        for encoded_name, tensor, strides, view in descriptors:
+            header.append(
+                _TENSOR_HEADER.pack(
+                    tensor.dtype.str.encode(),
+                    tensor.ndim,
+                    len(encoded_name),
+                    offset,
+                    view.nbytes,
+                    zlib.crc32(view) if self.checksum else 0,
+                )
+            )
+            header.extend(_DIMENSION.pack(d) for d in tensor.shape)
+            header.extend(_DIMENSION.pack(s) for s in strides)
+            header.append(encoded_name)
+            offset = _align(offset + view.nbytes)
+        return b"".join(header), [view for _, _, _, view in descriptors]
+
+    def chunks(self) -> Iterator[Buffer]:
+        """
+        Gets the serialized bundle as successive buffers, without copying the arrays.
+
+        Returns:
+            Iterator[Buffer]: The header, then the data of each array and its padding.
+        """
+        header, data = self._layout()
+        yield header
+        offset = len(header)
+        for view in data:
+            padding = _align(offset) - offset
+            if padding:
+                yield bytes(padding)
+            yield view
+            offset += padding + view.nbytes
+
+    def serialize(self) -> bytes:
+        """
+        Serializes the bundle, copying the arrays once into the result.
+
+        Returns:
+            bytes: The serialized bundle.
+        """
+        return b"".join(self.chunks())
+
+    def write(self, file: BinaryIO) -> None:
+        """
+        Writes the serialized bundle to a file, without copying the arrays.
+
+        Args:
+            file: Binary file open for writing.
+        """
+        for chunk in self.chunks():
+            file.write(chunk)
+
+    @classmethod
+    def deserialize(cls, payload: Buffer, verify: bool = True) -> "TensorBundle":
+        """
+        Deserializes a bundle into arrays viewing the payload, without copying it.
+
+        The arrays are read-only when the payload is.
+
+        Args:
+            payload: The serialized bundle.
+            verify: Whether to check the CRC-32 of the data, when the bundle has them.
+
+        Returns:
+            TensorBundle: The bundle of the arrays.
+        """
+        buffer = memoryview(payload)
+        if not is_tensor_bundle(buffer):
+            raise ValueError("Not a tensor bundle")
+        _, version, flags, count, size = _BUNDLE_HEADER.unpack_from(buffer)
+        if version != TENSOR_VERSION:
+            raise ValueError(f"Unsupported tensor bundle version {version}")
+        checksum = bool(flags & FLAG_CHECKSUM)
+        position = _BUNDLE_HEADER.size
+        tensors = {}
+        for _ in range(count):
+            dtype, ndim, name_length, offset, nbytes, crc = _TENSOR_HEADER.unpack_from(
+                buffer, position
+            )
+            position += _TENSOR_HEADER.size
+            dimensions = struct.unpack_from(f"<{2 * ndim}q", buffer, position)
+            position += 2 * _DIMENSION.size * ndim
+            name = bytes(buffer[position : position + name_length]).decode()
+            position += name_length
+            if offset + nbytes > len(buffer):
+                raise ValueError(f"Tensor '{name}' is truncated")
+            data = buffer[offset : offset + nbytes]
+            if checksum and verify and zlib.crc32(data) != crc:
+                raise ValueError(f"Checksum mismatch for tensor '{name}'")
+            tensors[name] = np.ndarray(
+                dimensions[:ndim],
+                np.dtype(dtype.rstrip(b"\0").decode()),
+                data,
+                strides=dimensions[ndim:],
+            )
+        if position != size:
+            raise ValueError("Inconsistent tensor bundle header")
+        return cls(tensors, checksum)
+
+    @classmethod
+    def load(cls, path: str, verify: bool = False) -> "TensorBundle":
+        """
+        Loads a bundle from a file, memory-mapping its data instead of reading it.
+
+        Args:
+            path: Path of the file.
+            verify: Whether to check the CRC-32 of the data, which reads all of it.
+
+        Returns:
+            TensorBundle: The bundle of read-only arrays, mapped as long as they are used.
+        """
+        with open(path, "rb") as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls.deserialize(mapping, verify)
+
+
+def is_tensor_bundle(payload: Buffer) -> bool:
+    """
+    Checks whether a payload starts with the header of a tensor bundle.
+
+    Args:
+        payload: The payload to check.
+
+    Returns:
+        bool: True if the payload starts with the magic and a valid header size.
+    """
+    if len(payload) < _BUNDLE_HEADER.size:
+        return False
+    magic, _, _, _, size = _BUNDLE_HEADER.unpack_from(payload)
+    return magic == TENSOR_MAGIC and size <= len(payload)
@@ -1,88 +1,63 @@
+import sys
+from types import ModuleType
+
+from startup import BackgroundImport, StartupProfile
+
+# Created before the other imports to time them with --profile-startup
+startup = StartupProfile.from_environment()
+
 import logging
 import os
-import numpy as np
-from numba import cuda
 from armonik.worker import ArmoniKWorker, TaskHandler, ClefLogger
 from armonik.common import Output
 import grpc
-import time
-from common import NameIdDict, NumpyArraySerializer
+from metrics import WorkerMetrics
 
 ClefLogger.setup_logging(logging.INFO)
 
+# Per-phase metrics, disabled unless configured by the environment
+metrics = WorkerMetrics.from_environment()
 
-# Task processing
-def processor(task_handler: TaskHandler) -> Output:
-    """
-    Processes a task by summing the two vectors and sending the result.
 
-    Args:
-        task_handler: The handler for the current task.
+def load_task() -> ModuleType:
+    """
+    Imports NumPy, numba and the compute backend, and compiles the kernels.
 
     Returns:
-        Output: The result of the task processing.
+        ModuleType: The module processing the tasks.
     """
-    logger = ClefLogger.getLogger("ArmoniKWorker")
-    logger.info("Handling the Task")
+    import task
 
-    if not cuda.is_available():
-        raise RuntimeError(
-            "CUDA is not available. Please check your GPU and driver installation."
-        )
+    task.warm_up(ClefLogger.getLogger("ArmoniKWorker"))
+    startup.mark("kernels ready")
+    return task
 
-    logger.info(
-        "CUDA is available",
-        extra={"context": {"Device name": cuda.get_current_device().name}},
-    )
-    payload = task_handler.payload
-
-    task_info = NameIdDict.deserialize(payload).data
-
-    encoded_array1 = task_handler.data_dependencies[task_info["array1"]]
-    encoded_array2 = task_handler.data_dependencies[task_info["array2"]]
-
-    # Initialize data on the host (CPU)
-    a_host = NumpyArraySerializer.deserialize(encoded_array1).array
-    b_host = NumpyArraySerializer.deserialize(encoded_array2).array
-    N = len(a_host)
-
-    # Transfer data to the device (GPU)
-    a_device = cuda.to_device(a_host)
-    b_device = cuda.to_device(b_host)
-    c_device = cuda.device_array(N, dtype=np.float32)
-
-    # Define CUDA kernel
-    @cuda.jit
-    def vector_add(a, b, c):
-        idx = cuda.grid(1)
-        if idx < c.size:
-            c[idx] = a[idx] + b[idx]
-
-    # Define number of threads and blocks
-    threads_per_block = task_info.get("threads_per_block", 1024)
-    blocks_per_grid = task_info.get(
-        "blocks_per_grid", (N + (threads_per_block - 1)) // threads_per_block
-    )
 
-    # Measure time for GPU execution
-    start = time.time()
-    # Launch kernel
-    vector_add[blocks_per_grid, threads_per_block](a_device, b_device, c_device)
-    cuda.synchronize()  # Wait for the kernel to finish
-    end = time.time()
+# The heavy modules are loaded in the background while the server starts
+task_module = BackgroundImport(load_task, "load-task")
 
-    # Copy the result back to the host (CPU)
-    c_host = c_device.copy_to_host()
 
-    # Print and verify results
-    logger.info(
-        "GPU execution time in seconds", extra={"context": {"time": end - start}}
-    )
+# Task processing
+def processor(task_handler: TaskHandler) -> Output:
+    """
+    Processes a task by summing the two vectors on the compute backend and sending the result.
 
-    result_id = task_handler.expected_results[0]
-    task_handler.send_results({result_id: NumpyArraySerializer(c_host).serialize()})
+    The first task waits for the heavy modules to be loaded.
 
-    return Output()
+    Args:
+        task_handler: The handler for the current task.
+
+    Returns:
+        Output: The result of the task processing.
+    """
+    startup.mark("first task received")
+    output = task_module.result().processor(task_handler, metrics)
+    if startup.mark("first task served"):
+        ClefLogger.getLogger("ArmoniKWorker").info(
+            "Startup profile", extra={"context": startup.summary()}
+        )
+        print(startup.report(), file=sys.stderr, flush=True)
+    return output
 
 
 def main():
@@ -98,10 +73,15 @@ def main():
         ComputePlane__WorkerChannel__Address (str): The address for the worker endpoint.
         ComputePlane__AgentChannel__SocketType (str): The socket type for agent communication ('unixdomainsocket' or 'tcp').
         ComputePlane__AgentChannel__Address (str): The address for the agent endpoint.
+        WORKER_PROFILE_STARTUP (str): Set to 1 to profile the startup, as --profile-startup.
 
     Example:
         python worker.py
+        python worker.py --profile-startup
     """
+    # Compile the kernels, or load them from the disk cache, while the server starts
+    task_module.start()
+
     # Create Seq compatible logger
     logger = ClefLogger.getLogger("ArmoniKWorker")
 
@@ -125,6 +105,9 @@ def main():
         "ComputePlane__AgentChannel__Address", "/cache/armonik_agent.sock"
     )
 
+    # Export the metrics, if enabled
+    metrics.start()
+
     # Start worker
     logger.info("Started new worker!")
     # Use options to fix Unix socket connection on localhost (cf: <GitHub>)
@@ -133,6 +116,7 @@ def main():
     ) as agent_channel:
         worker = ArmoniKWorker(agent_channel, processor, logger=logger)
         logger.info("Worker Connected")
+        startup.mark("server starting")
         worker.start(worker_endpoint)
 
 
@@ -1,12 +1,28 @@
 import argparse
+import asyncio
 import logging
-from typing import List
+import time
+from typing import Dict, List, Optional, Set
 import grpc
 import grpc.aio
 from datetime import timedelta
 import sys
 from armonik.client import ArmoniKResults, ArmoniKSessions, ArmoniKTasks, ArmoniKEvents
 from armonik.common import TaskDefinition, TaskOptions
+from armonik.protogen.client.events_service_pb2_grpc import EventsStub
+from armonik.protogen.client.results_service_pb2_grpc import ResultsStub
+from armonik.protogen.client.tasks_service_pb2_grpc import TasksStub
+from armonik.protogen.common.events_common_pb2 import (
+    EventsEnum,
+    EventSubscriptionRequest,
+)
+from armonik.protogen.common.result_status_pb2 import ResultStatus
+from armonik.protogen.common.results_common_pb2 import (
+    CreateResultsMetaDataRequest,
+    CreateResultsRequest,
+    DownloadResultDataRequest,
+)
+from armonik.protogen.common.tasks_common_pb2 import SubmitTasksRequest
 from pathlib import Path
 
 # Configure logging
@@ -19,110 +35,484 @@ logger = logging.getLogger(__name__)
 common_path = Path(__file__).resolve().parent.parent / "common"
 sys.path.append(str(common_path))
 
-from common import NameIdDict
+from common import DEFAULT_INLINE_THRESHOLD, NameIdDict
+from upload_index import UploadIndex, content_digest
+
+# Add the session daemon directory to the system path
+session_daemon_path = Path(__file__).resolve().parents[2] / "session-daemon"
+sys.path.append(str(session_daemon_path))
+
+from session_daemon import (
+    SessionDaemon,
+    send_request,
+    strip_daemon_arguments,
+    submit_job,
+)
 
 
-def run(endpoint: str, partition: str) -> None:
+def create_session(channel: grpc.Channel, partition: str) -> str:
     """
-    Connects to the ArmoniK control plane via a gRPC channel and performs a series of tasks.
+    Creates a session whose tasks are submitted to the given partition.
 
     Args:
-        endpoint: The endpoint for the connection to ArmoniK control plane.
+        channel: The gRPC channel to the ArmoniK control plane.
         partition: The name of the partition to which tasks are submitted.
 
-    Example:
-        run("172.24.55.197:5001", "default")
+    Returns:
+        str: The id of the session.
     """
-    # Create gRPC channel to connect with ArmoniK control plane
-    with grpc.insecure_channel(endpoint) as channel:
-        # Create client for task submission
-        task_client = ArmoniKTasks(channel)
+    # Create client for session creation
+    sessions_client = ArmoniKSessions(channel)
 
-        # Create client for result creation
-        result_client = ArmoniKResults(channel)
+    # Default task options that will be used by each task if not overwritten when submitting tasks
+    task_options = TaskOptions(
+        max_duration=timedelta(hours=1),  # Duration of 1 hour
+        max_retries=2,
+        priority=1,
+        partition_id=partition,
+    )
 
-        # Create client for session creation
-        sessions_client = ArmoniKSessions(channel)
+    # Request for session creation with default task options and allowed partitions for the session
+    session_id = sessions_client.create_session(task_options, partition_ids=[partition])
+    logger.info(f"sessionId: {session_id}")
+    return session_id
 
-        # Create client for events listening
-        events_client = ArmoniKEvents(channel)
 
-        # Default task options that will be used by each task if not overwritten when submitting tasks
-        task_options = TaskOptions(
-            max_duration=timedelta(hours=1),  # Duration of 1 hour
-            max_retries=2,
-            priority=1,
-            partition_id=partition,
-        )
+def run_job(
+    channel: grpc.Channel,
+    session_id: str,
+    inline_threshold: int = DEFAULT_INLINE_THRESHOLD,
+    index: Optional[UploadIndex] = None,
+) -> None:
+    """
+    Submits the Hello World task in an existing session and prints its result.
 
-        # Request for session creation with default task options and allowed partitions for the session
-        session_id = sessions_client.create_session(
-            task_options, partition_ids=[partition]
-        )
-        logger.info(f"sessionId: {session_id}")
+    Args:
+        channel: The gRPC channel to the ArmoniK control plane.
+        session_id: The id of the session in which the task is submitted.
+        inline_threshold: Maximum size in bytes of an input sent in the payload.
+        index: The index of the inputs uploaded in the session, an input identical to
+            an uploaded one is not uploaded again.
+    """
+    index = index if index is not None else UploadIndex()
+    # Create client for task submission
+    task_client = ArmoniKTasks(channel)
+
+    # Create client for result creation
+    result_client = ArmoniKResults(channel)
+
+    # Create client for events listening
+    events_client = ArmoniKEvents(channel)
 
+    input_data = b"Hello"
+    if len(input_data) <= inline_threshold:
+        # The input is sent in the payload, only the output is created beforehand
+        results = result_client.create_results_metadata(
+            result_names=["output"], session_id=session_id
+        )
+        output_id = results["output"].result_id
+        name_id_mapping = NameIdDict(
+            {"output": output_id}, inline={"input": input_data}
+        )
+        data_dependencies = []
+    else:
         # Create the result metadata and keep the id for task submission
         results = result_client.create_results_metadata(
-            result_names=["input", "output", "payload"], session_id=session_id
+            result_names=["output"], session_id=session_id
         )
-
-        # Get the results ids
-        input_id = results["input"].result_id
         output_id = results["output"].result_id
-        payload_id = results["payload"].result_id
 
-        # Create the metadata (a result) and upload data at the same time
-        result_client.upload_result_data(
-            result_id=input_id,
-            session_id=session_id,
-            result_data=b"Hello",
+        def create_input() -> str:
+            return result_client.create_results(
+                results_data={"input": input_data}, session_id=session_id
+            )["input"].result_id
+
+        # The input is only uploaded if it is not in the session yet
+        input_id = index.upload(
+            content_digest([input_data]), len(input_data), create_input
         )
-        logger.info("data uploaded")
+        logger.info(f"data uploaded: {index.summary()}")
 
         # Creating a NameIdDict instance
         name_id_mapping = NameIdDict({"input": input_id, "output": output_id})
+        data_dependencies = [input_id]
 
-        # Serializing the instance
-        serialized_name_id_mapping = name_id_mapping.serialize()
+    # Create the payload (a result) and upload its data at the same time
+    payload_id = result_client.create_results(
+        results_data={"payload": name_id_mapping.serialize()}, session_id=session_id
+    )["payload"].result_id
+    logger.info("payload uploaded")
 
-        result_client.upload_result_data(
-            result_id=payload_id,
-            session_id=session_id,
-            result_data=serialized_name_id_mapping,
-        )
-        logger.info("payload uploaded")
-
-        # Submit task with payload and result ids
-        task_client.submit_tasks(
-            session_id=session_id,
-            tasks=[
-                TaskDefinition(
-                    data_dependencies=[input_id],
-                    expected_output_ids=[output_id],
-                    payload_id=payload_id,
-                )
-            ],
+    # Submit task with payload and result ids
+    task_client.submit_tasks(
+        session_id=session_id,
+        tasks=[
+            TaskDefinition(
+                data_dependencies=data_dependencies,
+                expected_output_ids=[output_id],
+                payload_id=payload_id,
+            )
+        ],
+    )
+    logger.info("tasks submitted")
+
+    # Wait for task end and result availability
+    try:
+        events_client.wait_for_result_availability(
+            result_ids=[output_id], session_id=session_id
         )
-        logger.info("tasks submitted")
+    except Exception as e:
+        logger.error(f"An error occurred: {e}")
 
-        # Wait for task end and result availability
+    # Download result
+    try:
+        serialized_result = result_client.download_result_data(output_id, session_id)
+        final_result = serialized_result.decode()
+        logger.info(f"resultId: {output_id}, data: {final_result}")
+    except Exception as e:
+        logger.error(f"An error occurred: {e.details()}")
+
+
+def run(
+    endpoint: str, partition: str, inline_threshold: int = DEFAULT_INLINE_THRESHOLD
+) -> None:
+    """
+    Connects to the ArmoniK control plane via a gRPC channel and performs a series of tasks.
+
+    Args:
+        endpoint: The endpoint for the connection to ArmoniK control plane.
+        partition: The name of the partition to which tasks are submitted.
+        inline_threshold: Maximum size in bytes of an input sent in the payload.
+
+    Example:
+        run("172.24.55.197:5001", "default")
+    """
+    # Create gRPC channel to connect with ArmoniK control plane
+    with grpc.insecure_channel(endpoint) as channel:
+        session_id = create_session(channel, partition)
+        run_job(channel, session_id, inline_threshold)
+
+    logger.info("End Connection!")
+
+
+def serve(
+    endpoint: str,
+    partition: str,
+    socket_path: str,
+    idle_timeout: float,
+    inline_threshold: int = DEFAULT_INLINE_THRESHOLD,
+) -> None:
+    """
+    Keeps a channel and a session open and runs a task for each job sent to a Unix socket.
+
+    Args:
+        endpoint: The endpoint for the connection to ArmoniK control plane.
+        partition: The name of the partition to which tasks are submitted.
+        socket_path: Path of the Unix socket on which jobs are received.
+        idle_timeout: Time in seconds without jobs after which the session is closed.
+        inline_threshold: Maximum size in bytes of an input sent in the payload.
+    """
+    with grpc.insecure_channel(endpoint) as channel:
+        session_id = create_session(channel, partition)
+        # The jobs of the session share their inputs
+        index = UploadIndex()
         try:
-            events_client.wait_for_result_availability(
-                result_ids=[output_id], session_id=session_id
+            logger.info(f"Serving jobs on {socket_path}")
+            SessionDaemon(
+                socket_path,
+                lambda job_args: run_job(channel, session_id, inline_threshold, index),
+                idle_timeout,
+            ).serve()
+        finally:
+            logger.info(f"Uploads: {index.summary()}")
+            sessions_client = ArmoniKSessions(channel)
+            sessions_client.close_session(session_id)
+            sessions_client.purge_session(session_id)
+            sessions_client.delete_session(session_id)
+            logger.info(f"Session {session_id} closed")
+
+    logger.info("End Connection!")
+
+
+class PipelinedRun:
+    def __init__(
+        self,
+        channel: grpc.aio.Channel,
+        session_id: str,
+        tasks: int,
+        window: int,
+        batch: int,
+        inline_threshold: int = DEFAULT_INLINE_THRESHOLD,
+    ):
+        """
+        Initializes a PipelinedRun instance.
+
+        This class submits many Hello World tasks from a single asyncio event loop. At most
+        `window` tasks are in flight: a batch of tasks is prepared and submitted as soon as
+        enough tasks of the previous batches are completed, so that the uploads of a batch
+        overlap with the submission of the previous one. A single events stream reports the
+        completed results, and each result is downloaded as soon as it is available.
+
+        Args:
+            channel: The asynchronous gRPC channel to the ArmoniK control plane.
+            session_id: The id of the session in which the tasks are submitted.
+            tasks: The number of tasks to submit.
+            window: The maximum number of tasks in flight.
+            batch: The maximum number of tasks created and submitted with the same calls.
+            inline_threshold: Maximum size in bytes of an input sent in the payload.
+        """
+        self.session_id = session_id
+        self.inline_threshold = inline_threshold
+        # Inputs uploaded in the session, shared by the tasks reading the same data
+        self.index = UploadIndex()
+        self.input_lock = asyncio.Lock()
+        self.tasks = tasks
+        self.batch = max(1, min(batch, window))
+        self.results_stub = ResultsStub(channel)
+        self.tasks_stub = TasksStub(channel)
+        self.events_stub = EventsStub(channel)
+        self.window = asyncio.Semaphore(window)
+        # Submission time of the in-flight tasks, by output id
+        self.pending: Dict[str, Optional[float]] = {}
+        # Results being downloaded, whose repeated completion events are ignored
+        self.downloading: Set[str] = set()
+        self.latencies: List[float] = []
+        self.failed = 0
+        self.done = asyncio.Event()
+
+    async def run(self) -> float:
+        """
+        Submits the tasks and waits for all their results.
+
+        Returns:
+            float: The elapsed time in seconds.
+        """
+        events = self.events_stub.GetEvents(
+            EventSubscriptionRequest(
+                session_id=self.session_id,
+                returned_events=[
+                    EventsEnum.EVENTS_ENUM_RESULT_STATUS_UPDATE,
+                    EventsEnum.EVENTS_ENUM_NEW_RESULT,
+                ],
             )
-        except Exception as e:
-            logger.error(f"An error occurred: {e}")
+        )
+        # The subscription is sent on the channel before the first task is created
+        listener = asyncio.create_task(self._listen(events))
+        start = time.perf_counter()
+        submissions = []
+        try:
+            for first in range(0, self.tasks, self.batch):
+                size = min(self.batch, self.tasks - first)
+                for _ in range(size):
+                    await self.window.acquire()
+                submissions.append(asyncio.create_task(self._submit(first, size)))
+            await asyncio.gather(*submissions)
+            await asyncio.wait(
+                [asyncio.create_task(self.done.wait()), listener],
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if listener.done():
+                # Raise the error which closed the events stream
+                listener.result()
+                raise RuntimeError("The events stream ended before all the results")
+        finally:
+            events.cancel()
+        return time.perf_counter() - start
+
+    async def _submit(self, first: int, size: int) -> None:
+        names = [f"{first + i}" for i in range(size)]
+        input_data = b"Hello"
+        inline = len(input_data) <= self.inline_threshold
+        requests = [
+            self.results_stub.CreateResultsMetaData(
+                CreateResultsMetaDataRequest(
+                    session_id=self.session_id,
+                    results=[
+                        CreateResultsMetaDataRequest.ResultCreate(name=f"output-{name}")
+                        for name in names
+                    ],
+                )
+            )
+        ]
+        if not inline:
+            # Create the outputs and get the input at the same time
+            requests.append(self._upload_input(input_data, size))
+        responses = await asyncio.gather(*requests)
+        output_ids = [result.result_id for result in responses[0].results]
+        if inline:
+            # The inputs are sent in the payloads
+            mappings = [
+                NameIdDict({"output": output_id}, inline={"input": input_data})
+                for output_id in output_ids
+            ]
+            dependencies = [[] for _ in output_ids]
+        else:
+            input_id = responses[1]
+            mappings = [
+                NameIdDict({"input": input_id, "output": output_id})
+                for output_id in output_ids
+            ]
+            dependencies = [[input_id] for _ in output_ids]
+        payloads = await self.results_stub.CreateResults(
+            CreateResultsRequest(
+                session_id=self.session_id,
+                results=[
+                    CreateResultsRequest.ResultCreate(
+                        name=f"payload-{name}", data=mapping.serialize()
+                    )
+                    for name, mapping in zip(names, mappings)
+                ],
+            )
+        )
+        submitted = time.perf_counter()
+        for output_id in output_ids:
+            self.pending[output_id] = submitted
+        await self.tasks_stub.SubmitTasks(
+            SubmitTasksRequest(
+                session_id=self.session_id,
+                task_creations=[
+                    SubmitTasksRequest.TaskCreation(
+                        payload_id=payload.result_id,
+                        expected_output_keys=[output_id],
+                        data_dependencies=data_dependencies,
+                    )
+                    for payload, data_dependencies, output_id in zip(
+                        payloads.results, dependencies, output_ids
+                    )
+                ],
+            )
+        )
+        logger.debug(f"{size} tasks submitted")
+
+    async def _upload_input(self, data: bytes, tasks: int) -> str:
+        digest = content_digest([data])
+        # Batches wait for the upload of an input by a previous batch
+        async with self.input_lock:
+            input_id = self.index.lookup(digest, len(data), tasks)
+            if input_id is None:
+                response = await self.results_stub.CreateResults(
+                    CreateResultsRequest(
+                        session_id=self.session_id,
+                        results=[
+                            CreateResultsRequest.ResultCreate(name="input", data=data)
+                        ],
+                    )
+                )
+                input_id = response.results[0].result_id
+                self.index.add(digest, len(data), input_id)
+                # The other tasks of the batch read the same result
+                self.index.lookup(digest, len(data), tasks - 1)
+        return input_id
+
+    async def _listen(self, events: grpc.aio.UnaryStreamCall) -> None:
+        downloads = set()
+        async for message in events:
+            update = message.WhichOneof("update")
+            if update not in ("result_status_update", "new_result"):
+                continue
+            event = getattr(message, update)
+            if (
+                event.result_id not in self.pending
+                or event.result_id in self.downloading
+            ):
+                continue
+            if event.status == ResultStatus.RESULT_STATUS_COMPLETED:
+                self.downloading.add(event.result_id)
+                download = asyncio.create_task(self._download(event.result_id))
+                # Keep a reference until the download is done
+                downloads.add(download)
+                download.add_done_callback(downloads.discard)
+            elif event.status == ResultStatus.RESULT_STATUS_ABORTED:
+                logger.error(f"Result {event.result_id} has been aborted")
+                self.failed += 1
+                self._complete(event.result_id)
 
-        # Download result
+    async def _download(self, result_id: str) -> None:
         try:
-            serialized_result = result_client.download_result_data(
-                output_id, session_id
+            data = b"".join(
+                [
+                    response.data_chunk
+                    async for response in self.results_stub.DownloadResultData(
+                        DownloadResultDataRequest(
+                            session_id=self.session_id, result_id=result_id
+                        )
+                    )
+                ]
             )
-            final_result = serialized_result.decode()
-            logger.info(f"resultId: {output_id}, data: {final_result}")
         except Exception as e:
-            logger.error(f"An error occurred: {e.details()}")
+            # Nothing awaits the download, the error would be lost and the run hang
+            logger.error(f"Download of result {result_id} failed: {e}")
+            self.failed += 1
+        else:
+            self.latencies.append(time.perf_counter() - self.pending[result_id])
+            logger.debug(f"resultId: {result_id}, data: {data.decode()}")
+        self._complete(result_id)
+
+    def _complete(self, result_id: str) -> None:
+        del self.pending[result_id]
+        self.downloading.discard(result_id)
+        self.window.release()
+        if len(self.latencies) + self.failed == self.tasks:
+            self.done.set()
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Computes a percentile by the nearest-rank method.
+
+    Args:
+        values: The sorted values.
+        q: The percentile, between 0 and 100.
 
+    Returns:
+        float: The percentile of the values.
+    """
+    return values[max(0, min(len(values) - 1, round(q / 100 * len(values)) - 1))]
+
+
+async def run_pipelined(
+    endpoint: str,
+    partition: str,
+    tasks: int,
+    window: int,
+    batch: int,
+    inline_threshold: int = DEFAULT_INLINE_THRESHOLD,
+) -> None:
+    """
+    Submits many Hello World tasks with the asyncio pipelined client and reports the
+    throughput and the latency of the tasks.
+
+    Args:
+        endpoint: The endpoint for the connection to ArmoniK control plane.
+        partition: The name of the partition to which tasks are submitted.
+        tasks: The number of tasks to submit.
+        window: The maximum number of tasks in flight.
+        batch: The maximum number of tasks created and submitted with the same calls.
+        inline_threshold: Maximum size in bytes of an input sent in the payload.
+    """
+    with grpc.insecure_channel(endpoint) as channel:
+        session_id = create_session(channel, partition)
+    async with grpc.aio.insecure_channel(endpoint) as channel:
+        pipelined_run = PipelinedRun(
+            channel, session_id, tasks, window, batch, inline_threshold
+        )
+        elapsed = await pipelined_run.run()
+
+    latencies = sorted(pipelined_run.latencies)
+    logger.info(
+        f"{tasks} tasks in {elapsed:.3f} s ({tasks / elapsed:.0f} tasks/s), "
+        f"{pipelined_run.failed} failed"
+    )
+    if latencies:
+        logger.info(
+            "Task latency (ms): "
+            f"mean {1000 * sum(latencies) / len(latencies):.1f}, "
+            f"p50 {1000 * percentile(latencies, 50):.1f}, "
+            f"p95 {1000 * percentile(latencies, 95):.1f}, "
+            f"p99 {1000 * percentile(latencies, 99):.1f}, "
+            f"max {1000 * latencies[-1]:.1f}"
+        )
+    logger.info(f"Uploads: {pipelined_run.index.summary()}")
     logger.info("End Connection!")
 
 
@@ -151,8 +541,83 @@ def main(args: List[str]) -> None:
         default="default",
         help="Name of the partition to which submit tasks.",
     )
+    parser.add_argument(
+        "--inline-threshold",
+        type=int,
+        default=DEFAULT_INLINE_THRESHOLD,
+        help="Maximum size in bytes of an input sent in the payload of the task instead of as a data dependency.",
+    )
+    parser.add_argument(
+        "--serve",
+        type=str,
+        help="Keep the channel and the session open and run a task for each job sent to this Unix socket.",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=300,
+        help="Time in seconds without jobs after which the resident client closes the session.",
+    )
+    parser.add_argument(
+        "--daemon",
+        type=str,
+        help="Send the job to the resident client listening on this Unix socket.",
+    )
+    parser.add_argument(
+        "--stop",
+        action="store_true",
+        help="With --daemon, stop the resident client.",
+    )
+    parser.add_argument(
+        "--tasks",
+        type=int,
+        help="Submit this number of tasks with the asyncio pipelined client and report the throughput and the latency.",
+    )
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=1000,
+        help="Maximum number of tasks in flight with --tasks.",
+    )
+    parser.add_argument(
+        "--batch",
+        type=int,
+        default=100,
+        help="Maximum number of tasks created and submitted by the same calls with --tasks.",
+    )
     parsed_args = parser.parse_args(args)
-    run(parsed_args.endpoint, parsed_args.partition)
+    if parsed_args.tasks is not None and (
+        parsed_args.tasks < 1 or parsed_args.window < 1 or parsed_args.batch < 1
+    ):
+        parser.error("--tasks, --window and --batch must be at least 1")
+    if parsed_args.daemon is not None:
+        if parsed_args.stop:
+            print(send_request(parsed_args.daemon, {"stop": True})["output"])
+            return
+        sys.exit(
+            submit_job(parsed_args.daemon, strip_daemon_arguments(args, ["--daemon"]))
+        )
+    if parsed_args.tasks is not None:
+        asyncio.run(
+            run_pipelined(
+                parsed_args.endpoint,
+                parsed_args.partition,
+                parsed_args.tasks,
+                parsed_args.window,
+                parsed_args.batch,
+                parsed_args.inline_threshold,
+            )
+        )
+    elif parsed_args.serve is not None:
+        serve(
+            parsed_args.endpoint,
+            parsed_args.partition,
+            parsed_args.serve,
+            parsed_args.idle_timeout,
+            parsed_args.inline_threshold,
+        )
+    else:
+        run(parsed_args.endpoint, parsed_args.partition, parsed_args.inline_threshold)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+import argparse
+import timeit
+import uuid
+
+from common import NameIdDict
+
+
+def parse_arguments():
+    """
+    Parse command line arguments
+    Returns:
+    Parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the NameIdDict codecs",
+        epilog="This benchmark compares the binary codec against the JSON codec\n Example : \n python benchmark_name_id_dict.py --sizes 2 100 10000",
+    )
+    parser.add_argument(
+        "--sizes",
+        help="Numbers of entries of the maps",
+        type=int,
+        nargs="+",
+        default=[2, 10, 100, 1_000, 10_000],
+    )
+    parser.add_argument(
+        "--repeat",
+        help="Number of timed runs, the best one is kept",
+        type=int,
+        default=5,
+    )
+    return parser.parse_args()
+
+
+def sample_map(n: int) -> NameIdDict:
+    """
+    Creates a map shaped like the payloads of the samples
+    Args:
+        n: Number of entries, one out of four is an integer parameter
+
+    Returns:
+        Map of result names to ids and integer parameters
+    """
+    return NameIdDict(
+        {f"result{i}": str(uuid.uuid4()) if i % 4 else i * 1024 for i in range(n)}
+    )
+
+
+def best_time(function, repeat: int) -> float:
+    """
+    Times a function
+    Args:
+        function: Function without argument to time
+        repeat: Number of timed runs
+
+    Returns:
+        Best time per call in seconds
+    """
+    number = max(1, timeit.Timer(function).autorange()[0])
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def main():
+    args = parse_arguments()
+    print(
+        f"{'entries':>8} {'codec':>7} {'bytes':>10} {'encode (us)':>12} {'decode (us)':>12}"
+    )
+    for n in args.sizes:
+        name_id_mapping = sample_map(n)
+        for codec in ("json", "binary"):
+            payload = name_id_mapping.serialize(codec)
+            assert NameIdDict.deserialize(payload).data == name_id_mapping.data
+            encode = best_time(lambda: name_id_mapping.serialize(codec), args.repeat)
+            decode = best_time(lambda: NameIdDict.deserialize(payload), args.repeat)
+            print(
+                f"{n:>8} {codec:>7} {len(payload):>10} {encode * 1e6:>12.1f} {decode * 1e6:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,220 @@
-from typing import Dict
+from array import array
+from itertools import accumulate
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple, Union
 import json
+import struct
+import sys
+
+from compression import compress, decompress
+
+# Inputs up to this size are sent in the payload of the task by default
+DEFAULT_INLINE_THRESHOLD = 4096
+
+# Binary layout: a fixed header, the sizes then the UTF-8 data of the names and string
+# values, the integer values, then the sizes and the data of the bytes values
+# The magic byte is never the first byte of a JSON payload
+BINARY_MAGIC = b"\0"
+BINARY_VERSION = 2
+# Magic, version, numbers of string, integer and bytes values
+_HEADER = struct.Struct("<cBHHH")
+MAX_VALUES = 0xFFFF
+
+Value = Union[str, int, bytes]
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _read_array(typecode: str, data: memoryview, count: int) -> array:
+    values = array(typecode)
+    values.frombytes(data[: count * values.itemsize])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _read_text(payload: bytes, offset: int, count: int) -> Tuple[List[str], int]:
+    sizes = _read_array("I", memoryview(payload)[offset:], count)
+    offset += count * sizes.itemsize
+    bounds = list(accumulate(sizes, initial=0))
+    encoded = payload[offset : offset + bounds[-1]]
+    text = encoded.decode("utf-8")
+    # ASCII text has its characters at the offsets of their bytes
+    source = text if len(text) == len(encoded) else encoded
+    texts = [source[start:end] for start, end in zip(bounds, bounds[1:])]
+    if source is encoded:
+        texts = [data.decode("utf-8") for data in texts]
+    return texts, offset + bounds[-1]
+
+
+def encode_entries(entries: Iterable[Tuple[str, Value]]) -> bytes:
+    """
+    Encodes named values to the binary layout.
+
+    Entries are grouped by type so that decoding reads integers and bytes as arrays,
+    instead of parsing every entry. Names and string values are written with their size,
+    so they can hold any character.
+
+    Args:
+        entries: Names and values, the values are strings, integers or bytes.
+
+    Returns:
+        bytes: The encoded entries, header included.
+
+    Raises:
+        ValueError: If there are more than MAX_VALUES values of a type.
+    """
+    strings, integers, raw = [], [], []
+    for entry in entries:
+        value = entry[1]
+        if isinstance(value, str):
+            strings.append(entry)
+        elif isinstance(value, int):
+            integers.append(entry)
+        else:
+            raw.append(entry)
+    if max(len(strings), len(integers), len(raw)) > MAX_VALUES:
+        raise ValueError(f"At most {MAX_VALUES} values of each type can be encoded")
+    texts = [name for name, _ in strings + integers + raw] + [
+        value for _, value in strings
+    ]
+    text = "".join(texts).encode("utf-8")
+    if len(text) != sum(map(len, texts)):
+        # Non-ASCII texts, their sizes are those of their own encodings
+        texts = [string.encode("utf-8") for string in texts]
+    header = _HEADER.pack(
+        BINARY_MAGIC, BINARY_VERSION, len(strings), len(integers), len(raw)
+    )
+    return b"".join(
+        [
+            header,
+            _little_endian(array("I", map(len, texts))),
+            text,
+            _little_endian(array("q", [value for _, value in integers])),
+            _little_endian(array("I", [len(value) for _, value in raw])),
+            *[value for _, value in raw],
+        ]
+    )
+
+
+def decode_entries(
+    payload: bytes,
+) -> Tuple[Dict[str, Union[str, int]], Dict[str, bytes]]:
+    """
+    Decodes named values from the binary layout.
+
+    Args:
+        payload: The encoded entries, header included.
+
+    Returns:
+        Tuple[Dict[str, Union[str, int]], Dict[str, bytes]]: The string and integer values
+            by name, and the bytes values by name.
+
+    Raises:
+        ValueError: If the payload was encoded by an unsupported version.
+    """
+    _, version, string_count, integer_count, bytes_count = _HEADER.unpack_from(payload)
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported NameIdDict binary version {version}")
+    count = string_count + integer_count + bytes_count
+    texts, offset = _read_text(payload, _HEADER.size, count + string_count)
+    data = memoryview(payload)[offset:]
+    integers = _read_array("q", data, integer_count)
+    data = data[integer_count * integers.itemsize :]
+    lengths = _read_array("I", data, bytes_count)
+    offset = bytes_count * lengths.itemsize
+    raw = []
+    for length in lengths:
+        raw.append(bytes(data[offset : offset + length]))
+        offset += length
+    values = dict(
+        zip(texts[: string_count + integer_count], texts[count:] + integers.tolist())
+    )
+    return values, dict(zip(texts[string_count + integer_count : count], raw))
 
 
 class NameIdDict:
-    def __init__(self, data: Dict[str, str]):
+    def __init__(
+        self,
+        data: Dict[str, Union[str, int]],
+        inline: Optional[Dict[str, bytes]] = None,
+    ):
         """
         Initializes a NameIdDict instance.
 
         This class serves as a container for a dictionary where the keys are result names
-        and the values are their associated IDs.
+        and the values are their associated IDs. Small inputs can be embedded in the
+        container instead of being created as results, to save a result and an upload per
+        input.
 
         Args:
-            data: Dictionary with result names as keys and their associated IDs as values.
+            data: Dictionary with result names as keys and their associated IDs as values,
+                along with integer parameters of the task.
+            inline: Dictionary with input names as keys and their data as values.
         """
         self.data = data
+        self.inline = inline if inline is not None else {}
 
-    def serialize(self) -> bytes:
+    def serialize(
+        self, codec: str = "binary", compression: Optional[str] = None
+    ) -> bytes:
         """
-        Serializes the dictionary to a JSON-encoded byte array.
+        Serializes the dictionary to a byte array.
+
+        The binary codec writes, all little-endian:
+        - an 8 bytes header: BINARY_MAGIC, the version on 1 byte, and the numbers of
+          string, integer and bytes values on 2 bytes each;
+        - the texts: the names of the string values, then of the integer values, then of
+          the bytes values (the inline inputs), then the string values (the ids) in the
+          same order as their names. Their UTF-8 sizes come first, 32 bits unsigned each,
+          then their UTF-8 data, so the texts can hold any character;
+        - the integer values, 64 bits signed each;
+        - the sizes of the inline inputs, 32 bits unsigned each, then their data.
 
-        This method converts the dictionary to a JSON string and then encodes it to bytes.
+        The JSON codec converts the dictionary to a JSON string and then encodes it to bytes.
+        Inline inputs are appended after a newline to a JSON header giving their sizes; as
+        JSON strings never contain a raw newline, payloads without inline inputs keep the
+        plain JSON layout.
+
+        Args:
+            codec: Either "binary" or "json".
+            compression: Codec compressing the payload into a frame, 'auto' to choose
+                it from the payload, or None to leave it uncompressed.
 
         Returns:
             bytes: The serialized dictionary as a byte array.
+
+        Raises:
+            ValueError: If the codec is unknown.
         """
-        return json.dumps(self.data).encode("utf-8")
+        if codec == "binary":
+            payload = encode_entries([*self.data.items(), *self.inline.items()])
+        elif codec != "json":
+            raise ValueError(f"Unknown codec '{codec}', expected 'binary' or 'json'")
+        elif not self.inline:
+            payload = json.dumps(self.data).encode("utf-8")
+        else:
+            header = {
+                "ids": self.data,
+                "inline": [[name, len(value)] for name, value in self.inline.items()],
+            }
+            payload = b"\n".join(
+                [json.dumps(header).encode("utf-8"), b"".join(self.inline.values())]
+            )
+        return payload if compression is None else compress(payload, 1, compression)
 
     @classmethod
     def deserialize(cls, payload: bytes) -> "NameIdDict":
         """
         Deserializes bytes into a NameIdDict instance.
 
-        This method decodes the byte array to a JSON string and then loads it into a dictionary
-        to create a NameIdDict instance.
+        The codec is detected from the first bytes of the payload, after decompressing
+        it if it is a compressed frame: binary payloads start with BINARY_MAGIC, while
+        JSON payloads are decoded to a JSON string and then loaded into a dictionary to
+        create a NameIdDict instance.
 
         Args:
             payload (bytes): The serialized data as bytes.
@@ -40,4 +222,32 @@ class NameIdDict:
         Returns:
             NameIdDict: An instance of NameIdDict created from the serialized data.
         """
-        return cls(json.loads(payload.decode("utf-8")))
+        payload = bytes(decompress(payload))
+        if payload.startswith(BINARY_MAGIC):
+            return cls(*decode_entries(payload))
+        header, separator, inline_data = payload.partition(b"\n")
+        if not separator:
+            return cls(json.loads(header.decode("utf-8")))
+        header = json.loads(header.decode("utf-8"))
+        inline = {}
+        offset = 0
+        for name, size in header["inline"]:
+            inline[name] = inline_data[offset : offset + size]
+            offset += size
+        return cls(header["ids"], inline)
+
+    def get_data(self, name: str, data_dependencies: Mapping[str, bytes]) -> bytes:
+        """
+        Gets the data of an input, from the payload if it is inline or else from the data
+        dependencies of the task.
+
+        Args:
+            name: The name of the input.
+            data_dependencies: The data dependencies of the task, by result ID.
+
+        Returns:
+            bytes: The data of the input.
+        """
+        if name in self.inline:
+            return self.inline[name]
+        return data_dependencies[self.data[name]]
@@ -0,0 +1,188 @@
+import builtins
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+PROFILE_STARTUP_ARGUMENT = "--profile-startup"
+
+
+def process_age() -> Optional[float]:
+    """
+    Gets the time elapsed since the start of the process, before the interpreter loaded.
+
+    Returns:
+        Optional[float]: The age of the process in seconds, or None when it is not
+            available from /proc.
+    """
+    try:
+        with open("/proc/self/stat", "r") as file:
+            # The command name may contain spaces, the fields after it do not
+            fields = file.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime", "r") as file:
+            uptime = float(file.read().split()[0])
+    except (OSError, IndexError, ValueError):
+        return None
+    # Start time of the process, field 22 of stat, in clock ticks after the boot
+    return max(0.0, uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK"))
+
+
+class _Import:
+    __slots__ = ("name", "thread", "depth", "seconds", "modules")
+
+    def __init__(self, name: str, thread: str, depth: int):
+        self.name = name
+        self.thread = thread
+        self.depth = depth
+        self.seconds = 0.0
+        self.modules = 0
+
+
+class StartupProfile:
+    def __init__(self, enabled: bool = False, max_depth: int = 1):
+        """
+        Initializes a StartupProfile instance.
+
+        This class measures the cold start of a worker: the time of each import made
+        after it is created, and the time from the start of the process to milestones
+        such as the start of the server and the first task served. Imports are timed by
+        wrapping builtins.__import__, which is only done when profiling is enabled. The
+        time of an import includes the modules it imports, which are recorded as well
+        down to max_depth nested imports.
+
+        Args:
+            enabled: Whether the startup is profiled, nothing is recorded otherwise.
+            max_depth: Nesting level of the deepest imports recorded, 0 for the imports
+                of the worker only.
+        """
+        self.enabled = enabled
+        self.max_depth = max_depth
+        age = process_age() if enabled else None
+        # Times are relative to the start of the process when it is known
+        self.origin = time.perf_counter() - (age or 0.0)
+        self.imports: List[_Import] = []
+        self.milestones: Dict[str, float] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        if enabled:
+            self.mark("profiler created")
+            self._import = builtins.__import__
+            builtins.__import__ = self._timed_import
+
+    @classmethod
+    def from_environment(cls) -> "StartupProfile":
+        """
+        Creates the profile of a worker started with --profile-startup, or with the
+        WORKER_PROFILE_STARTUP environment variable set to 1.
+
+        Returns:
+            StartupProfile: The profile, disabled unless requested.
+        """
+        return cls(
+            PROFILE_STARTUP_ARGUMENT in sys.argv[1:]
+            or os.getenv("WORKER_PROFILE_STARTUP", "0") == "1"
+        )
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        depth = getattr(self._local, "depth", 0)
+        if depth > self.max_depth or level > 0:
+            return self._import(name, globals, locals, fromlist, level)
+        # Recorded before the nested imports, so that they follow it in the report
+        record = _Import(name, threading.current_thread().name, depth)
+        with self._lock:
+            self.imports.append(record)
+        modules = len(sys.modules)
+        start = time.perf_counter()
+        self._local.depth = depth + 1
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            self._local.depth = depth
+            record.seconds = time.perf_counter() - start
+            record.modules = len(sys.modules) - modules
+
+    def mark(self, milestone: str) -> bool:
+        """
+        Records the first time a milestone is reached.
+
+        Args:
+            milestone: The name of the milestone.
+
+        Returns:
+            bool: True if the milestone is reached for the first time while profiling.
+        """
+        if not self.enabled:
+            return False
+        with self._lock:
+            if milestone in self.milestones:
+                return False
+            self.milestones[milestone] = time.perf_counter() - self.origin
+            return True
+
+    def _loaded(self) -> List[_Import]:
+        # Imports of modules already loaded cost nothing and are left out; the later
+        # imports of a package, such as the lazy imports of numba, are added together
+        loaded: Dict[Tuple[str, str, int], _Import] = {}
+        with self._lock:
+            records = list(self.imports)
+        for record in records:
+            if record.modules == 0:
+                continue
+            key = (record.thread, record.name, record.depth)
+            if key not in loaded:
+                loaded[key] = _Import(record.name, record.thread, record.depth)
+            loaded[key].seconds += record.seconds
+            loaded[key].modules += record.modules
+        # The imports of each thread together, in the order they started
+        threads = {record.thread: None for record in loaded.values()}
+        order = {thread: index for index, thread in enumerate(threads)}
+        return sorted(loaded.values(), key=lambda record: order[record.thread])
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Gets the measures of the startup.
+
+        Returns:
+            Dict[str, Dict[str, float]]: The time in seconds of each import of the
+                worker which loaded modules, and the time from the start of the process
+                to each milestone.
+        """
+        with self._lock:
+            milestones = dict(self.milestones)
+        return {
+            "imports": {
+                record.name: round(record.seconds, 6)
+                for record in self._loaded()
+                if record.depth == 0
+            },
+            "milestones": {name: round(at, 6) for name, at in milestones.items()},
+        }
+
+    def report(self, min_seconds: float = 0.001) -> str:
+        """
+        Formats the measures of the startup.
+
+        Args:
+            min_seconds: Time under which an import is not shown.
+
+        Returns:
+            str: A table of the imports, in the order they started with the nested
+                imports indented under their parent, and a table of the milestones.
+        """
+        imports = [record for record in self._loaded() if record.seconds >= min_seconds]
+        with self._lock:
+            milestones = sorted(self.milestones.items(), key=lambda item: item[1])
+        names = ["  " * record.depth + record.name for record in imports]
+        width = max([len(name) for name in names] + [len("module")])
+        lines = [f"{'module':<{width}} {'thread':>16} {'ms':>9} {'modules':>8}"]
+        for name, record in zip(names, imports):
+            lines.append(
+                f"{name:<{width}} {record.thread:>16} {record.seconds * 1e3:>9.1f} "
+                f"{record.modules:>8}"
+            )
+        lines.append("")
+        lines.append(f"{'milestone':<24} {'s after start':>14}")
+        for milestone, at in milestones:
+            lines.append(f"{milestone:<24} {at:>14.3f}")
+        return "\n".join(lines)
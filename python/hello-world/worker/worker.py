@@ -1,23 +1,33 @@
-import logging
 import sys
-
-from armonik.worker import TaskHandler, ClefLogger
-# This import should be fixed in future versions of the API
-from armonik.worker.worker import armonik_worker
-from armonik.common import Output
 from pathlib import Path
 
 # Add the common directory to the system path
 common_path = Path(__file__).resolve().parent.parent / "common"
 sys.path.append(str(common_path))
 
-from common import NameIdDict
+from startup import StartupProfile
+
+# Created before the other imports to time them with --profile-startup
+startup = StartupProfile.from_environment()
+
+import logging
 
+from armonik.worker import TaskHandler, ClefLogger
+
+# This import should be fixed in future versions of the API
+from armonik.worker.worker import armonik_worker
+from armonik.common import Output
+
+from common import NameIdDict
+from metrics import WorkerMetrics
 
 # Create Seq compatible logger
 ClefLogger.setup_logging(logging.INFO)
 logger = ClefLogger.getLogger("ArmoniKWorker")
 
+# Per-phase metrics, disabled unless configured by the environment
+metrics = WorkerMetrics.from_environment()
+
 
 @armonik_worker()
 def processor(task_handler: TaskHandler) -> Output:
@@ -30,24 +40,44 @@ def processor(task_handler: TaskHandler) -> Output:
     Returns:
         Output: The result of the task processing.
     """
+    startup.mark("first task received")
     logger = ClefLogger.getLogger("ArmoniKWorker")
     logger.info("Handeling the Task")
     payload = task_handler.payload
+    metrics.add_bytes("payload", len(payload))
 
-    name_id_mapping = NameIdDict.deserialize(payload).data
+    with metrics.phase("payload_decode"):
+        name_id_mapping = NameIdDict.deserialize(payload)
 
-    encoded_data = task_handler.data_dependencies[name_id_mapping["input"]]
+    # Small inputs are sent in the payload, larger ones as data dependencies
+    with metrics.phase("dependency_decode"):
+        encoded_data = name_id_mapping.get_data("input", task_handler.data_dependencies)
+    if "input" not in name_id_mapping.inline:
+        metrics.add_bytes("dependencies", len(encoded_data))
 
-    # We convert the binary data from the handler back to the string sent by the client
-    input = encoded_data.decode()
-    output = input + " world!"
+    with metrics.phase("compute"):
+        # We convert the binary data from the handler back to the string sent by the client
+        input = encoded_data.decode()
+        output = input + " world!"
 
     result_id = task_handler.expected_results.pop(0)
 
-    task_handler.send_results({result_id: output.encode()})
+    with metrics.phase("result_encode"):
+        result = output.encode()
+    metrics.add_bytes("results", len(result))
+
+    with metrics.phase("send_results"):
+        task_handler.send_results({result_id: result})
+
+    if startup.mark("first task served"):
+        logger.info("Startup profile", extra={"context": startup.summary()})
+        print(startup.report(), file=sys.stderr, flush=True)
 
     return Output()
 
 
 if __name__ == "__main__":
+    # Export the metrics, if enabled
+    metrics.start()
+    startup.mark("server starting")
     processor.run()
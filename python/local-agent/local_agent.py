@@ -0,0 +1,819 @@
+import argparse
+import importlib
+import importlib.util
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Set, Union
+
+from armonik.common import Output, Result, Task, TaskDefinition, TaskOptions
+
+Processor = Callable[["LocalTaskHandler"], Output]
+
+
+@dataclass
+class AgentStats:
+    """
+    Counters of a local execution.
+
+    Attributes:
+        tasks_submitted: Number of tasks submitted, by the client or by tasks.
+        tasks_completed: Number of tasks executed.
+        results_created: Number of results created, by the client or by tasks.
+        bytes_uploaded: Bytes uploaded by the client.
+        bytes_created: Bytes uploaded by tasks through create_results.
+        bytes_sent: Bytes sent as task results.
+        elapsed: Wall time in seconds spent executing the task graph.
+    """
+
+    tasks_submitted: int = 0
+    tasks_completed: int = 0
+    results_created: int = 0
+    bytes_uploaded: int = 0
+    bytes_created: int = 0
+    bytes_sent: int = 0
+    elapsed: float = 0.0
+
+
+@dataclass
+class TaskRequest:
+    """
+    Everything a task needs to run, sent to the executor.
+    """
+
+    session_id: str
+    task_id: str
+    payload_id: str
+    payload: bytes
+    data_dependencies: Dict[str, bytes]
+    expected_results: List[str]
+    task_options: TaskOptions
+
+
+@dataclass
+class TaskEffects:
+    """
+    Everything a task did, applied by the agent once the task is completed.
+    """
+
+    output: Output
+    created_results: Set[str] = field(default_factory=set)
+    uploaded_data: Dict[str, bytes] = field(default_factory=dict)
+    submitted_tasks: List[TaskDefinition] = field(default_factory=list)
+    sent_results: Dict[str, bytes] = field(default_factory=dict)
+
+
+class LocalTaskHandler:
+    def __init__(self, request: TaskRequest):
+        """
+        Initializes a LocalTaskHandler instance.
+
+        This class stands in for armonik.worker.TaskHandler: it exposes the same attributes
+        and agent calls, but records the calls instead of sending them to an agent.
+
+        Args:
+            request: The task to handle.
+        """
+        self.session_id: str = request.session_id
+        self.task_id: str = request.task_id
+        self.task_options: TaskOptions = request.task_options
+        self.token: str = ""
+        self.expected_results: List[str] = list(request.expected_results)
+        self.configuration = None
+        self.payload_id: str = request.payload_id
+        self.data_folder: str = ""
+        self.payload: bytes = request.payload
+        self.data_dependencies: Dict[str, bytes] = request.data_dependencies
+        self.effects = TaskEffects(Output())
+        self._results_count = 0
+
+    def create_results_metadata(
+        self, result_names: List[str], batch_size: int = 100
+    ) -> Dict[str, Result]:
+        """
+        Create the metadata of multiple results at once.
+
+        Args:
+            result_names: The names of the results to create.
+            batch_size: Ignored, kept for compatibility.
+
+        Returns:
+            A dictionary mapping each result name to its result summary.
+        """
+        results = {}
+        for name in result_names:
+            # Unique across the tasks, even when they run in other processes
+            result_id = f"{self.task_id}.{self._results_count}"
+            self._results_count += 1
+            self.effects.created_results.add(result_id)
+            results[name] = Result(
+                session_id=self.session_id,
+                name=name,
+                owner_task_id=self.task_id,
+                result_id=result_id,
+            )
+        return results
+
+    def create_results(
+        self, results_data: Dict[str, bytes], batch_size: int = 1
+    ) -> Dict[str, Result]:
+        """
+        Create results with their data.
+
+        Args:
+            results_data: A dictionary mapping the result names to their actual data.
+            batch_size: Ignored, kept for compatibility.
+
+        Returns:
+            A dictionary mapping each result name to its result summary.
+        """
+        results = self.create_results_metadata(list(results_data.keys()))
+        for name, data in results_data.items():
+            # Copy the data as the gRPC serialization would
+            self.effects.uploaded_data[results[name].result_id] = bytes(data)
+        return results
+
+    def submit_tasks(
+        self,
+        tasks: List[TaskDefinition],
+        default_task_options: Optional[TaskOptions] = None,
+        batch_size: Optional[int] = 100,
+    ) -> List[Task]:
+        """
+        Submit tasks, they are scheduled once the current task is completed.
+
+        Args:
+            tasks: List of task definitions.
+            default_task_options: Task options used if a task has its options not set,
+                the options of the current task are used otherwise.
+            batch_size: Ignored, kept for compatibility.
+
+        Returns:
+            The submitted tasks.
+        """
+        options = default_task_options or self.task_options
+        submitted = []
+        for task in tasks:
+            definition = TaskDefinition(
+                payload_id=task.payload_id,
+                expected_output_ids=list(task.expected_output_ids),
+                data_dependencies=list(task.data_dependencies),
+                options=task.options or options,
+            )
+            self.effects.submitted_tasks.append(definition)
+            submitted.append(
+                Task(
+                    expected_output_ids=definition.expected_output_ids,
+                    data_dependencies=definition.data_dependencies,
+                    session_id=self.session_id,
+                    payload_id=definition.payload_id,
+                )
+            )
+        return submitted
+
+    def send_results(self, results_data: Dict[str, Union[bytes, bytearray]]) -> None:
+        """
+        Send results.
+
+        Args:
+            results_data: A dictionary mapping each result ID to its data.
+        """
+        for result_id, data in results_data.items():
+            self.effects.sent_results[result_id] = bytes(data)
+
+
+# Processor of the worker processes, inherited when they are forked
+_process_processor: Optional[Processor] = None
+
+
+def _set_process_processor(processor: Processor) -> None:
+    global _process_processor
+    _process_processor = processor
+
+
+def _execute_in_process(request: TaskRequest) -> TaskEffects:
+    return execute(_process_processor, request)
+
+
+def execute(processor: Processor, request: TaskRequest) -> TaskEffects:
+    """
+    Runs a processor on a task and collects what it did.
+
+    Args:
+        processor: The processor of the worker.
+        request: The task to run.
+
+    Returns:
+        TaskEffects: The calls made by the task and its output.
+    """
+    handler = LocalTaskHandler(request)
+    try:
+        handler.effects.output = processor(handler)
+    except Exception as e:
+        handler.effects.output = Output(f"{type(e).__name__}: {e}")
+    return handler.effects
+
+
+@dataclass
+class _PendingTask:
+    request: TaskRequest
+    dependency_ids: List[str]
+    missing: Set[str]
+
+
+class LocalAgent:
+    def __init__(self, task_options: TaskOptions, session_id: str = "local-session"):
+        """
+        Initializes a LocalAgent instance.
+
+        This class stands in for the ArmoniK control plane and agent of a single session:
+        the client creates results and submits tasks with the same calls as the ArmoniK
+        clients, then run executes the task graph, including the tasks submitted by the
+        tasks, with a local processor.
+
+        Args:
+            task_options: Default task options of the session.
+            session_id: Id of the session given to the tasks.
+        """
+        self.session_id = session_id
+        self.task_options = task_options
+        self.stats = AgentStats()
+        self._data: Dict[str, bytes] = {}
+        self._created: Set[str] = set()
+        self._owned_by_client: Set[str] = set()
+        self._consumers: Dict[str, int] = {}
+        self._waiting: Dict[str, List[_PendingTask]] = {}
+        self._ready: List[TaskRequest] = []
+        self._released: Set[str] = set()
+        self._ids = itertools.count()
+
+    def create_results_metadata(self, result_names: List[str]) -> Dict[str, Result]:
+        """
+        Create the metadata of results from the client.
+
+        Args:
+            result_names: The names of the results to create.
+
+        Returns:
+            A dictionary mapping each result name to its result summary.
+        """
+        results = {}
+        for name in result_names:
+            result_id = f"result-{next(self._ids)}"
+            self._created.add(result_id)
+            self._owned_by_client.add(result_id)
+            self.stats.results_created += 1
+            results[name] = Result(
+                session_id=self.session_id, name=name, result_id=result_id
+            )
+        return results
+
+    def create_results(self, results_data: Dict[str, bytes]) -> Dict[str, Result]:
+        """
+        Create results with their data from the client.
+
+        Args:
+            results_data: A dictionary mapping the result names to their actual data.
+
+        Returns:
+            A dictionary mapping each result name to its result summary.
+        """
+        results = self.create_results_metadata(list(results_data.keys()))
+        for name, data in results_data.items():
+            self.upload_result_data(results[name].result_id, data)
+        return results
+
+    def upload_result_data(self, result_id: str, result_data: bytes) -> None:
+        """
+        Upload the data of a result created by the client.
+
+        Args:
+            result_id: The ID of the result.
+            result_data: The result data.
+        """
+        self.stats.bytes_uploaded += len(result_data)
+        self._complete(result_id, bytes(result_data))
+
+    def download_result_data(self, result_id: str) -> bytes:
+        """
+        Retrieve the data of a result.
+
+        Args:
+            result_id: The ID of the result.
+
+        Returns:
+            The result data.
+
+        Raises:
+            KeyError: If the result has no data.
+        """
+        return self._data[result_id]
+
+    def submit_tasks(
+        self,
+        tasks: List[TaskDefinition],
+        default_task_options: Optional[TaskOptions] = None,
+    ) -> None:
+        """
+        Submit tasks from the client, they are executed by run.
+
+        Args:
+            tasks: List of task definitions.
+            default_task_options: Task options used if a task has its options not set,
+                the default task options of the session are used otherwise.
+        """
+        for task in tasks:
+            self._submit(
+                task, task.options or default_task_options or self.task_options
+            )
+
+    def run(
+        self,
+        processor: Processor,
+        workers: int = 0,
+        executor: str = "thread",
+    ) -> AgentStats:
+        """
+        Executes the submitted tasks, and the tasks they submit, until none is left.
+
+        Args:
+            processor: The processor of the worker, or the result of armonik_worker.
+            workers: Number of concurrent tasks, 0 runs the tasks one after the other in
+                the current thread.
+            executor: 'thread' or 'process', type of the pool running concurrent tasks.
+                The process pool forks the current process and is only available on Unix.
+
+        Returns:
+            AgentStats: The counters of the execution, also available in stats.
+
+        Raises:
+            RuntimeError: If a task fails.
+        """
+        # Unwrap the processor decorated with armonik_worker
+        processor = getattr(processor, "processor", processor)
+        start = time.perf_counter()
+        try:
+            if workers <= 0:
+                while self._ready:
+                    request = self._ready.pop()
+                    self._apply(request, execute(processor, request))
+            else:
+                with self._create_executor(processor, workers, executor) as pool:
+                    self._run_pool(pool, processor, workers, executor == "process")
+        finally:
+            self.stats.elapsed += time.perf_counter() - start
+        if self._waiting:
+            raise RuntimeError(
+                f"{len(self._waiting)} results are never completed, "
+                "some tasks could not be executed"
+            )
+        return self.stats
+
+    def _create_executor(
+        self, processor: Processor, workers: int, executor: str
+    ) -> Executor:
+        if executor == "process":
+            return ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_set_process_processor,
+                initargs=(processor,),
+            )
+        if executor == "thread":
+            return ThreadPoolExecutor(max_workers=workers)
+        raise ValueError(f"Unsupported executor '{executor}'")
+
+    def _run_pool(
+        self, pool: Executor, processor: Processor, workers: int, in_process: bool
+    ) -> None:
+        running: Dict[Future, TaskRequest] = {}
+        while self._ready or running:
+            # Keep at most twice the number of workers in flight
+            while self._ready and len(running) < 2 * workers:
+                request = self._ready.pop()
+                if in_process:
+                    future = pool.submit(_execute_in_process, request)
+                else:
+                    future = pool.submit(execute, processor, request)
+                running[future] = request
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                self._apply(running.pop(future), future.result())
+
+    def _submit(self, task: TaskDefinition, options: TaskOptions) -> None:
+        self.stats.tasks_submitted += 1
+        dependencies = [task.payload_id] + list(task.data_dependencies)
+        for result_id in dependencies:
+            if result_id in self._released:
+                raise RuntimeError(
+                    f"Result {result_id} was released after its last use"
+                )
+            if result_id not in self._created:
+                raise RuntimeError(f"Result {result_id} does not exist")
+            self._consumers[result_id] = self._consumers.get(result_id, 0) + 1
+        pending = _PendingTask(
+            TaskRequest(
+                session_id=self.session_id,
+                task_id=f"task-{next(self._ids)}",
+                payload_id=task.payload_id,
+                payload=b"",
+                data_dependencies={},
+                expected_results=list(task.expected_output_ids),
+                task_options=options,
+            ),
+            list(task.data_dependencies),
+            {result_id for result_id in dependencies if result_id not in self._data},
+        )
+        if pending.missing:
+            for result_id in pending.missing:
+                self._waiting.setdefault(result_id, []).append(pending)
+        else:
+            self._schedule(pending)
+
+    def _schedule(self, pending: _PendingTask) -> None:
+        request = pending.request
+        request.payload = self._data[request.payload_id]
+        request.data_dependencies = {
+            result_id: self._data[result_id] for result_id in pending.dependency_ids
+        }
+        self._ready.append(request)
+
+    def _complete(self, result_id: str, data: bytes) -> None:
+        if result_id not in self._created:
+            raise RuntimeError(f"Result {result_id} does not exist")
+        self._data[result_id] = data
+        for pending in self._waiting.pop(result_id, []):
+            pending.missing.discard(result_id)
+            if not pending.missing:
+                self._schedule(pending)
+
+    def _apply(self, request: TaskRequest, effects: TaskEffects) -> None:
+        if not effects.output.success:
+            raise RuntimeError(f"Task {request.task_id} failed: {effects.output.error}")
+        self.stats.tasks_completed += 1
+        self.stats.results_created += len(effects.created_results)
+        self._created.update(effects.created_results)
+        for result_id, data in effects.uploaded_data.items():
+            self.stats.bytes_created += len(data)
+            self._complete(result_id, data)
+        for task in effects.submitted_tasks:
+            self._submit(task, task.options)
+        for result_id, data in effects.sent_results.items():
+            self.stats.bytes_sent += len(data)
+            self._complete(result_id, data)
+        # Release the data created by tasks once all their consumers are done
+        for result_id in [request.payload_id] + list(request.data_dependencies):
+            self._consumers[result_id] -= 1
+            if (
+                self._consumers[result_id] == 0
+                and result_id not in self._owned_by_client
+            ):
+                del self._consumers[result_id]
+                del self._data[result_id]
+                self._released.add(result_id)
+
+
+def load_processor(worker_path: str, name: str = "processor") -> Processor:
+    """
+    Imports the processor of a sample worker script.
+
+    The directory of the script is added to the import path, so that its local imports
+    are resolved as in its container.
+
+    Args:
+        worker_path: Path of the worker script.
+        name: Name of the processor in the script.
+
+    Returns:
+        The processor of the worker.
+    """
+    worker_path = os.path.abspath(worker_path)
+    sys.path.insert(0, os.path.dirname(worker_path))
+    spec = importlib.util.spec_from_file_location("worker", worker_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["worker"] = module
+    spec.loader.exec_module(module)
+    return getattr(module, name)
+
+
+# Root of the Python samples
+SAMPLES_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_TASK_OPTIONS = TaskOptions(
+    max_duration=timedelta(hours=1), priority=1, max_retries=2
+)
+
+
+def run_subtasking(args: argparse.Namespace) -> AgentStats:
+    """
+    Reduces the N first integers with the subtasking worker.
+
+    Args:
+        args: Parsed command line arguments.
+
+    Returns:
+        AgentStats: The counters of the execution.
+    """
+    processor = load_processor(os.path.join(SAMPLES_PATH, "subtasking", "worker.py"))
+    import numpy as np
+    from compression import compress
+    from reduction import ReductionEngine
+    from splitting import RangeDescriptor
+
+    engine = ReductionEngine(
+        args.dtype, args.operation, bins=args.bins, low=1, high=max(args.N, 2)
+    )
+    options = {
+        "fanout": str(args.fanout),
+        "levels": str(args.levels),
+        "mode": args.mode,
+        **engine.to_options(),
+    }
+    if args.split is not None:
+        options["split"] = str(args.split)
+    if args.compression is not None:
+        options["compression"] = args.compression
+    agent = LocalAgent(
+        TaskOptions(
+            max_duration=DEFAULT_TASK_OPTIONS.max_duration,
+            priority=DEFAULT_TASK_OPTIONS.priority,
+            max_retries=DEFAULT_TASK_OPTIONS.max_retries,
+            options=options,
+        )
+    )
+    values = np.arange(1, args.N + 1, dtype=engine.dtype).tobytes()
+    if args.compression is not None:
+        values = compress(values, engine.dtype.itemsize, args.compression)
+    result_id = agent.create_results_metadata(["result"])["result"].result_id
+    if args.mode == "range":
+        values_id = agent.create_results({"values": values})["values"].result_id
+        payload = RangeDescriptor(values_id, 0, args.N).serialize()
+        data_dependencies = [values_id]
+    else:
+        payload = values
+        data_dependencies = []
+    payload_id = agent.create_results({"payload": payload})["payload"].result_id
+    agent.submit_tasks([TaskDefinition(payload_id, [result_id], data_dependencies)])
+    stats = agent.run(processor, args.workers, args.executor)
+    print(f"Result: {engine.finalize(agent.download_result_data(result_id))}")
+    return stats
+
+
+def run_hello_world(args: argparse.Namespace) -> AgentStats:
+    """
+    Sends 'Hello' to independent tasks of the hello-world worker.
+
+    Args:
+        args: Parsed command line arguments.
+
+    Returns:
+        AgentStats: The counters of the execution.
+    """
+    processor = load_processor(
+        os.path.join(SAMPLES_PATH, "hello-world", "worker", "worker.py")
+    )
+    from common import NameIdDict
+
+    agent = LocalAgent(DEFAULT_TASK_OPTIONS)
+    output_ids = []
+    input_data = b"Hello"
+    for _ in range(args.tasks):
+        output_ids.append(agent.create_results_metadata(["output"])["output"].result_id)
+        if len(input_data) <= args.inline_threshold:
+            # The input is sent in the payload
+            name_id_mapping = NameIdDict(
+                {"output": output_ids[-1]}, inline={"input": input_data}
+            )
+            data_dependencies = []
+        else:
+            input_id = agent.create_results({"input": input_data})["input"].result_id
+            name_id_mapping = NameIdDict({"input": input_id, "output": output_ids[-1]})
+            data_dependencies = [input_id]
+        payload = name_id_mapping.serialize()
+        payload_id = agent.create_results({"payload": payload})["payload"].result_id
+        agent.submit_tasks(
+            [TaskDefinition(payload_id, [output_ids[-1]], data_dependencies)]
+        )
+    stats = agent.run(processor, args.workers, args.executor)
+    print(f"Result: {agent.download_result_data(output_ids[0]).decode()}")
+    return stats
+
+
+def run_hello_world_gpu(args: argparse.Namespace) -> AgentStats:
+    """
+    Sums random vectors with independent tasks of the hello-world-gpu worker.
+
+    Args:
+        args: Parsed command line arguments.
+
+    Returns:
+        AgentStats: The counters of the execution.
+    """
+    if args.cudasim:
+        # Must be set before numba is imported by the worker
+        os.environ["NUMBA_ENABLE_CUDASIM"] = "1"
+    if args.backend:
+        # Read when the worker is imported
+        os.environ["COMPUTE_BACKEND"] = args.backend
+    processor = load_processor(
+        os.path.join(SAMPLES_PATH, "hello-world-gpu", "worker.py")
+    )
+    # The worker imports its task module, with NumPy and numba, on its first task.
+    # Import it once here so that the forked workers of the process pool inherit it
+    importlib.import_module("task")
+    import numpy as np
+    from common import NameIdDict, NumpyArraySerializer, summarize_profiles
+
+    rng = np.random.default_rng(args.seed)
+    agent = LocalAgent(DEFAULT_TASK_OPTIONS)
+    output_ids = []
+    profile_ids = []
+    expected = []
+    for _ in range(args.tasks):
+        a = rng.random(args.size, dtype=np.float32)
+        b = rng.random(args.size, dtype=np.float32)
+        expected.append(a + b)
+        results = agent.create_results_metadata(
+            ["output", "profile"] if args.profile else ["output"]
+        )
+        results.update(
+            agent.create_results(
+                {
+                    "array1": NumpyArraySerializer(a).serialize(args.compression),
+                    "array2": NumpyArraySerializer(b).serialize(args.compression),
+                }
+            )
+        )
+        output_ids.append(results["output"].result_id)
+        task_info = {
+            "array1": results["array1"].result_id,
+            "array2": results["array2"].result_id,
+            "output": output_ids[-1],
+        }
+        if args.streams:
+            task_info.update(streams=args.streams, chunk_size=args.chunk_size)
+        if args.compression is not None:
+            task_info["compression"] = args.compression
+        if args.profile:
+            # The profile of the task is sent as a second result
+            task_info["profile"] = 1
+            profile_ids.append(results["profile"].result_id)
+        expected_output_ids = [
+            results[name].result_id for name in ("output", "profile") if name in results
+        ]
+        payload = NameIdDict(task_info).serialize()
+        payload_id = agent.create_results({"payload": payload})["payload"].result_id
+        agent.submit_tasks(
+            [
+                TaskDefinition(
+                    payload_id,
+                    expected_output_ids,
+                    [results["array1"].result_id, results["array2"].result_id],
+                )
+            ]
+        )
+    stats = agent.run(processor, args.workers, args.executor)
+    for output_id, expected_sum in zip(output_ids, expected):
+        result = NumpyArraySerializer.deserialize(agent.download_result_data(output_id))
+        if not np.array_equal(result.array, expected_sum):
+            raise RuntimeError(f"Wrong sum in result {output_id}")
+    print(f"Result: {result.array}")
+    if profile_ids:
+        print(
+            summarize_profiles(
+                [json.loads(agent.download_result_data(id)) for id in profile_ids]
+            )
+        )
+    return stats
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments
+    Returns:
+    Parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Runs the Python samples workers in process, without ArmoniK",
+        epilog="Example : \n python local_agent.py --workers 4 subtasking --split 1000 1000000",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        help="Number of concurrent tasks, 0 runs the tasks one after the other",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "--executor",
+        help="Pool running concurrent tasks, the process pool forks the current process",
+        choices=["thread", "process"],
+        default="thread",
+    )
+    parser.add_argument(
+        "-v", "--verbose", help="Keep the logs of the workers", action="store_true"
+    )
+    samples = parser.add_subparsers(dest="sample", required=True)
+
+    subtasking = samples.add_parser(
+        "subtasking", help="Reduction of the N first integers"
+    )
+    subtasking.add_argument("-s", "--split", help="Split threshold", type=int)
+    subtasking.add_argument("-k", "--fanout", help="Split fan-out", type=int, default=2)
+    subtasking.add_argument("-m", "--mode", choices=["copy", "range"], default="copy")
+    subtasking.add_argument("--levels", type=int, default=1, help="Split levels")
+    subtasking.add_argument("--dtype", default="int32", help="Type of the values")
+    subtasking.add_argument("--operation", default="sum", help="Reduction")
+    subtasking.add_argument("--bins", type=int, default=10, help="Histogram bins")
+    subtasking.add_argument(
+        "--compression",
+        choices=["auto", "none", "zlib", "lzma"],
+        help="Codec of the values",
+    )
+    subtasking.add_argument("N", help="Number of values", type=int)
+    subtasking.set_defaults(run=run_subtasking)
+
+    hello_world = samples.add_parser("hello-world", help="Independent hello tasks")
+    hello_world.add_argument("--tasks", type=int, default=1000, help="Number of tasks")
+    hello_world.add_argument(
+        "--inline-threshold",
+        type=int,
+        default=4096,
+        help="Maximum size in bytes of an input sent in the payload",
+    )
+    hello_world.set_defaults(run=run_hello_world)
+
+    hello_world_gpu = samples.add_parser("hello-world-gpu", help="Vector additions")
+    hello_world_gpu.add_argument(
+        "--tasks", type=int, default=10, help="Number of tasks"
+    )
+    hello_world_gpu.add_argument(
+        "--size", type=int, default=1000000, help="Vector size"
+    )
+    hello_world_gpu.add_argument("--seed", type=int, default=47, help="Random seed")
+    hello_world_gpu.add_argument(
+        "--streams",
+        type=int,
+        default=0,
+        help="Number of CUDA streams of the streamed mode, 0 disables it",
+    )
+    hello_world_gpu.add_argument(
+        "--chunk-size",
+        type=int,
+        default=1 << 20,
+        help="Number of values per chunk in the streamed mode",
+    )
+    hello_world_gpu.add_argument(
+        "--backend",
+        choices=["auto", "cuda", "numba-cpu", "numpy"],
+        help="Compute backend of the worker, COMPUTE_BACKEND or auto by default",
+    )
+    hello_world_gpu.add_argument(
+        "--profile",
+        help="Profile the tasks and print the time of their stages",
+        action="store_true",
+    )
+    hello_world_gpu.add_argument(
+        "--compression",
+        choices=["auto", "none", "zlib", "lzma"],
+        help="Codec of the vectors and of the results",
+    )
+    hello_world_gpu.add_argument(
+        "--cudasim",
+        help="Run the kernels with the Numba CUDA simulator",
+        action="store_true",
+    )
+    hello_world_gpu.set_defaults(run=run_hello_world_gpu)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if not args.verbose:
+        # Per task logs would dominate the execution time
+        logging.disable(logging.INFO)
+    stats = args.run(args)
+    print(
+        f"{stats.tasks_completed} tasks in {stats.elapsed:.3f} s "
+        f"({stats.tasks_completed / stats.elapsed:.0f} tasks/s), "
+        f"{stats.results_created} results, {stats.bytes_uploaded} bytes uploaded, "
+        f"{stats.bytes_created} bytes created by tasks, {stats.bytes_sent} bytes sent"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import time
+import traceback
+from typing import Callable, List
+
+# A job receives the command line arguments of the client
+Job = Callable[[List[str]], None]
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        request = json.loads(self.rfile.readline().decode("utf-8"))
+        response = self.server.daemon.run(request)
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class _JobServer(socketserver.UnixStreamServer):
+    def __init__(self, socket_path: str, daemon: "SessionDaemon"):
+        super().__init__(socket_path, _JobHandler)
+        self.daemon = daemon
+
+
+class SessionDaemon:
+    def __init__(self, socket_path: str, job: Job, idle_timeout: float = 300):
+        """
+        Initializes a SessionDaemon instance.
+
+        This class serves jobs sent by clients over a local Unix socket, so that a client
+        process keeps its gRPC channel and its session open across many jobs. Jobs run one
+        after the other; what they print and log is sent back to the client.
+
+        Args:
+            socket_path: Path of the Unix socket to listen on.
+            job: Runs a job from the command line arguments of the client.
+            idle_timeout: Time in seconds without jobs after which the daemon stops.
+        """
+        self.socket_path = socket_path
+        self.job = job
+        self.idle_timeout = idle_timeout
+        self.jobs = 0
+        self._stopped = False
+        self._last_activity = time.monotonic()
+
+    def serve(self) -> None:
+        """
+        Serves jobs until the idle timeout expires or a client asks to stop.
+        """
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        with _JobServer(self.socket_path, self) as server:
+            try:
+                while not self._stopped:
+                    remaining = self.idle_timeout - (
+                        time.monotonic() - self._last_activity
+                    )
+                    if remaining <= 0:
+                        break
+                    server.timeout = remaining
+                    server.handle_request()
+            finally:
+                os.remove(self.socket_path)
+
+    def run(self, request: dict) -> dict:
+        """
+        Runs the job of a request.
+
+        Args:
+            request: Either {"args": [...]} to run a job or {"stop": true} to stop.
+
+        Returns:
+            dict: The output of the job and, if it failed, its error.
+        """
+        self._last_activity = time.monotonic()
+        if request.get("stop", False):
+            self._stopped = True
+            return {"output": f"Daemon stopped after {self.jobs} jobs"}
+        output = io.StringIO()
+        handler = logging.StreamHandler(output)
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+        )
+        root_logger = logging.getLogger()
+        root_logger.addHandler(handler)
+        error = None
+        start = time.perf_counter()
+        try:
+            # The usage and errors of argparse are written to stderr
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                self.job(request["args"])
+        except SystemExit as e:
+            # Raised by argparse on invalid arguments
+            error = f"Invalid arguments (exit code {e.code})"
+        except Exception:
+            error = traceback.format_exc()
+        finally:
+            root_logger.removeHandler(handler)
+            self.jobs += 1
+            self._last_activity = time.monotonic()
+        return {
+            "output": output.getvalue(),
+            "error": error,
+            "duration": time.perf_counter() - start,
+        }
+
+
+def send_request(socket_path: str, request: dict) -> dict:
+    """
+    Sends a request to a daemon and waits for its response.
+
+    Args:
+        socket_path: Path of the Unix socket of the daemon.
+        request: Either {"args": [...]} to run a job or {"stop": true} to stop.
+
+    Returns:
+        dict: The response of the daemon.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with connection.makefile("rb") as response:
+            return json.loads(response.readline().decode("utf-8"))
+
+
+def submit_job(socket_path: str, args: List[str]) -> int:
+    """
+    Runs a job on a daemon and prints its output.
+
+    Args:
+        socket_path: Path of the Unix socket of the daemon.
+        args: Command line arguments of the job.
+
+    Returns:
+        int: Exit code, 1 if the job failed.
+    """
+    response = send_request(socket_path, {"args": args})
+    print(response["output"], end="")
+    if response.get("error"):
+        print(response["error"])
+        return 1
+    return 0
+
+
+def strip_daemon_arguments(args: List[str], flags: List[str]) -> List[str]:
+    """
+    Removes the daemon options and their values from command line arguments.
+
+    Args:
+        args: Command line arguments.
+        flags: Daemon options taking a value, such as --daemon.
+
+    Returns:
+        List[str]: The arguments of the job.
+    """
+    job_args = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in flags:
+            skip = True
+        elif not any(arg.startswith(flag + "=") for flag in flags):
+            job_args.append(arg)
+    return job_args
+
+
+def absolute_path_arguments(args: List[str], flags: List[str]) -> List[str]:
+    """
+    Makes the values of path options absolute, as the daemon resolves relative paths
+    against its own working directory instead of that of the submitter.
+
+    Args:
+        args: Command line arguments.
+        flags: Options taking a path, such as --input.
+
+    Returns:
+        List[str]: The arguments, with absolute paths as the values of the options.
+    """
+    job_args = []
+    is_path = False
+    for arg in args:
+        if is_path:
+            arg = os.path.abspath(arg)
+            is_path = False
+        elif arg in flags:
+            is_path = True
+        else:
+            flag, separator, value = arg.partition("=")
+            if separator and flag in flags:
+                arg = f"{flag}={os.path.abspath(value)}"
+        job_args.append(arg)
+    return job_args
@@ -0,0 +1,210 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, NamedTuple, Optional, Union
+
+from armonik.common import TaskDefinition, TaskOptions
+from armonik.worker import TaskHandler
+
+from splitting import split_bounds
+
+# Maximum size of the payloads sent in a single create_results call
+MAX_BATCH_BYTES = 4 << 20
+
+# Runs the creation of the results metadata alongside the creation of the payloads
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batching")
+
+
+class LocalResult(NamedTuple):
+    """
+    Reference to a result of a batch, which has no id until the batch is created.
+    """
+
+    name: str
+
+
+ResultReference = Union[LocalResult, str]
+
+
+@dataclass
+class _BatchTask:
+    payload: LocalResult
+    outputs: List[ResultReference]
+    dependencies: List[ResultReference] = field(default_factory=list)
+
+
+class SubtaskBatch:
+    def __init__(self, max_batch_bytes: int = MAX_BATCH_BYTES):
+        """
+        Initializes a SubtaskBatch instance.
+
+        This class collects subtasks, their payloads and the results linking them, so
+        that a whole set of subtasks is created with one call to create the results
+        metadata, running alongside as few calls as possible to create the payloads, then
+        one call to submit the tasks.
+
+        Args:
+            max_batch_bytes: Maximum size of the payloads sent in a single call.
+        """
+        self.max_batch_bytes = max_batch_bytes
+        self._results: List[str] = []
+        self._payloads: Dict[str, bytes] = {}
+        self._tasks: List[_BatchTask] = []
+        self._ids: Optional[Dict[str, str]] = None
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def result(self) -> LocalResult:
+        """
+        Adds a result without data, to be produced by a task of the batch.
+
+        Returns:
+            LocalResult: Reference to the result.
+        """
+        reference = LocalResult(f"result_{len(self._results)}")
+        self._results.append(reference.name)
+        return reference
+
+    def task(
+        self,
+        payload: bytes,
+        outputs: List[ResultReference],
+        dependencies: Optional[List[ResultReference]] = None,
+    ) -> None:
+        """
+        Adds a task to the batch.
+
+        Args:
+            payload: Payload of the task, created with the batch.
+            outputs: Expected results of the task, results of the batch or ids of
+                existing results.
+            dependencies: Data dependencies of the task, results of the batch or ids of
+                existing results.
+        """
+        if len(payload) == 0:
+            # Tasks of the batch share a single empty payload
+            reference = LocalResult("empty_payload")
+        else:
+            reference = LocalResult(f"payload_{len(self._payloads)}")
+        self._payloads[reference.name] = payload
+        self._tasks.append(_BatchTask(reference, outputs, list(dependencies or [])))
+
+    def create(self, task_handler: TaskHandler) -> None:
+        """
+        Creates the results and the payloads of the batch.
+
+        Args:
+            task_handler: The handler for the current task.
+        """
+        metadata = _executor.submit(
+            task_handler.create_results_metadata,
+            self._results,
+            batch_size=max(1, len(self._results)),
+        )
+        ids = {}
+        # Group the payloads in calls of bounded size
+        group: Dict[str, bytes] = {}
+        group_bytes = 0
+        for name, payload in self._payloads.items():
+            if group and group_bytes + len(payload) > self.max_batch_bytes:
+                ids.update(self._create_payloads(task_handler, group))
+                group, group_bytes = {}, 0
+            group[name] = payload
+            group_bytes += len(payload)
+        if group:
+            ids.update(self._create_payloads(task_handler, group))
+        ids.update(
+            {name: result.result_id for name, result in metadata.result().items()}
+        )
+        self._ids = ids
+
+    def submit(
+        self, task_handler: TaskHandler, options: Optional[TaskOptions] = None
+    ) -> None:
+        """
+        Submits the tasks of the batch, once created.
+
+        Args:
+            task_handler: The handler for the current task.
+            options: Task options of the tasks, the default ones if None.
+        """
+        if self._ids is None:
+            raise RuntimeError("The batch must be created before being submitted")
+        definitions = [
+            TaskDefinition(
+                self._resolve(task.payload),
+                [self._resolve(output) for output in task.outputs],
+                data_dependencies=[
+                    self._resolve(dependency) for dependency in task.dependencies
+                ],
+                options=options,
+            )
+            for task in self._tasks
+        ]
+        task_handler.submit_tasks(definitions, batch_size=max(1, len(definitions)))
+
+    def _resolve(self, reference: ResultReference) -> str:
+        if isinstance(reference, LocalResult):
+            return self._ids[reference.name]
+        return reference
+
+    @staticmethod
+    def _create_payloads(
+        task_handler: TaskHandler, payloads: Dict[str, bytes]
+    ) -> Dict[str, str]:
+        results = task_handler.create_results(payloads, batch_size=len(payloads))
+        return {name: result.result_id for name, result in results.items()}
+
+
+def add_split(
+    batch: SubtaskBatch,
+    number_of_values: int,
+    outputs: List[ResultReference],
+    fanout: int,
+    levels: int,
+    should_split: Callable[[int], bool],
+    subtask_payload: Callable[[int, int], bytes],
+    dependencies: List[str],
+    offset: int = 0,
+) -> None:
+    """
+    Adds to a batch the subtasks splitting a range of values and their aggregation task.
+
+    Subtasks which should be split again are expanded in the same batch, up to the given
+    number of levels: only their aggregation task is created, which saves the round-trip
+    of a task splitting its values.
+
+    Args:
+        batch: The batch to add the tasks to.
+        number_of_values: Number of values of the range.
+        outputs: Results delegated to the aggregation task.
+        fanout: Number of subtasks of a split.
+        levels: Number of split levels expanded in the batch.
+        should_split: Decides whether a number of values should be split.
+        subtask_payload: Creates the payload of the subtask reducing the values between
+            a start (inclusive) and an end (exclusive) index.
+        dependencies: Data dependencies of the subtasks reducing values.
+        offset: Index of the first value of the range.
+    """
+    children = []
+    for start, end in split_bounds(number_of_values, fanout):
+        child = batch.result()
+        children.append(child)
+        if levels > 1 and should_split(end - start):
+            add_split(
+                batch,
+                end - start,
+                [child],
+                fanout,
+                levels - 1,
+                should_split,
+                subtask_payload,
+                dependencies,
+                offset + start,
+            )
+        else:
+            batch.task(
+                subtask_payload(offset + start, offset + end), [child], dependencies
+            )
+    # The task depends on the subtasks
+    batch.task(b"", outputs, children)
@@ -0,0 +1,255 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from armonik.common import TaskDefinition, TaskOptions
+
+from reduction import DTYPES, OPERATIONS, ReductionEngine
+from splitting import RangeDescriptor
+
+# Add the local agent directory to the system path
+local_agent_path = Path(__file__).resolve().parent.parent / "local-agent"
+sys.path.append(str(local_agent_path))
+
+from local_agent import LocalAgent, load_processor
+
+WORKER_PATH = str(Path(__file__).resolve().parent / "worker.py")
+
+
+def parse_arguments():
+    """
+    Parse command line arguments
+    Returns:
+    Parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the subtasking sample against a local agent",
+        epilog="Every combination of the swept parameters is run in a fresh process\n"
+        " Example : \n python benchmark.py --sizes 100000 1000000 --splits 1000 10000 -o results.json",
+    )
+    parser.add_argument(
+        "--sizes", help="Values of N", type=int, nargs="+", default=[100_000, 1_000_000]
+    )
+    parser.add_argument(
+        "--splits",
+        help="Split thresholds, 0 uses the cost model",
+        type=int,
+        nargs="+",
+        default=[1_000, 10_000],
+    )
+    parser.add_argument(
+        "--dtypes",
+        help="Types of the values",
+        choices=list(DTYPES),
+        nargs="+",
+        default=["int32"],
+    )
+    parser.add_argument(
+        "--fanouts", help="Split fan-outs", type=int, nargs="+", default=[2]
+    )
+    parser.add_argument(
+        "--levels",
+        help="Split levels created at once by a splitting task",
+        type=int,
+        nargs="+",
+        default=[1],
+    )
+    parser.add_argument(
+        "--modes",
+        help="Split modes",
+        choices=["copy", "range"],
+        nargs="+",
+        default=["copy"],
+    )
+    parser.add_argument(
+        "--operation", help="Reduction", choices=OPERATIONS, default="sum"
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        help="Number of concurrent tasks, 0 runs the tasks one after the other",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "--repeat", help="Number of runs of each combination", type=int, default=1
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Output file, CSV if its extension is .csv, JSON otherwise",
+        type=str,
+    )
+    parser.add_argument(
+        "--label", help="Label of the run, for instance the version", type=str
+    )
+    return parser.parse_args()
+
+
+def run_point(config: Dict) -> Dict:
+    """
+    Runs the subtasking tree of one combination of parameters against a local agent
+    Args:
+        config: Parameters of the run
+
+    Returns:
+        Measures of the run
+    """
+    import logging
+
+    # Per task logs would dominate the execution time
+    logging.disable(logging.INFO)
+    processor = load_processor(WORKER_PATH)
+    n = config["N"]
+    engine = ReductionEngine(
+        config["dtype"], config["operation"], low=1, high=max(n, 2)
+    )
+    options = {
+        "fanout": str(config["fanout"]),
+        "levels": str(config["levels"]),
+        "mode": config["mode"],
+        **engine.to_options(),
+    }
+    if config["split"] > 0:
+        options["split"] = str(config["split"])
+    agent = LocalAgent(
+        TaskOptions(
+            max_duration=timedelta(hours=1),
+            priority=1,
+            max_retries=2,
+            options=options,
+        )
+    )
+
+    # Count the aggregation tasks, which have an empty payload
+    aggregations = itertools.count()
+    lock = threading.Lock()
+
+    def counting_processor(task_handler):
+        if len(task_handler.payload) == 0:
+            with lock:
+                next(aggregations)
+        return processor(task_handler)
+
+    values = np.arange(1, n + 1, dtype=engine.dtype).tobytes()
+    result_id = agent.create_results_metadata(["result"])["result"].result_id
+    if config["mode"] == "range":
+        values_id = agent.create_results({"values": values})["values"].result_id
+        payload = RangeDescriptor(values_id, 0, n).serialize()
+        data_dependencies = [values_id]
+    else:
+        payload = values
+        data_dependencies = []
+    payload_id = agent.create_results({"payload": payload})["payload"].result_id
+    del values, payload
+    agent.submit_tasks([TaskDefinition(payload_id, [result_id], data_dependencies)])
+
+    start = time.perf_counter()
+    stats = agent.run(counting_processor, config["workers"])
+    wall_time = time.perf_counter() - start
+
+    return {
+        **config,
+        "wall_time": wall_time,
+        "tasks": stats.tasks_completed,
+        "aggregation_tasks": next(aggregations),
+        "results": stats.results_created,
+        "bytes_uploaded": stats.bytes_uploaded,
+        "bytes_created": stats.bytes_created,
+        "bytes_sent": stats.bytes_sent,
+        # Kilobytes on Linux
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "result": str(engine.finalize(agent.download_result_data(result_id))),
+    }
+
+
+def write_output(path: str, metadata: Dict, points: List[Dict]) -> None:
+    """
+    Writes the measures to a file
+    Args:
+        path: Output file, CSV if its extension is .csv, JSON otherwise
+        metadata: Description of the environment of the run
+        points: Measures of each run
+    """
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=[*metadata, *points[0]])
+            writer.writeheader()
+            for point in points:
+                writer.writerow({**metadata, **point})
+    else:
+        with open(path, "w") as file:
+            json.dump({"metadata": metadata, "points": points}, file, indent=2)
+
+
+def main():
+    args = parse_arguments()
+    metadata = {
+        "label": args.label,
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": multiprocessing.cpu_count(),
+    }
+    configs = [
+        {
+            "N": n,
+            "split": split,
+            "dtype": dtype,
+            "fanout": fanout,
+            "levels": levels,
+            "mode": mode,
+            "operation": args.operation,
+            "workers": args.workers,
+            "run": run,
+        }
+        for n, split, dtype, fanout, levels, mode, run in itertools.product(
+            args.sizes,
+            args.splits,
+            args.dtypes,
+            args.fanouts,
+            args.levels,
+            args.modes,
+            range(args.repeat),
+        )
+    ]
+
+    points = []
+    columns = ["N", "split", "dtype", "fanout", "levels", "mode", "wall_time", "tasks"]
+    columns += ["aggregation_tasks", "bytes_created", "peak_rss_kb"]
+    print(" ".join(f"{column:>17}" for column in columns))
+    # A fresh process per run, so that the peak RSS is the one of the run
+    with multiprocessing.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+        for config in configs:
+            point = pool.apply(run_point, (config,))
+            points.append(point)
+            print(
+                " ".join(
+                    (
+                        f"{point[column]:>17.4f}"
+                        if isinstance(point[column], float)
+                        else f"{point[column]:>17}"
+                    )
+                    for column in columns
+                )
+            )
+
+    if args.output is not None:
+        write_output(args.output, metadata, points)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
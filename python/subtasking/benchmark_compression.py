@@ -0,0 +1,112 @@
+import argparse
+import json
+import timeit
+import uuid
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+from compression import CODECS, choose_codec, compress, decompress
+
+
+def parse_arguments():
+    """
+    Parse command line arguments
+    Returns:
+    Parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the compression of the payloads",
+        epilog="This benchmark compares the throughput and the compression ratio of each codec on typical payloads\n Example : \n python benchmark_compression.py --size 1000000",
+    )
+    parser.add_argument(
+        "--size",
+        help="Number of values of the numeric datasets",
+        type=int,
+        default=1_000_000,
+    )
+    parser.add_argument(
+        "--repeat",
+        help="Number of timed runs, the best one is kept",
+        type=int,
+        default=3,
+    )
+    return parser.parse_args()
+
+
+def datasets(size: int) -> Dict[str, Tuple[bytes, int]]:
+    """
+    Generates the payloads of the benchmark
+    Args:
+        size: Number of values of the numeric datasets
+
+    Returns:
+        The data and the item size of each dataset, by name
+    """
+    rng = np.random.default_rng(47)
+    smooth = np.sin(np.linspace(0, 100, size)) * 1000
+    return {
+        # Subtasking payloads
+        "int32 range": (np.arange(1, size + 1, dtype=np.int32).tobytes(), 4),
+        "int32 small": (rng.integers(0, 1000, size, dtype=np.int32).tobytes(), 4),
+        # GPU vectors
+        "float32 random": (rng.random(size, dtype=np.float32).tobytes(), 4),
+        "float32 smooth": (smooth.astype(np.float32).tobytes(), 4),
+        "float64 smooth": (smooth.tobytes(), 8),
+        # JSON payloads of the hello-world samples
+        "json ids": (
+            json.dumps(
+                {
+                    f"output_{i}": str(uuid.UUID(int=rng.integers(1 << 62)))
+                    for i in range(size // 50)
+                }
+            ).encode("utf-8"),
+            1,
+        ),
+    }
+
+
+def best_time(function: Callable[[], object], repeat: int) -> float:
+    """
+    Times a function
+    Args:
+        function: Function without argument to time
+        repeat: Number of timed runs
+
+    Returns:
+        Best run time in seconds
+    """
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def main():
+    args = parse_arguments()
+    print(
+        f"{'dataset':>15} {'codec':>6} {'shuffle':>8} {'ratio':>7} "
+        f"{'compress MB/s':>14} {'decompress MB/s':>16}"
+    )
+    for name, (data, itemsize) in datasets(args.size).items():
+        chosen = choose_codec(data, itemsize)
+        # Numeric datasets are also compressed without shuffling their bytes
+        for shuffle_size in sorted({itemsize, 1}, reverse=True):
+            for codec in CODECS:
+                frame = compress(data, shuffle_size, codec)
+                assert decompress(frame) == data
+                compress_time = best_time(
+                    lambda: compress(data, shuffle_size, codec), args.repeat
+                )
+                decompress_time = best_time(lambda: decompress(frame), args.repeat)
+                # The frames written by auto shuffle the bytes of numeric values
+                auto = codec == chosen and shuffle_size == itemsize
+                label = f"{codec}*" if auto else codec
+                print(
+                    f"{name:>15} {label:>6} {'yes' if shuffle_size > 1 else 'no':>8} "
+                    f"{len(data) / len(frame):>7.2f} "
+                    f"{len(data) / compress_time / 1e6:>14.1f} "
+                    f"{len(data) / decompress_time / 1e6:>16.1f}"
+                )
+    print("* codec chosen by auto")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import timeit
+
+import numpy as np
+
+from reduction import DTYPES, OPERATIONS, ReductionEngine
+
+
+def parse_arguments():
+    """
+    Parse command line arguments
+    Returns:
+    Parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the leaf reduction of the subtasking worker",
+        epilog="This benchmark compares the reduction engine against the per-int loop\n Example : \n python benchmark_reduction.py --sizes 1000 1000000",
+    )
+    parser.add_argument(
+        "--sizes",
+        help="Numbers of values of the leaf payloads",
+        type=int,
+        nargs="+",
+        default=[1_000, 100_000, 1_000_000],
+    )
+    parser.add_argument(
+        "--repeat",
+        help="Number of timed runs, the best one is kept",
+        type=int,
+        default=5,
+    )
+    parser.add_argument(
+        "--skip-loop",
+        help="Do not time the per-int loop, which is very slow on large sizes",
+        action="store_true",
+    )
+    return parser.parse_args()
+
+
+def loop_sum(payload: bytes) -> bytes:
+    """
+    Reference leaf computation: decode every 4 bytes with int.from_bytes and sum in Python
+    Args:
+        payload: Little-endian int32 values
+
+    Returns:
+        Sum as 8 bytes little-endian integer
+    """
+    values = [
+        int.from_bytes(payload[i : i + 4], "little") for i in range(0, len(payload), 4)
+    ]
+    return sum(values).to_bytes(8, "little")
+
+
+def best_time(function, repeat: int) -> float:
+    """
+    Times a function
+    Args:
+        function: Function without argument to time
+        repeat: Number of timed runs
+
+    Returns:
+        Best run time in seconds
+    """
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def main():
+    args = parse_arguments()
+    print(
+        f"{'N':>12} {'dtype':>8} {'operation':>10} {'time (s)':>12} {'Mvalues/s':>10}"
+    )
+    for n in args.sizes:
+        if not args.skip_loop:
+            payload = np.arange(1, n + 1, dtype=DTYPES["int32"]).tobytes()
+            elapsed = best_time(lambda: loop_sum(payload), args.repeat)
+            print(
+                f"{n:>12} {'int32':>8} {'loop sum':>10} {elapsed:>12.6f} {n / elapsed / 1e6:>10.1f}"
+            )
+        for dtype in DTYPES:
+            payload = np.arange(1, n + 1, dtype=DTYPES[dtype]).tobytes()
+            for operation in OPERATIONS:
+                engine = ReductionEngine(dtype, operation, low=1, high=max(n, 2))
+                elapsed = best_time(lambda: engine.reduce(payload), args.repeat)
+                print(
+                    f"{n:>12} {dtype:>8} {operation:>10} {elapsed:>12.6f} {n / elapsed / 1e6:>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
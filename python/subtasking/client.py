@@ -1,14 +1,57 @@
 import argparse
+import itertools
+import json
+import os
+import sys
+from dataclasses import dataclass, replace
 from datetime import timedelta
 
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
 import grpc
+import numpy as np
 from armonik.client import ArmoniKTasks, ArmoniKResults, ArmoniKSessions, ArmoniKEvents
 from armonik.common import TaskOptions, TaskDefinition
+from armonik.protogen.client.results_service_pb2_grpc import ResultsStub
+from armonik.protogen.common.results_common_pb2 import UploadResultDataRequest
+
+from compression import CODECS, compress_chunks
+from cost_model import CostModel
+from reduction import DTYPES, OPERATIONS, ReductionEngine
+from result_cache import (
+    DEFAULT_MAX_BYTES,
+    ResultCache,
+    image_sources,
+    source_version,
+)
+from splitting import RangeDescriptor, tree_stats
+from upload_index import UploadIndex, content_digest
+
+# Add the session daemon directory to the system path
+session_daemon_path = Path(__file__).resolve().parent.parent / "session-daemon"
+sys.path.append(str(session_daemon_path))
 
+from session_daemon import (
+    SessionDaemon,
+    absolute_path_arguments,
+    send_request,
+    strip_daemon_arguments,
+    submit_job,
+)
 
-def parse_arguments():
+# Dockerfile of the worker, whose Python files give its version when it is not set
+WORKER_DOCKERFILE = "Dockerfile"
+# Number of values per chunk when the client reads the values itself
+READ_CHUNK_VALUES = 1 << 20
+
+
+def parse_arguments(args: Optional[List[str]] = None):
     """
     Parse command line arguments
+    Args:
+        args: Arguments to parse, the command line arguments if None
+
     Returns:
     Parsed arguments
     """
@@ -23,10 +66,8 @@ def parse_arguments():
     connection_args.add_argument(
         "-e",
         "--endpoint",
-        default="localhost:5001",
-        help="ArmoniK control plane endpoint",
+        help="ArmoniK control plane endpoint, required unless the job is sent with --daemon",
         type=str,
-        required=True,
     )
     connection_args.add_argument(
         "--ssl",
@@ -56,13 +97,135 @@ def parse_arguments():
     payload_args.add_argument(
         "-s",
         "--split",
-        help="Threshold of number of values where the task will be split",
+        help="Threshold of number of values where the task will be split, "
+        "overrides the measured cost model",
+        type=int,
+    )
+    payload_args.add_argument(
+        "-k",
+        "--fanout",
+        help="Number of subtasks created when a task is split",
+        type=int,
+        default=2,
+    )
+    payload_args.add_argument(
+        "--levels",
+        help="Number of split levels decided and created at once by a splitting task",
+        type=int,
+        default=1,
+    )
+    payload_args.add_argument(
+        "-m",
+        "--mode",
+        help="copy: every split uploads the values of its subtasks, "
+        "range: the values are uploaded once and subtasks receive a range descriptor",
+        choices=["copy", "range"],
+        default="copy",
+    )
+    payload_args.add_argument(
+        "--dtype",
+        help="Type of the values",
+        choices=list(DTYPES),
+        default="int32",
+    )
+    payload_args.add_argument(
+        "--operation",
+        help="Reduction applied to the values",
+        choices=OPERATIONS,
+        default="sum",
+    )
+    payload_args.add_argument(
+        "--bins",
+        help="Number of bins of the histogram operation, spanning the range [1, N]",
         type=int,
         default=10,
     )
-    payload_args.add_argument("N", help="Number of values to sum", type=int)
+    payload_args.add_argument(
+        "--cost-model",
+        help="JSON file of the cost model, read to start from the costs measured by a "
+        "previous run and written with the costs measured by this run",
+        type=str,
+    )
+    payload_args.add_argument(
+        "--task-latency",
+        help="Time in seconds between the submission of a task and its start, "
+        "used by the cost model",
+        type=float,
+    )
+    payload_args.add_argument(
+        "--compression",
+        help="Compress the uploaded values with this codec, or choose it from a sample "
+        "of the values with auto; subtasks of the copy mode are compressed the same way",
+        choices=["auto", *CODECS],
+    )
+    payload_args.add_argument(
+        "-i",
+        "--input",
+        help="Binary file of little-endian values of type --dtype to reduce instead of "
+        "the N first integers, read through a memory map",
+        type=str,
+    )
+    payload_args.add_argument(
+        "N", help="Number of values to sum", type=int, nargs="?", default=None
+    )
+
+    cache_args = parser.add_argument_group(
+        title="Cache", description="Result cache arguments"
+    )
+    cache_args.add_argument(
+        "--cache",
+        help="Directory of the result cache: a job whose result is stored is not run, "
+        "and the result of a job which is run is stored",
+        type=str,
+    )
+    cache_args.add_argument(
+        "--cache-size",
+        help="Maximum size in bytes of the results stored in the cache, the least "
+        "recently used ones are removed",
+        type=int,
+        default=DEFAULT_MAX_BYTES,
+    )
+    cache_args.add_argument(
+        "--worker-version",
+        help="Version of the worker in the keys of the cache, by default a digest of "
+        "the worker files copied by the Dockerfile next to the client",
+        type=str,
+    )
+
+    daemon_args = parser.add_argument_group(
+        title="Daemon", description="Resident client arguments"
+    )
+    daemon_args.add_argument(
+        "--serve",
+        help="Keep the channel and the session open and run the jobs sent to this Unix socket",
+        type=str,
+    )
+    daemon_args.add_argument(
+        "--idle-timeout",
+        help="Time in seconds without jobs after which the resident client closes the session",
+        type=float,
+        default=300,
+    )
+    daemon_args.add_argument(
+        "--daemon",
+        help="Send the job to the resident client listening on this Unix socket",
+        type=str,
+    )
+    daemon_args.add_argument(
+        "--stop",
+        help="With --daemon, stop the resident client",
+        action="store_true",
+    )
 
-    return parser.parse_args()
+    command_line = args is None
+    args = parser.parse_args(args)
+    # The jobs sent to a resident client use its channel
+    if command_line and args.daemon is None and args.endpoint is None:
+        parser.error("--endpoint is required unless the job is sent with --daemon")
+    if args.serve is None and not args.stop:
+        if (args.N is None) == (args.input is None):
+            parser.error("exactly one of N and --input must be given")
+    return args
 
 
 def read_file(file_path: str) -> bytes:
@@ -78,6 +241,80 @@ def read_file(file_path: str) -> bytes:
         return file.read()
 
 
+def value_chunks(
+    values: Optional[np.ndarray], n: int, dtype: np.dtype, chunk_values: int
+) -> Iterator[bytes]:
+    """
+    Produces the values to reduce in bounded chunks, so that they are never fully in memory
+    Args:
+        values: Memory mapped values, or None to generate the N first integers
+        n: Number of values
+        dtype: Type of the values
+        chunk_values: Maximum number of values of a chunk
+
+    Returns:
+        Iterator over the bytes of the chunks
+    """
+    for start in range(0, n, chunk_values):
+        end = min(start + chunk_values, n)
+        if values is None:
+            yield np.arange(start + 1, end + 1, dtype=dtype).tobytes()
+        else:
+            yield values[start:end].tobytes()
+
+
+def rechunk(chunks: Iterable[bytes], chunk_size: int) -> Iterator[bytes]:
+    """
+    Splits or merges chunks so that they are of a given size
+    Args:
+        chunks: Data in chunks of any size
+        chunk_size: Size of the produced chunks, except the last one
+
+    Returns:
+        Iterator over the chunks
+    """
+    pending = b""
+    for chunk in chunks:
+        data = pending + chunk
+        end = len(data) // chunk_size * chunk_size
+        for start in range(0, end, chunk_size):
+            yield data[start : start + chunk_size]
+        pending = data[end:]
+    if pending:
+        yield pending
+
+
+def upload_stream(
+    channel: grpc.Channel, result_id: str, session_id: str, chunks: Iterable[bytes]
+) -> int:
+    """
+    Uploads the data of a result chunk by chunk
+    Args:
+        channel: gRPC channel to the control plane
+        result_id: Id of the result
+        session_id: Id of the session
+        chunks: Data of the result, each chunk must fit in an upload message
+
+    Returns:
+        Number of uploaded bytes
+    """
+    uploaded = 0
+
+    def requests():
+        yield UploadResultDataRequest(
+            id=UploadResultDataRequest.ResultIdentifier(
+                session_id=session_id, result_id=result_id
+            )
+        )
+        nonlocal uploaded
+        for chunk in chunks:
+            uploaded += len(chunk)
+            yield UploadResultDataRequest(data_chunk=chunk)
+
+    ResultsStub(channel).UploadResultData(requests())
+    return uploaded
+
+
 def create_channel(
     endpoint: str, ssl: bool, ca: str, key: str, cert: str
 ) -> grpc.Channel:
@@ -114,76 +351,457 @@ def create_channel(
         return grpc.insecure_channel(endpoint)
 
 
-def main():
-    args = parse_arguments()
-    # Open a channel to the control plane
-    with create_channel(
-        args.endpoint, args.ssl, args.ca, args.key, args.crt
-    ) as channel:
-        # Create a task submitting client
-        tasks_client = ArmoniKTasks(channel)
-        # Create the results client
-        results_client = ArmoniKResults(channel)
-        # Create the session client
-        session_client = ArmoniKSessions(channel)
-        # Default task options to be used in a session
-        default_task_options = TaskOptions(
-            max_duration=timedelta(seconds=300),
-            priority=1,
-            max_retries=5,
-            partition_id=args.partition,
-            options={"split": str(args.split)},
-        )
-        # Create a session
-        session_id = session_client.create_session(
-            default_task_options=default_task_options,
-            partition_ids=[args.partition] if args.partition is not None else None,
+def expected_value(engine: ReductionEngine, n: int):
+    """
+    Computes the expected reduction of the N first integers
+    Args:
+        engine: Reduction applied to the values
+        n: Number of values
+
+    Returns:
+        Expected value of the reduction
+    """
+    if engine.operation == "sum":
+        return n * (n + 1) // 2
+    if engine.operation == "min":
+        return 1
+    if engine.operation == "max":
+        return n
+    if engine.operation == "count":
+        return n
+    if engine.operation == "mean":
+        return (n + 1) / 2
+    return np.histogram(
+        np.arange(1, n + 1), bins=engine.bins, range=(engine.low, engine.high)
+    )[0]
+
+
+@dataclass
+class JobValues:
+    """
+    Values reduced by a job and their reduction, loaded once per job
+    Attributes:
+        values: Memory mapped values of the input file, or None for the N first integers
+        number_of_values: Number of values
+        engine: Reduction applied to the values
+        expected_state: Reduction of the values by the client, computed the first time
+            they are all read, for instance to hash or upload them
+    """
+
+    values: Optional[np.ndarray]
+    number_of_values: int
+    engine: ReductionEngine
+    expected_state: Optional[bytes] = None
+
+    def chunks(self, chunk_values: int) -> Iterator[bytes]:
+        """
+        Produces the values in bounded chunks, reducing them the first time they are read
+        Args:
+            chunk_values: Maximum number of values of a chunk
+
+        Returns:
+            Iterator over the bytes of the chunks
+        """
+        chunks = value_chunks(
+            self.values, self.number_of_values, self.engine.dtype, chunk_values
         )
-        print(f"Session {session_id} has been created")
+        if self.values is None or self.expected_state is not None:
+            yield from chunks
+            return
+        states = []
+        for chunk in chunks:
+            states.append(self.engine.reduce(chunk))
+            yield chunk
+        self.expected_state = self.engine.combine(states)
+
+    def expected(self):
+        """
+        Computes the expected reduction of the values, reading them only if they were
+        not read yet
+        Returns:
+            Expected value of the reduction
+        """
+        if self.values is None:
+            return expected_value(self.engine, self.number_of_values)
+        if self.expected_state is None:
+            for _ in self.chunks(READ_CHUNK_VALUES):
+                pass
+        return self.engine.finalize(self.expected_state)
+
+
+def load_values(args: argparse.Namespace) -> JobValues:
+    """
+    Gets the values to reduce and the reduction of a job
+    Args:
+        args: Parsed arguments of the job
+
+    Returns:
+        Memory mapped values of the input file or the N first integers, and the
+        reduction applied to them
+    """
+    low, high = None, None
+    if args.input is not None:
+        # Values are read from the file lazily, chunk by chunk
+        values = np.memmap(args.input, dtype=DTYPES[args.dtype], mode="r")
+        number_of_values = values.size
+        if args.operation == "histogram":
+            # Only the histogram needs the range of the values
+            low, high = float(values.min()), float(values.max())
+            high = high if high > low else low + 1
+    else:
+        values = None
+        number_of_values = args.N
+        if args.operation == "histogram":
+            # A single value still needs a non-empty histogram range
+            low, high = 1, max(args.N, 2)
+    engine = ReductionEngine(
+        dtype=args.dtype,
+        operation=args.operation,
+        bins=args.bins,
+        low=low,
+        high=high,
+    )
+    return JobValues(values, number_of_values, engine)
+
+
+def print_result(job_values: JobValues, result_data: bytes) -> None:
+    """
+    Prints the value of the reduction along with the expected value
+    Args:
+        job_values: Values reduced by the job
+        result_data: Final reduction state computed by the tasks
+    """
+    # Convert it to the value of the reduction
+    result = job_values.engine.finalize(result_data)
+
+    # Verify
+    print(f"Result: {result}, Expected: {job_values.expected()}")
+
+
+def job_key(args: argparse.Namespace, job_values: JobValues) -> str:
+    """
+    Computes the key of a job in the result cache
+    Args:
+        args: Parsed arguments of the job
+        job_values: Values reduced by the job
+
+    Returns:
+        Digest of the worker version, the values and the options changing the result
+    """
+    directory = Path(__file__).resolve().parent
+    worker_version = args.worker_version or source_version(
+        directory / source for source in image_sources(directory / WORKER_DOCKERFILE)
+    )
+    if job_values.values is None:
+        # The N first integers are given by N and the type
+        values_part = str(job_values.number_of_values)
+    else:
+        values_part = content_digest(job_values.chunks(READ_CHUNK_VALUES))
+    # The shape of the tree changes the rounding of floating point reductions; the
+    # measured costs are left out, as they change with every run
+    options = {
+        **job_values.engine.to_options(),
+        "fanout": args.fanout,
+        "levels": args.levels,
+        "split": args.split,
+    }
+    return ResultCache.key(
+        "subtasking", worker_version, values_part, json.dumps(options, sort_keys=True)
+    )
+
+
+def cached_result(
+    cache: ResultCache, args: argparse.Namespace, job_values: JobValues
+) -> Tuple[str, bool]:
+    """
+    Prints the result of a job if it is stored in the cache
+    Args:
+        cache: Result cache
+        args: Parsed arguments of the job
+        job_values: Values reduced by the job
+
+    Returns:
+        Key of the job, and whether its result was found
+    """
+    key = job_key(args, job_values)
+    result_data = cache.get(key)
+    if result_data is not None:
+        print("Result found in the cache")
+        print_result(job_values, result_data)
+        print(f"Result cache: {cache.summary()}")
+    return key, result_data is not None
 
-        # Create payload and result
-        results_created = results_client.create_results_metadata(
-            ["payload", "result"], session_id
+
+def create_session(channel: grpc.Channel, partition: Optional[str]) -> str:
+    """
+    Creates a session
+    Args:
+        channel: gRPC channel to the control plane
+        partition: Partition of the tasks of the session
+
+    Returns:
+        Id of the session
+    """
+    session_client = ArmoniKSessions(channel)
+    # Default task options to be used in a session
+    default_task_options = TaskOptions(
+        max_duration=timedelta(seconds=300),
+        priority=1,
+        max_retries=5,
+        partition_id=partition,
+    )
+    # Create a session
+    session_id = session_client.create_session(
+        default_task_options=default_task_options,
+        partition_ids=[partition] if partition is not None else None,
+    )
+    print(f"Session {session_id} has been created")
+    return session_id
+
+
+def delete_session(channel: grpc.Channel, session_id: str) -> None:
+    """
+    Closes, purges and deletes a session
+    Args:
+        channel: gRPC channel to the control plane
+        session_id: Id of the session
+    """
+    session_client = ArmoniKSessions(channel)
+    # Done close the session
+    session_client.close_session(session_id)
+
+    # Cleanup
+    session_client.purge_session(session_id)
+    session_client.delete_session(session_id)
+
+
+def run(
+    channel: grpc.Channel,
+    session_id: str,
+    partition: Optional[str],
+    args: argparse.Namespace,
+    job_values: JobValues,
+    index: Optional[UploadIndex] = None,
+    cache: Optional[ResultCache] = None,
+    cache_key: Optional[str] = None,
+) -> None:
+    """
+    Reduces values with a tree of tasks in an existing session
+    Args:
+        channel: gRPC channel to the control plane
+        session_id: Id of the session
+        partition: Partition of the tasks
+        args: Parsed arguments of the job
+        job_values: Values reduced by the job
+        index: Values uploaded in the session, the values of the job are not uploaded
+            again if they were uploaded by a previous job
+        cache: Result cache in which the result is stored
+        cache_key: Key of the job in the cache
+    """
+    number_of_values = job_values.number_of_values
+    engine = job_values.engine
+    model = CostModel()
+    if args.cost_model is not None and os.path.exists(args.cost_model):
+        model = CostModel.deserialize(read_file(args.cost_model))
+    if args.task_latency is not None:
+        model = replace(model, task_latency=args.task_latency)
+    options = {
+        "fanout": str(args.fanout),
+        "levels": str(args.levels),
+        "mode": args.mode,
+        **engine.to_options(),
+    }
+    if args.compression is not None:
+        options["compression"] = args.compression
+    if args.split is not None:
+        options["split"] = str(args.split)
+        split = args.split
+    else:
+        options.update(model.to_options())
+        split = model.split_threshold(args.fanout)
+    # Create a task submitting client
+    tasks_client = ArmoniKTasks(channel)
+    # Create the results client
+    results_client = ArmoniKResults(channel)
+    # Options of the tree, inherited by the subtasks
+    task_options = TaskOptions(
+        max_duration=timedelta(seconds=300),
+        priority=1,
+        max_retries=5,
+        partition_id=partition,
+        options=options,
+    )
+    stats = tree_stats(number_of_values, split, args.fanout, args.levels)
+    print(
+        f"Task tree (split threshold {split}): {stats.tasks} tasks ({stats.leaves} leaves, "
+        f"{stats.aggregations} aggregations), depth {stats.depth}, "
+        f"critical path of {stats.critical_path} tasks"
+    )
+
+    # Create payload and result
+    results_created = results_client.create_results_metadata(
+        ["result"]
+        + (["payload"] if args.mode == "range" else [])
+        + (["cost_model"] if args.cost_model is not None else []),
+        session_id,
+    )
+    result_id = results_created["result"].result_id
+
+    # Stream the values in chunks fitting in an upload message
+    chunk_size = results_client.get_service_config()
+    chunk_values = max(1, chunk_size // engine.dtype.itemsize)
+    values_bytes = number_of_values * engine.dtype.itemsize
+
+    def upload_values() -> str:
+        chunks = job_values.chunks(chunk_values)
+        if args.compression is not None:
+            # Compressed block by block while streaming, the frame is cut to the message size
+            chunks = rechunk(
+                compress_chunks(
+                    chunks, values_bytes, engine.dtype.itemsize, args.compression
+                ),
+                chunk_size,
+            )
+        values_id = results_client.create_results_metadata(["values"], session_id)[
+            "values"
+        ].result_id
+        uploaded = upload_stream(channel, values_id, session_id, chunks)
+        if args.compression is not None:
+            print(
+                f"Uploaded {uploaded} bytes for {values_bytes} bytes of values "
+                f"(ratio {values_bytes / max(uploaded, 1):.2f})"
+            )
+        return values_id
+
+    if index is None:
+        values_id = upload_values()
+    else:
+        # The values are hashed with their codec, as the codec changes the uploaded bytes
+        digest = content_digest(
+            itertools.chain(
+                [str(args.compression).encode()],
+                job_values.chunks(chunk_values),
+            )
         )
+        values_id = index.upload(digest, values_bytes, upload_values)
+        print(f"Uploads: {index.summary()}")
+    if args.mode == "range":
+        # The values are uploaded once, the payload describes their whole range
         payload_id = results_created["payload"].result_id
-        result_id = results_created["result"].result_id
-
-        # Create payload data
-        payload = bytearray()
-        for i in range(1, args.N + 1):
-            payload.extend(i.to_bytes(4, "little"))
-        payload = bytes(payload)
-        # Send payload
+        payload = RangeDescriptor(values_id, 0, number_of_values).serialize()
         results_client.upload_result_data(payload_id, session_id, payload)
+        data_dependencies = [values_id]
+    else:
+        # The values are the payload
+        payload_id = values_id
+        data_dependencies = []
 
-        # Create task definition
-        task_definition = TaskDefinition(
-            payload_id=payload_id, expected_output_ids=[result_id]
-        )
+    # Create task definition, the second output receives the measured costs
+    expected_output_ids = [result_id]
+    if args.cost_model is not None:
+        expected_output_ids.append(results_created["cost_model"].result_id)
+    task_definition = TaskDefinition(
+        payload_id=payload_id,
+        expected_output_ids=expected_output_ids,
+        data_dependencies=data_dependencies,
+        options=task_options,
+    )
+
+    # Submit task
+    tasks_client.submit_tasks(session_id, [task_definition])
 
-        # Submit task
-        tasks_client.submit_tasks(session_id, [task_definition])
+    # Wait for result availability
+    event_client = ArmoniKEvents(channel)
+    event_client.wait_for_result_availability(result_id, session_id)
 
-        # Wait for result availability
-        event_client = ArmoniKEvents(channel)
-        event_client.wait_for_result_availability(result_id, session_id)
+    # Download the result
+    result_data = results_client.download_result_data(result_id, session_id)
+    print_result(job_values, result_data)
+    if cache is not None:
+        cache.put(cache_key, result_data)
+        print(f"Result cache: {cache.summary()}")
 
-        # Download the result
-        result_data = results_client.download_result_data(result_id, session_id)
+    if args.cost_model is not None:
+        # Save the measured costs for the next runs
+        cost_model_id = results_created["cost_model"].result_id
+        event_client.wait_for_result_availability(cost_model_id, session_id)
+        cost_model_data = results_client.download_result_data(cost_model_id, session_id)
+        with open(args.cost_model, "wb") as file:
+            file.write(cost_model_data)
+        print(f"Cost model: {CostModel.deserialize(cost_model_data)}")
 
-        # Convert it to int
-        result = int.from_bytes(result_data, "little")
 
-        # Verify
-        expected = args.N * (args.N + 1) // 2
-        print(f"Result: {result}, Expected: {expected}")
+def main():
+    args = parse_arguments()
+    if args.daemon is not None:
+        # Run the job on a resident client
+        if args.stop:
+            print(send_request(args.daemon, {"stop": True})["output"])
+            return
+        sys.exit(
+            submit_job(
+                args.daemon,
+                absolute_path_arguments(
+                    strip_daemon_arguments(sys.argv[1:], ["--daemon"]),
+                    ["--input", "--cost-model", "--cache"],
+                ),
+            )
+        )
+    cache = None
+    cache_key = None
+    # Values of the job, loaded once
+    job_values = load_values(args) if args.serve is None else None
+    if args.cache is not None:
+        cache = ResultCache(args.cache, args.cache_size)
+        if args.serve is None:
+            # A stored result needs neither a channel nor a session
+            cache_key, found = cached_result(cache, args, job_values)
+            if found:
+                return
+    # Open a channel to the control plane
+    with create_channel(
+        args.endpoint, args.ssl, args.ca, args.key, args.crt
+    ) as channel:
+        session_id = create_session(channel, args.partition)
+        try:
+            if args.serve is not None:
+                # Keep the channel and the session for the jobs sent to the socket
+                print(f"Serving jobs on {args.serve}")
+                # Jobs reducing the same values share their upload
+                index = UploadIndex()
 
-        # Done close the session
-        session_client.close_session(session_id)
+                def run_job(job_args: List[str]) -> None:
+                    job = parse_arguments(job_args)
+                    job_values = load_values(job)
+                    key = None
+                    if cache is not None:
+                        key, found = cached_result(cache, job, job_values)
+                        if found:
+                            return
+                    run(
+                        channel,
+                        session_id,
+                        args.partition,
+                        job,
+                        job_values,
+                        index,
+                        cache,
+                        key,
+                    )
 
-        # Cleanup
-        session_client.purge_session(session_id)
-        session_client.delete_session(session_id)
+                SessionDaemon(args.serve, run_job, args.idle_timeout).serve()
+            else:
+                run(
+                    channel,
+                    session_id,
+                    args.partition,
+                    args,
+                    job_values,
+                    cache=cache,
+                    cache_key=cache_key,
+                )
+        finally:
+            delete_session(channel, session_id)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,279 @@
+import lzma
+import struct
+import zlib
+from typing import Iterable, Iterator, List, Union
+
+# Layout: a frame header, then fixed-size blocks of the original data, each
+# compressed independently so that a range can be read without decompressing the rest
+FRAME_MAGIC = b"\x89AKZ"
+FRAME_VERSION = 1
+# Magic, version, shuffle item size, block size, original size
+_FRAME_HEADER = struct.Struct("<4sBBIQ")
+# Codec and compressed size of a block
+_BLOCK_HEADER = struct.Struct("<BI")
+CODECS = ("none", "zlib", "lzma")
+DEFAULT_BLOCK_SIZE = 1 << 20
+# Data smaller than this is never compressed
+MIN_COMPRESSED_SIZE = 4096
+# Bytes of the data compressed to choose the codec
+SAMPLE_SIZE = 64 * 1024
+# Compression ratio below which the data is stored uncompressed
+MIN_RATIO = 1.1
+# Ratio of lzma over zlib above which lzma is worth its lower throughput
+LZMA_GAIN = 1.25
+ZLIB_LEVEL = 1
+LZMA_PRESET = 1
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def shuffle(data: Buffer, itemsize: int) -> bytes:
+    """
+    Groups the bytes of the values by position, the first bytes of all the values, then
+    the second bytes, and so on, so that the slowly varying bytes of numeric values are
+    contiguous and compress better.
+
+    Args:
+        data: The values, trailing bytes not forming a whole value are kept in place.
+        itemsize: Size in bytes of a value.
+
+    Returns:
+        bytes: The shuffled data.
+    """
+    if itemsize <= 1:
+        return bytes(data)
+    data = bytes(data)
+    length = len(data) // itemsize * itemsize
+    return b"".join(
+        [data[i:length:itemsize] for i in range(itemsize)] + [data[length:]]
+    )
+
+
+def unshuffle(data: Buffer, itemsize: int) -> bytes:
+    """
+    Reverts shuffle.
+
+    Args:
+        data: The shuffled data.
+        itemsize: Size in bytes of a value.
+
+    Returns:
+        bytes: The original data.
+    """
+    if itemsize <= 1:
+        return bytes(data)
+    data = bytes(data)
+    count = len(data) // itemsize
+    values = bytearray(data)
+    for i in range(itemsize):
+        values[i : count * itemsize : itemsize] = data[i * count : (i + 1) * count]
+    return bytes(values)
+
+
+def _compress_block(data: bytes, codec: str) -> bytes:
+    if codec == "zlib":
+        return zlib.compress(data, ZLIB_LEVEL)
+    if codec == "lzma":
+        return lzma.compress(data, preset=LZMA_PRESET, check=lzma.CHECK_NONE)
+    return data
+
+
+def _decompress_block(data: Buffer, codec: int) -> Buffer:
+    if codec == 1:
+        return zlib.decompress(data)
+    if codec == 2:
+        return lzma.decompress(data)
+    return data
+
+
+def sample(data: Buffer, itemsize: int = 1, size: int = SAMPLE_SIZE) -> bytes:
+    """
+    Takes slices spread over the data, so that choosing the codec does not compress all
+    of it.
+
+    Args:
+        data: The data.
+        itemsize: Size in bytes of a value, the slices start at value boundaries.
+        size: Total size of the slices.
+
+    Returns:
+        bytes: The concatenated slices, or the data if it is small.
+    """
+    if len(data) <= size:
+        return bytes(data)
+    count = 4
+    length = size // count // itemsize * itemsize
+    step = (len(data) - length) // (count - 1) // itemsize * itemsize
+    return b"".join(bytes(data[i * step : i * step + length]) for i in range(count))
+
+
+def choose_codec(data: Buffer, itemsize: int = 1) -> str:
+    """
+    Chooses the codec of data from the compression ratio of a sample.
+
+    Args:
+        data: The data, or a sample of it.
+        itemsize: Size in bytes of a value, greater than 1 for numeric arrays.
+
+    Returns:
+        str: 'none' for small or incompressible data, 'lzma' if it compresses much
+            better than 'zlib', 'zlib' otherwise.
+    """
+    if len(data) < MIN_COMPRESSED_SIZE:
+        return "none"
+    shuffled = shuffle(sample(data, itemsize), itemsize)
+    zlib_ratio = len(shuffled) / len(_compress_block(shuffled, "zlib"))
+    if zlib_ratio < MIN_RATIO:
+        return "none"
+    lzma_ratio = len(shuffled) / len(_compress_block(shuffled, "lzma"))
+    return "lzma" if lzma_ratio > zlib_ratio * LZMA_GAIN else "zlib"
+
+
+def compress_chunks(
+    chunks: Iterable[Buffer],
+    size: int,
+    itemsize: int = 1,
+    codec: str = "auto",
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> Iterator[bytes]:
+    """
+    Compresses data given chunk by chunk into a frame, without holding all of it.
+
+    Args:
+        chunks: The data, in chunks of any size.
+        size: Total size of the data.
+        itemsize: Size in bytes of a value, the bytes of numeric values are shuffled.
+        codec: One of CODECS, or 'auto' to choose it from the first block.
+        block_size: Size of the blocks of original data, rounded to whole values.
+
+    Returns:
+        Iterator[bytes]: The frame header, then the header and data of each block.
+    """
+    if codec != "auto" and codec not in CODECS:
+        raise ValueError(
+            f"Unknown codec '{codec}', expected 'auto' or one of {', '.join(CODECS)}"
+        )
+    block_size = max(itemsize, block_size // itemsize * itemsize)
+    yield _FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, itemsize, block_size, size)
+
+    def blocks() -> Iterator[bytes]:
+        pending: List[bytes] = []
+        pending_size = 0
+        for chunk in chunks:
+            pending.append(bytes(chunk))
+            pending_size += len(chunk)
+            if pending_size >= block_size:
+                data = b"".join(pending)
+                end = len(data) // block_size * block_size
+                for start in range(0, end, block_size):
+                    yield data[start : start + block_size]
+                pending, pending_size = [data[end:]], len(data) - end
+        if pending_size:
+            yield b"".join(pending)
+
+    for block in blocks():
+        if codec == "auto":
+            codec = choose_codec(block, itemsize)
+        if codec == "none":
+            yield _BLOCK_HEADER.pack(0, len(block)) + block
+            continue
+        compressed = _compress_block(shuffle(block, itemsize), codec)
+        if len(compressed) >= len(block):
+            # Incompressible block, stored as is
+            yield _BLOCK_HEADER.pack(0, len(block)) + block
+        else:
+            yield _BLOCK_HEADER.pack(CODECS.index(codec), len(compressed)) + compressed
+
+
+def compress(
+    data: Buffer,
+    itemsize: int = 1,
+    codec: str = "auto",
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> bytes:
+    """
+    Compresses data into a frame.
+
+    Args:
+        data: The data.
+        itemsize: Size in bytes of a value, the bytes of numeric values are shuffled.
+        codec: One of CODECS, or 'auto' to choose it from a sample of the data.
+        block_size: Size of the blocks of original data, rounded to whole values.
+
+    Returns:
+        bytes: The frame.
+    """
+    if codec == "auto":
+        codec = choose_codec(data, itemsize)
+    view = memoryview(data).cast("B")
+    return b"".join(
+        compress_chunks(
+            (view[i : i + block_size] for i in range(0, len(view), block_size)),
+            len(view),
+            itemsize,
+            codec,
+            block_size,
+        )
+    )
+
+
+def is_frame(data: Buffer) -> bool:
+    """
+    Checks whether data starts with the header of a frame.
+
+    Args:
+        data: The data to check.
+
+    Returns:
+        bool: True if the data starts with the magic of the frames.
+    """
+    return bytes(data[: len(FRAME_MAGIC)]) == FRAME_MAGIC
+
+
+def decompress_range(frame: Buffer, start: int = 0, end: int = None) -> bytes:
+    """
+    Decompresses a range of the original data, only decompressing the blocks holding it.
+
+    Args:
+        frame: The frame.
+        start: Offset of the first byte of the range in the original data.
+        end: Offset after the last byte, the end of the data by default.
+
+    Returns:
+        bytes: The bytes of the range.
+    """
+    view = memoryview(frame).cast("B")
+    magic, version, itemsize, block_size, size = _FRAME_HEADER.unpack_from(view)
+    if magic != FRAME_MAGIC:
+        raise ValueError("Not a compressed frame")
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported compressed frame version {version}")
+    end = size if end is None else min(end, size)
+    parts = []
+    position = _FRAME_HEADER.size
+    # Blocks are skipped by their header until the range
+    for block_start in range(0, end, block_size):
+        codec, length = _BLOCK_HEADER.unpack_from(view, position)
+        position += _BLOCK_HEADER.size
+        if block_start + block_size > start:
+            data = view[position : position + length]
+            if codec != 0:
+                data = unshuffle(_decompress_block(data, codec), itemsize)
+            parts.append(bytes(data[max(start - block_start, 0) : end - block_start]))
+        position += length
+    return b"".join(parts)
+
+
+def decompress(data: Buffer) -> Buffer:
+    """
+    Decompresses a frame, data which is not a frame is returned as is.
+
+    Args:
+        data: The frame, or uncompressed data.
+
+    Returns:
+        Buffer: The original data.
+    """
+    if not is_frame(data):
+        return data
+    return decompress_range(data)
@@ -0,0 +1,165 @@
+import json
+import time
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Dict, Mapping, Optional, Union
+
+from reduction import ReductionEngine
+
+# Number of values reduced to measure the cost of a value
+SAMPLE_SIZE = 1 << 16
+
+# Weight of a new measure against the inherited estimate
+SMOOTHING = 0.5
+
+
+@dataclass(frozen=True)
+class CostModel:
+    """
+    Costs used to decide whether a task is split or reduced locally.
+
+    Attributes:
+        value_cost: Time in seconds to reduce one value, measured by the workers.
+        split_cost: Time in seconds to create the results of one subtask, measured by
+            the workers around the creation of the results of a split. The submission of
+            the tasks comes after the costs are forwarded and is not included.
+        task_latency: Time in seconds between the submission of a task and its start,
+            not visible from a worker and set by the client.
+    """
+
+    value_cost: float = 1e-9
+    split_cost: float = 1e-3
+    task_latency: float = 1e-2
+
+    @classmethod
+    def from_options(cls, options: Mapping[str, str]) -> "CostModel":
+        """
+        Creates a CostModel from task options.
+
+        Args:
+            options: Task options, missing costs fall back to the default values.
+
+        Returns:
+            CostModel: The costs described by the options.
+        """
+        return cls(
+            **{
+                field.name: float(options[field.name])
+                for field in fields(cls)
+                if field.name in options
+            }
+        )
+
+    def to_options(self) -> Dict[str, str]:
+        """
+        Converts the costs to task options understood by from_options.
+
+        Returns:
+            Dict[str, str]: The task options describing the costs.
+        """
+        return {name: repr(value) for name, value in asdict(self).items()}
+
+    def serialize(self) -> bytes:
+        """
+        Serializes the costs to a JSON-encoded byte array.
+
+        Returns:
+            bytes: The serialized costs.
+        """
+        return json.dumps(asdict(self)).encode("utf-8")
+
+    @classmethod
+    def deserialize(cls, payload: bytes) -> "CostModel":
+        """
+        Deserializes bytes into a CostModel instance.
+
+        Args:
+            payload: The serialized costs.
+
+        Returns:
+            CostModel: The deserialized costs.
+        """
+        return cls(**json.loads(payload.decode("utf-8")))
+
+    def update(
+        self, value_cost: Optional[float] = None, split_cost: Optional[float] = None
+    ) -> "CostModel":
+        """
+        Blends new measures into the current estimates.
+
+        Args:
+            value_cost: Measured time to reduce one value, if any.
+            split_cost: Measured time to create the results of one subtask, if any.
+
+        Returns:
+            CostModel: The updated costs.
+        """
+        model = self
+        if value_cost is not None:
+            model = replace(
+                model,
+                value_cost=(1 - SMOOTHING) * model.value_cost + SMOOTHING * value_cost,
+            )
+        if split_cost is not None:
+            model = replace(
+                model,
+                split_cost=(1 - SMOOTHING) * model.split_cost + SMOOTHING * split_cost,
+            )
+        return model
+
+    def should_split(self, number_of_values: int, fanout: int) -> bool:
+        """
+        Decides whether splitting a task is faster than reducing its values locally.
+
+        Splitting costs the creation of the subtasks and of the aggregation task, and two
+        task latencies on the critical path, but the subtasks reduce their values in
+        parallel.
+
+        Args:
+            number_of_values: Number of values of the task.
+            fanout: Number of subtasks created by a split.
+
+        Returns:
+            bool: True if the task should be split.
+        """
+        if number_of_values < fanout:
+            return False
+        local = number_of_values * self.value_cost
+        distributed = (
+            (fanout + 1) * self.split_cost + 2 * self.task_latency + local / fanout
+        )
+        return distributed < local
+
+    def split_threshold(self, fanout: int) -> int:
+        """
+        Computes the number of values above which a task is split.
+
+        Args:
+            fanout: Number of subtasks created by a split.
+
+        Returns:
+            int: Equivalent fixed split threshold.
+        """
+        overhead = (fanout + 1) * self.split_cost + 2 * self.task_latency
+        return max(fanout, int(overhead / (self.value_cost * (1 - 1 / fanout))))
+
+
+def measure_value_cost(
+    engine: ReductionEngine, values: Union[bytes, memoryview]
+) -> Optional[float]:
+    """
+    Measures the time to reduce one value on a sample of the values.
+
+    Args:
+        engine: Reduction applied to the values.
+        values: Little-endian values of the task.
+
+    Returns:
+        Optional[float]: Time in seconds per value, None if there are no values.
+    """
+    sample = memoryview(values)[: SAMPLE_SIZE * engine.dtype.itemsize]
+    count = len(sample) // engine.dtype.itemsize
+    if count == 0:
+        return None
+    start = time.perf_counter()
+    engine.reduce(sample)
+    return (time.perf_counter() - start) / count
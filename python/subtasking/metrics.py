@@ -0,0 +1,251 @@
+import bisect
+import contextlib
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import ContextManager, Dict, List, Optional, Tuple
+
+# Upper bounds in seconds of the buckets of the phase durations
+DEFAULT_BUCKETS = (
+    0.00001,
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+)
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Interface on which the metrics are served, the loopback one unless configured
+DEFAULT_HOST = "127.0.0.1"
+
+
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+
+class _Phase:
+    __slots__ = ("metrics", "phase", "start")
+
+    def __init__(self, metrics: "WorkerMetrics", phase: str):
+        self.metrics = metrics
+        self.phase = phase
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.metrics.observe(self.phase, time.perf_counter() - self.start)
+
+
+class WorkerMetrics:
+    # Whether the metrics are recorded, to skip computing what they would record
+    enabled = True
+
+    def __init__(
+        self,
+        port: Optional[int] = None,
+        host: str = DEFAULT_HOST,
+        textfile: Optional[str] = None,
+        interval: float = 10.0,
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        """
+        Initializes a WorkerMetrics instance.
+
+        This class records the durations of the phases of the tasks of a worker, such as the
+        payload decoding or the computation, in histograms, and counts the bytes they read
+        and write. The metrics are rendered in the OpenMetrics text format, to be scraped on
+        a local HTTP port or collected from a textfile.
+
+        Args:
+            port: Local HTTP port on which the metrics are served.
+            host: Interface on which the metrics are served.
+            textfile: File to which the metrics are written periodically.
+            interval: Time in seconds between two writes of the textfile.
+            buckets: Upper bounds in seconds of the buckets of the histograms.
+        """
+        self.port = port
+        self.host = host
+        self.textfile = textfile
+        self.interval = interval
+        self.buckets = tuple(buckets)
+        self.phases: Dict[str, _Histogram] = {}
+        self.bytes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls) -> "WorkerMetrics":
+        """
+        Creates the metrics of the worker from the environment.
+
+        Metrics are enabled by WORKER_METRICS_PORT, the local HTTP port on which they are
+        served, or WORKER_METRICS_TEXTFILE, the file to which they are written every
+        WORKER_METRICS_INTERVAL seconds (10 by default). The port listens on the loopback
+        interface unless WORKER_METRICS_HOST gives another one, such as 0.0.0.0 to be
+        scraped from outside the container.
+
+        Returns:
+            WorkerMetrics: The metrics, or disabled metrics which record nothing if none of
+                the variables is set.
+        """
+        port = os.getenv("WORKER_METRICS_PORT")
+        textfile = os.getenv("WORKER_METRICS_TEXTFILE")
+        if port is None and textfile is None:
+            return DisabledMetrics()
+        return cls(
+            port=int(port) if port is not None else None,
+            host=os.getenv("WORKER_METRICS_HOST", DEFAULT_HOST),
+            textfile=textfile,
+            interval=float(os.getenv("WORKER_METRICS_INTERVAL", 10)),
+        )
+
+    def start(self) -> None:
+        """
+        Starts exporting the metrics in background threads, as configured by the
+        environment.
+        """
+        if self.port is not None:
+            metrics = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = metrics.render().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", CONTENT_TYPE)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            server = ThreadingHTTPServer((self.host, self.port), Handler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        if self.textfile is not None:
+            threading.Thread(target=self._write_periodically, daemon=True).start()
+
+    def observe(self, phase: str, seconds: float) -> None:
+        """
+        Records the duration of a phase.
+
+        Args:
+            phase: Name of the phase.
+            seconds: Duration of the phase in seconds.
+        """
+        with self._lock:
+            histogram = self.phases.get(phase)
+            if histogram is None:
+                histogram = self.phases[phase] = _Histogram(self.buckets)
+            histogram.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            histogram.sum += seconds
+
+    def phase(self, phase: str) -> ContextManager[None]:
+        """
+        Records the duration of the enclosed block as a phase.
+
+        Args:
+            phase: Name of the phase.
+
+        Returns:
+            ContextManager[None]: The context manager timing the block.
+        """
+        return _Phase(self, phase)
+
+    def add_bytes(self, kind: str, count: int) -> None:
+        """
+        Counts bytes read or written by the tasks.
+
+        Args:
+            kind: What the bytes are, such as 'payload', 'dependencies' or 'results'.
+            count: Number of bytes.
+        """
+        with self._lock:
+            self.bytes[kind] = self.bytes.get(kind, 0) + count
+
+    def render(self) -> str:
+        """
+        Renders the metrics in the OpenMetrics text format.
+
+        Returns:
+            str: The metrics exposition, terminated by '# EOF'.
+        """
+        lines: List[str] = [
+            "# TYPE armonik_worker_phase_seconds histogram",
+            "# UNIT armonik_worker_phase_seconds seconds",
+            "# HELP armonik_worker_phase_seconds Duration of the phases of the tasks.",
+        ]
+        with self._lock:
+            for phase, histogram in sorted(self.phases.items()):
+                cumulative = 0
+                for bound, count in zip(
+                    [*map(repr, self.buckets), "+Inf"], histogram.counts
+                ):
+                    cumulative += count
+                    lines.append(
+                        f'armonik_worker_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {cumulative}'
+                    )
+                lines.append(
+                    f'armonik_worker_phase_seconds_count{{phase="{phase}"}} {cumulative}'
+                )
+                lines.append(
+                    f'armonik_worker_phase_seconds_sum{{phase="{phase}"}} {histogram.sum!r}'
+                )
+            lines += [
+                "# TYPE armonik_worker_bytes counter",
+                "# UNIT armonik_worker_bytes bytes",
+                "# HELP armonik_worker_bytes Bytes read and written by the tasks.",
+            ]
+            for kind, count in sorted(self.bytes.items()):
+                lines.append(f'armonik_worker_bytes_total{{kind="{kind}"}} {count}')
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        """
+        Writes the metrics to a file, replaced atomically so that readers never see a
+        partial exposition.
+
+        Args:
+            path: Path of the file.
+        """
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as file:
+            file.write(self.render())
+        os.replace(temporary_path, path)
+
+    def _write_periodically(self) -> None:
+        while True:
+            self.write_textfile(self.textfile)
+            time.sleep(self.interval)
+
+
+class DisabledMetrics(WorkerMetrics):
+    """
+    Metrics of a worker which does not export them: every call returns immediately.
+    """
+
+    enabled = False
+    _NO_PHASE = contextlib.nullcontext()
+
+    def start(self) -> None:
+        pass
+
+    def observe(self, phase: str, seconds: float) -> None:
+        pass
+
+    def phase(self, phase: str) -> ContextManager[None]:
+        return self._NO_PHASE
+
+    def add_bytes(self, kind: str, count: int) -> None:
+        pass
@@ -0,0 +1,190 @@
+from typing import Dict, Iterable, Mapping, Optional, Union
+
+import numpy as np
+
+# Supported value types, always little-endian on the wire
+DTYPES: Dict[str, np.dtype] = {
+    "int32": np.dtype("<i4"),
+    "int64": np.dtype("<i8"),
+    "float32": np.dtype("<f4"),
+    "float64": np.dtype("<f8"),
+}
+
+OPERATIONS = ("sum", "min", "max", "mean", "count", "histogram")
+
+
+class ReductionEngine:
+    def __init__(
+        self,
+        dtype: str = "int32",
+        operation: str = "sum",
+        bins: int = 10,
+        low: Optional[float] = None,
+        high: Optional[float] = None,
+    ):
+        """
+        Initializes a ReductionEngine instance.
+
+        Leaf tasks reduce their values to a partial state, aggregation tasks combine the
+        partial states of their dependencies, and the client finalizes the last state into
+        the value of the operation. Partial states are small little-endian arrays, so that
+        the default int32 sum keeps the historical 8 bytes little-endian integer result.
+
+        Args:
+            dtype: Name of the type of the values, one of DTYPES.
+            operation: Name of the reduction, one of OPERATIONS.
+            bins: Number of bins of the histogram operation.
+            low: Lower bound of the histogram range.
+            high: Upper bound of the histogram range.
+
+        Raises:
+            ValueError: If the type, the operation or the histogram range is invalid.
+        """
+        if dtype not in DTYPES:
+            raise ValueError(
+                f"Unsupported dtype '{dtype}', expected one of {', '.join(DTYPES)}"
+            )
+        if operation not in OPERATIONS:
+            raise ValueError(
+                f"Unsupported operation '{operation}', expected one of {', '.join(OPERATIONS)}"
+            )
+        if operation == "histogram":
+            if low is None or high is None:
+                raise ValueError(
+                    "Histogram operation requires 'low' and 'high' options"
+                )
+            if bins <= 0 or not low < high:
+                raise ValueError("Histogram requires bins > 0 and low < high")
+        self.dtype = DTYPES[dtype]
+        self.operation = operation
+        self.bins = bins
+        self.low = low
+        self.high = high
+
+        # Accumulator type: widest type of the same kind as the values
+        accumulator = np.dtype("<i8") if self.dtype.kind == "i" else np.dtype("<f8")
+        if operation in ("count", "histogram"):
+            self.state_dtype = np.dtype("<i8")
+        elif operation == "mean":
+            self.state_dtype = np.dtype("<f8")
+        else:
+            self.state_dtype = accumulator
+
+    @classmethod
+    def from_options(cls, options: Mapping[str, str]) -> "ReductionEngine":
+        """
+        Creates a ReductionEngine from task options.
+
+        Args:
+            options: Task options, read from the keys 'dtype', 'operation', 'bins', 'low'
+                and 'high'. Missing keys fall back to an int32 sum.
+
+        Returns:
+            ReductionEngine: The engine described by the options.
+        """
+        low = options.get("low", None)
+        high = options.get("high", None)
+        return cls(
+            dtype=options.get("dtype", "int32"),
+            operation=options.get("operation", "sum"),
+            bins=int(options.get("bins", 10)),
+            low=float(low) if low is not None else None,
+            high=float(high) if high is not None else None,
+        )
+
+    def to_options(self) -> Dict[str, str]:
+        """
+        Converts the engine to task options understood by from_options.
+
+        Returns:
+            Dict[str, str]: The task options describing this engine.
+        """
+        options = {"dtype": self.dtype.name, "operation": self.operation}
+        if self.operation == "histogram":
+            options.update(bins=str(self.bins), low=str(self.low), high=str(self.high))
+        return options
+
+    def view(self, payload: Union[bytes, bytearray, memoryview]) -> np.ndarray:
+        """
+        Views a payload as an array of values without copying it.
+
+        Args:
+            payload: Little-endian values, trailing incomplete values are ignored.
+
+        Returns:
+            np.ndarray: Read-only array backed by the payload buffer.
+        """
+        count = len(payload) // self.dtype.itemsize
+        return np.frombuffer(payload, dtype=self.dtype, count=count)
+
+    def reduce(self, payload: Union[bytes, bytearray, memoryview]) -> bytes:
+        """
+        Reduces the values of a payload to a serialized partial state.
+
+        Args:
+            payload: Little-endian values to reduce.
+
+        Returns:
+            bytes: The serialized partial state.
+        """
+        values = self.view(payload)
+        if self.operation == "sum":
+            state = [values.sum(dtype=self.state_dtype)]
+        elif self.operation == "min":
+            state = [np.min(values, initial=self._identity(np.minimum))]
+        elif self.operation == "max":
+            state = [np.max(values, initial=self._identity(np.maximum))]
+        elif self.operation == "count":
+            state = [values.size]
+        elif self.operation == "mean":
+            state = [values.sum(dtype=self.state_dtype), values.size]
+        else:
+            state, _ = np.histogram(values, bins=self.bins, range=(self.low, self.high))
+        return np.asarray(state, dtype=self.state_dtype).tobytes()
+
+    def combine(self, states: Iterable[bytes]) -> bytes:
+        """
+        Combines serialized partial states into a single one.
+
+        Args:
+            states: Serialized partial states, for instance the data dependencies of an
+                aggregation task.
+
+        Returns:
+            bytes: The serialized combined state.
+        """
+        arrays = [np.frombuffer(state, dtype=self.state_dtype) for state in states]
+        if len(arrays) == 0:
+            # State of an empty set of values
+            return self.reduce(b"")
+        return self._merge().reduce(np.stack(arrays), axis=0).tobytes()
+
+    def finalize(self, state: bytes) -> Union[int, float, np.ndarray]:
+        """
+        Converts a serialized state into the value of the operation.
+
+        Args:
+            state: The serialized state of all the values.
+
+        Returns:
+            The reduced value, or the bin counts for the histogram operation.
+        """
+        array = np.frombuffer(state, dtype=self.state_dtype)
+        if self.operation == "histogram":
+            return array
+        if self.operation == "mean":
+            return float(array[0] / array[1]) if array[1] else float("nan")
+        return array[0].item()
+
+    def _merge(self) -> np.ufunc:
+        if self.operation == "min":
+            return np.minimum
+        if self.operation == "max":
+            return np.maximum
+        return np.add
+
+    def _identity(self, ufunc: np.ufunc):
+        if self.dtype.kind == "i":
+            info = np.iinfo(self.dtype)
+            return info.max if ufunc is np.minimum else info.min
+        return np.inf if ufunc is np.minimum else -np.inf
@@ -0,0 +1,170 @@
+import struct
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Tuple
+
+
+def split_bounds(number_of_values: int, fanout: int) -> List[Tuple[int, int]]:
+    """
+    Splits a range of values into contiguous chunks of near-equal size.
+
+    Args:
+        number_of_values: Number of values to split.
+        fanout: Number of chunks, reduced to the number of values if there are fewer.
+
+    Returns:
+        List[Tuple[int, int]]: Start (inclusive) and end (exclusive) value index of each chunk.
+    """
+    parts = max(1, min(fanout, number_of_values))
+    bounds = [(i * number_of_values) // parts for i in range(parts + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+@dataclass(frozen=True)
+class TreeStats:
+    """
+    Shape of the task tree created to reduce a payload.
+
+    Attributes:
+        tasks: Total number of tasks, including the root task.
+        leaves: Number of tasks reducing values.
+        splits: Number of tasks splitting their payload into subtasks.
+        aggregations: Number of tasks combining the results of subtasks.
+        depth: Number of split levels of the values.
+        critical_path: Number of tasks on the longest chain of dependent tasks.
+    """
+
+    tasks: int
+    leaves: int
+    splits: int
+    aggregations: int
+    depth: int
+    critical_path: int
+
+
+def tree_stats(
+    number_of_values: int, split: int, fanout: int = 2, levels: int = 1
+) -> TreeStats:
+    """
+    Computes the shape of the task tree without building it.
+
+    Args:
+        number_of_values: Number of values of the root payload.
+        split: Threshold of number of values above which a task is split.
+        fanout: Number of subtasks created by a split.
+        levels: Number of split levels created at once by a splitting task.
+
+    Returns:
+        TreeStats: The shape of the task tree.
+    """
+
+    @lru_cache(maxsize=None)
+    def task(n: int) -> Tuple[int, int, int, int, int]:
+        # (leaves, splits, aggregations, depth, critical path) of a task reducing n values
+        if n <= split:
+            return 1, 0, 0, 0, 1
+        leaves, splits, aggregations, depth, path = expand(n, levels)
+        return leaves, splits + 1, aggregations, depth, path + 1
+
+    @lru_cache(maxsize=None)
+    def expand(n: int, remaining: int) -> Tuple[int, int, int, int, int]:
+        # Same for the subtasks and the aggregation task created by the split of n values
+        leaves, splits, aggregations, depth, path = 0, 0, 1, 0, 0
+        for start, end in split_bounds(n, fanout):
+            size = end - start
+            if remaining > 1 and size > split:
+                # Split decided locally by the parent task
+                child = expand(size, remaining - 1)
+            else:
+                child = task(size)
+            leaves += child[0]
+            splits += child[1]
+            aggregations += child[2]
+            depth = max(depth, child[3])
+            path = max(path, child[4])
+        return leaves, splits, aggregations, depth + 1, path + 1
+
+    leaves, splits, aggregations, depth, path = task(number_of_values)
+    return TreeStats(
+        tasks=leaves + splits + aggregations,
+        leaves=leaves,
+        splits=splits,
+        aggregations=aggregations,
+        depth=depth,
+        critical_path=path,
+    )
+
+
+@dataclass(frozen=True)
+class RangeDescriptor:
+    """
+    Range of values inside a result holding the values of the whole tree.
+
+    Attributes:
+        result_id: Id of the result holding the values.
+        offset: Index of the first value of the range.
+        length: Number of values of the range.
+    """
+
+    result_id: str
+    offset: int
+    length: int
+
+    _HEADER = struct.Struct("<QQ")
+
+    def serialize(self) -> bytes:
+        """
+        Serializes the descriptor: offset and length as 8 bytes little-endian integers,
+        followed by the UTF-8 encoded result id.
+
+        Returns:
+            bytes: The serialized descriptor.
+        """
+        return self._HEADER.pack(self.offset, self.length) + self.result_id.encode(
+            "utf-8"
+        )
+
+    @classmethod
+    def deserialize(cls, payload: bytes) -> "RangeDescriptor":
+        """
+        Deserializes bytes into a RangeDescriptor instance.
+
+        Args:
+            payload: The serialized descriptor.
+
+        Returns:
+            RangeDescriptor: The deserialized descriptor.
+        """
+        offset, length = cls._HEADER.unpack_from(payload)
+        return cls(
+            payload[cls._HEADER.size :].decode("utf-8"),
+            offset,
+            length,
+        )
+
+    def sub_range(self, start: int, end: int) -> "RangeDescriptor":
+        """
+        Creates the descriptor of a part of this range.
+
+        Args:
+            start: Index of the first value, relative to this range.
+            end: Index after the last value, relative to this range.
+
+        Returns:
+            RangeDescriptor: The descriptor of the part.
+        """
+        return RangeDescriptor(self.result_id, self.offset + start, end - start)
+
+    def view(self, data: bytes, itemsize: int) -> memoryview:
+        """
+        Views the bytes of the range inside the data of the result without copying them.
+
+        Args:
+            data: Data of the result holding the values.
+            itemsize: Size in bytes of a value.
+
+        Returns:
+            memoryview: The bytes of the values of the range.
+        """
+        start = self.offset * itemsize
+        return memoryview(data)[start : start + self.length * itemsize]
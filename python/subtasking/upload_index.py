@@ -0,0 +1,109 @@
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, Union
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def content_digest(chunks: Iterable[Buffer]) -> str:
+    """
+    Hashes data given chunk by chunk.
+
+    Args:
+        chunks: The data, in chunks of any size.
+
+    Returns:
+        str: The hexadecimal BLAKE2b digest of the data.
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadIndex:
+    def __init__(self):
+        """
+        Initializes an UploadIndex instance.
+
+        This class maps the digest of the data uploaded in a session to the id of the
+        result holding it, so that identical inputs are uploaded once and then given as
+        data dependencies of every task reading them. An index must only be used with the
+        session whose results it holds. It can be shared by several threads: concurrent
+        uploads of the same data wait for the first one instead of uploading it again.
+        """
+        self._lock = threading.Lock()
+        self._results: Dict[str, Future] = {}
+        self.uploads = 0
+        self.reuses = 0
+        self.bytes_uploaded = 0
+        self.bytes_saved = 0
+
+    def upload(self, digest: str, size: int, create: Callable[[], str]) -> str:
+        """
+        Gets the result holding data, uploading it if it is not in the session yet.
+
+        Args:
+            digest: The digest of the data.
+            size: The size of the data in bytes.
+            create: Function creating the result and uploading the data, returning the
+                id of the result.
+
+        Returns:
+            str: The id of the result holding the data.
+        """
+        with self._lock:
+            future = self._results.get(digest)
+            owner = future is None
+            if owner:
+                future = self._results[digest] = Future()
+        if not owner:
+            result_id = future.result()
+            with self._lock:
+                self.reuses += 1
+                self.bytes_saved += size
+            return result_id
+        try:
+            result_id = create()
+        except BaseException as e:
+            # The next upload of the data tries again
+            with self._lock:
+                del self._results[digest]
+            future.set_exception(e)
+            raise
+        future.set_result(result_id)
+        with self._lock:
+            self.uploads += 1
+            self.bytes_uploaded += size
+        return result_id
+
+    def statistics(self) -> Dict[str, int]:
+        """
+        Gets the counters of the index.
+
+        Returns:
+            Dict[str, int]: The number of uploads and of bytes uploaded, and the number
+                of uploads avoided by reusing a result and of bytes saved.
+        """
+        with self._lock:
+            return {
+                "uploads": self.uploads,
+                "reuses": self.reuses,
+                "bytes_uploaded": self.bytes_uploaded,
+                "bytes_saved": self.bytes_saved,
+            }
+
+    def summary(self) -> str:
+        """
+        Formats the counters of the index.
+
+        Returns:
+            str: A line with the uploads and the bytes saved.
+        """
+        statistics = self.statistics()
+        return (
+            f"{statistics['uploads']} inputs uploaded ({statistics['bytes_uploaded']} "
+            f"bytes), {statistics['reuses']} reused ({statistics['bytes_saved']} bytes "
+            "saved)"
+        )
@@ -1,90 +1,204 @@
+import sys
+
+from startup import StartupProfile
+
+# Created before the other imports to time them with --profile-startup
+startup = StartupProfile.from_environment()
+
 import logging
 import os
+import time
+from dataclasses import replace
+from typing import Union
 
 import grpc
-from armonik.common import Output, TaskDefinition
+from armonik.common import Output
 from armonik.worker import ArmoniKWorker, ClefLogger, TaskHandler
 
+from batching import SubtaskBatch, add_split
+from compression import CODECS, compress, decompress_range
+from cost_model import SAMPLE_SIZE, CostModel, measure_value_cost
+from metrics import WorkerMetrics
+from reduction import ReductionEngine
+from splitting import RangeDescriptor
+
 ClefLogger.setup_logging(logging.INFO)
 
+# Per-phase metrics, disabled unless configured by the environment
+metrics = WorkerMetrics.from_environment()
+
+
+def send_results(task_handler: TaskHandler, result: bytes, model: CostModel) -> None:
+    """
+    Sends the result of the task, and the cost model if the client expects it.
+
+    Args:
+        task_handler: The handler for the current task.
+        result: The serialized reduction state.
+        model: The cost model known by the task.
+    """
+    results = {task_handler.expected_results[0]: result}
+    if len(task_handler.expected_results) > 1:
+        with metrics.phase("result_encode"):
+            results[task_handler.expected_results[1]] = model.serialize()
+    if metrics.enabled:
+        metrics.add_bytes("results", sum(map(len, results.values())))
+    with metrics.phase("send_results"):
+        task_handler.send_results(results)
+
 
 def processor(task_handler: TaskHandler) -> Output:
+    startup.mark("first task received")
     # Get inputs
     split_threshold = task_handler.task_options.options.get("split", None)
-    if split_threshold is None:
-        return Output("Threshold is not specified")
-    else:
+    if split_threshold is not None:
+        # Manual override of the cost model
         split_threshold = int(split_threshold)
+    model = CostModel.from_options(task_handler.task_options.options)
+    fanout = int(task_handler.task_options.options.get("fanout", 2))
+    if fanout < 2:
+        return Output("Fanout must be at least 2")
+    # Number of split levels decided and created at once by a task
+    levels = int(task_handler.task_options.options.get("levels", 1))
+    if levels < 1:
+        return Output("Levels must be at least 1")
+    try:
+        engine = ReductionEngine.from_options(task_handler.task_options.options)
+    except ValueError as e:
+        return Output(str(e))
+
+    mode = task_handler.task_options.options.get("mode", "copy")
+    if mode not in ("copy", "range"):
+        return Output(f"Unsupported mode '{mode}', expected 'copy' or 'range'")
+    # Codec of the values uploaded by the client and of the payloads of the copy mode
+    compression = task_handler.task_options.options.get("compression", None)
+    if compression is not None and compression not in ("auto", *CODECS):
+        return Output(f"Unsupported compression '{compression}'")
 
     payload = task_handler.payload
+    itemsize = engine.dtype.itemsize
+    metrics.add_bytes("payload", len(payload))
 
     if len(payload) > 0:
         # Data needs to be computed
-        number_of_values = len(payload) // 4
-        if number_of_values > split_threshold:
-            # Above Compute threshold : Split into 2 subtasks
-            pivot_byte_index = (number_of_values // 2) * 4
-            left_payload, right_payload = (
-                payload[:pivot_byte_index],
-                payload[pivot_byte_index:],
-            )
-            # Create new results
-            new_results = task_handler.create_results_metadata(
-                ["left_result", "right_result"]
-            )
-            # Create new payloads
-            new_payloads = task_handler.create_results(
-                {
-                    "left_payload": left_payload,
-                    "right_payload": right_payload,
-                    "aggregation_payload": b"",
-                }
-            )
-            # Create subtask definitions
-            left_task = TaskDefinition(
-                new_payloads["left_payload"].result_id,
-                [new_results["left_result"].result_id],
-            )
-            right_task = TaskDefinition(
-                new_payloads["right_payload"].result_id,
-                [new_results["right_result"].result_id],
-            )
-            aggregate = TaskDefinition(
-                new_payloads["aggregation_payload"].result_id,
-                task_handler.expected_results,  # The result is delegated to this aggregation task
-                data_dependencies=[
-                    new_results["left_result"].result_id,
-                    new_results["right_result"].result_id,
-                ],  # The task depends on the subtasks
-            )
+        if mode == "range":
+            # The payload only describes a range of the values uploaded once by the client
+            with metrics.phase("payload_decode"):
+                descriptor = RangeDescriptor.deserialize(payload)
+            dependency = task_handler.data_dependencies[descriptor.result_id]
+            number_of_values = descriptor.length
+
+            def read_values(count: int) -> Union[bytes, memoryview]:
+                # Only the blocks holding the first values of the range are decompressed
+                part = descriptor.sub_range(0, min(count, descriptor.length))
+                if compression is None:
+                    return part.view(dependency, itemsize)
+                start = part.offset * itemsize
+                return decompress_range(
+                    dependency, start, start + part.length * itemsize
+                )
+
+            # Splitting tasks only read a sample, the leaves read the whole range
+            values = None
+            if split_threshold is None:
+                with metrics.phase("dependency_decode"):
+                    sample = read_values(SAMPLE_SIZE)
+        else:
+            if compression is not None:
+                with metrics.phase("payload_decode"):
+                    values = decompress_range(payload)
+            else:
+                values = payload
+            number_of_values = len(values) // itemsize
+            sample = values
+        if split_threshold is None:
+            model = model.update(value_cost=measure_value_cost(engine, sample))
+
+        def should_split(n: int) -> bool:
+            if split_threshold is not None:
+                return n > split_threshold
+            return model.should_split(n, fanout)
+
+        if should_split(number_of_values):
+            # Above Compute threshold : Split into fanout subtasks
+            start_time = time.perf_counter()
+            if mode == "range":
+                # Subtasks read their range from the same data dependency
+                def subtask_payload(start: int, end: int) -> bytes:
+                    return descriptor.sub_range(start, end).serialize()
+
+                subtask_dependencies = [descriptor.result_id]
+            else:
+
+                def subtask_payload(start: int, end: int) -> bytes:
+                    data = values[start * itemsize : end * itemsize]
+                    if compression is None:
+                        return data
+                    return compress(data, itemsize, compression)
+
+                subtask_dependencies = []
+
+            with metrics.phase("split"):
+                batch = SubtaskBatch()
+                add_split(
+                    batch,
+                    number_of_values,
+                    task_handler.expected_results,
+                    fanout,
+                    levels,
+                    should_split,
+                    subtask_payload,
+                    subtask_dependencies,
+                )
+            with metrics.phase("create_results"):
+                batch.create(task_handler)
+
+            # Subtasks inherit the options of the tree, not only the session defaults
+            subtask_options = task_handler.task_options
+            if split_threshold is None:
+                # Forward the measured costs to the subtasks
+                model = model.update(
+                    split_cost=(time.perf_counter() - start_time) / len(batch)
+                )
+                subtask_options = replace(
+                    task_handler.task_options,
+                    options={**task_handler.task_options.options, **model.to_options()},
+                )
 
             # Submit tasks
-            task_handler.submit_tasks([left_task, right_task, aggregate])
+            with metrics.phase("submit_tasks"):
+                batch.submit(task_handler, subtask_options)
 
             # No result to be submitted
 
         else:
-            # Compute the sum
-            values = [
-                int.from_bytes(payload[i : i + 4], "little")
-                for i in range(0, len(payload), 4)
-            ]
-            result = sum(values)
+            if values is None:
+                with metrics.phase("dependency_decode"):
+                    values = read_values(number_of_values)
+                metrics.add_bytes("dependencies", len(values))
+            # Reduce the values, viewed in place
+            with metrics.phase("compute"):
+                result = engine.reduce(values)
 
             # Send the result
-            task_handler.send_results(
-                {task_handler.expected_results[0]: result.to_bytes(8, "little")}
-            )
+            send_results(task_handler, result, model)
     else:
         # Aggregation of results
-        result = sum(
-            int.from_bytes(v, "little") for v in task_handler.data_dependencies.values()
-        )
+        with metrics.phase("dependency_decode"):
+            states = list(task_handler.data_dependencies.values())
+        if metrics.enabled:
+            metrics.add_bytes("dependencies", sum(map(len, states)))
+        with metrics.phase("compute"):
+            result = engine.combine(states)
 
         # Send the result
-        task_handler.send_results(
-            {task_handler.expected_results[0]: result.to_bytes(8, "little")}
+        send_results(task_handler, result, model)
+
+    if startup.mark("first task served"):
+        ClefLogger.getLogger("ArmoniKWorker").info(
+            "Startup profile", extra={"context": startup.summary()}
         )
+        print(startup.report(), file=sys.stderr, flush=True)
 
     # Done
     return Output()
@@ -113,6 +227,9 @@ def main():
         "ComputePlane__AgentChannel__Address", "/cache/armonik_agent.sock"
     )
 
+    # Export the metrics, if enabled
+    metrics.start()
+
     # Start worker
     logger.info("Worker Started")
     # Use options to fix Unix socket connection on localhost (cf: <GitHub>)
@@ -121,6 +238,7 @@ def main():
     ) as agent_channel:
         worker = ArmoniKWorker(agent_channel, processor, logger=logger)
         logger.info("Worker Connected")
+        startup.mark("server starting")
         worker.start(worker_endpoint)
 
 